@@ -1,4 +1,5 @@
 import asyncio
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config, pool
@@ -31,6 +32,13 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def include_name(name, type_, parent_names):
+    # Partitions of messages are managed by app.scripts.maintain_messages_partitions
+    if type_ == "table":
+        return not re.fullmatch(r"messages_p\d+", name)
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -48,6 +56,7 @@ def run_migrations_offline():
         url=url,
         target_metadata=target_metadata,
         include_schemas=True,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -61,6 +70,7 @@ def do_run_migrations(connection):
         connection=connection,
         target_metadata=target_metadata,
         include_schemas=True,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
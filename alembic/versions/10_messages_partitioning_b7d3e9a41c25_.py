@@ -0,0 +1,91 @@
+"""empty message
+
+Revision ID: b7d3e9a41c25
+Revises: 8c4f1a7e2b63
+Create Date: 2026-10-18 13:05:47.611320
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d3e9a41c25"
+down_revision = "8c4f1a7e2b63"
+branch_labels = None
+depends_on = None
+
+# Ids per partition, next partitions are created by app.services.messages_partitions on every node
+PARTITION_SIZE = 10_000_000
+# Partitions created after the current one, so inserts do not depend on the first run of maintenance
+PARTITIONS_AHEAD = 2
+
+FOREIGN_KEYS = (
+    "ADD CONSTRAINT messages_chat_id_fkey FOREIGN KEY (chat_id) REFERENCES chats(id)",
+    "ADD CONSTRAINT messages_original_chat_id_fkey FOREIGN KEY (original_chat_id) REFERENCES chats(id)",
+    "ADD CONSTRAINT messages_original_id_fkey FOREIGN KEY (original_id) REFERENCES messages(id)",
+    "ADD CONSTRAINT messages_user_uid_fkey FOREIGN KEY (user_uid) REFERENCES users(uid)",
+)
+
+
+def _create_indexes() -> None:
+    op.create_index("ix_messages_chat_id_id", "messages", ["chat_id", "id"], unique=False)
+    op.create_index("ix_messages_user_uid", "messages", ["user_uid"], unique=False)
+    op.create_index("search_by_message_text", "messages", ["search_text"], unique=False, postgresql_using="gin")
+
+
+def upgrade() -> None:
+    max_id = op.get_bind().execute(sa.text("SELECT coalesce(max(id), 0) FROM messages")).scalar()
+    boundary = (max_id // PARTITION_SIZE + 1) * PARTITION_SIZE
+
+    # Current table becomes the first partition, its indexes are attached to indexes of the new table
+    op.rename_table("messages", "messages_p0")
+    op.execute(
+        "ALTER TABLE messages_p0 DROP CONSTRAINT messages_chat_id_fkey, "
+        "DROP CONSTRAINT messages_original_chat_id_fkey, DROP CONSTRAINT messages_original_id_fkey, "
+        "DROP CONSTRAINT messages_user_uid_fkey"
+    )
+    op.execute("ALTER INDEX messages_pkey RENAME TO messages_p0_pkey")
+    op.execute("ALTER INDEX ix_messages_chat_id_id RENAME TO messages_p0_chat_id_id_idx")
+    op.execute("ALTER INDEX ix_messages_user_uid RENAME TO messages_p0_user_uid_idx")
+    op.execute("ALTER INDEX search_by_message_text RENAME TO messages_p0_search_text_idx")
+
+    # Unique constraint of partitioned table must contain partition key, so idempotency keys have own table
+    op.create_table(
+        "messages_client_ids",
+        sa.Column("client_id", sa.UUID(), nullable=False),
+        sa.Column("message_id", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("client_id"),
+    )
+    op.execute("INSERT INTO messages_client_ids (client_id, message_id) SELECT client_id, id FROM messages_p0")
+    op.drop_constraint("messages_client_id_key", table_name="messages_p0")
+
+    op.execute("CREATE TABLE messages (LIKE messages_p0 INCLUDING DEFAULTS) PARTITION BY RANGE (id)")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.create_primary_key("messages_pkey", "messages", ["id"])
+    op.execute(f"ALTER TABLE messages {', '.join(FOREIGN_KEYS)}")
+    _create_indexes()
+
+    # With the check constraint attach does not scan the table again
+    op.execute(f"ALTER TABLE messages_p0 ADD CONSTRAINT messages_p0_id_check CHECK (id < {boundary})")
+    op.execute(f"ALTER TABLE messages ATTACH PARTITION messages_p0 FOR VALUES FROM (MINVALUE) TO ({boundary})")
+    op.drop_constraint("messages_p0_id_check", table_name="messages_p0")
+    for lower in range(boundary, boundary + PARTITIONS_AHEAD * PARTITION_SIZE, PARTITION_SIZE):
+        op.execute(
+            f"CREATE TABLE messages_p{lower} PARTITION OF messages "
+            f"FOR VALUES FROM ({lower}) TO ({lower + PARTITION_SIZE})"
+        )
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE messages_unpartitioned (LIKE messages INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO messages_unpartitioned SELECT * FROM messages")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages_unpartitioned.id")
+    op.drop_table("messages")
+    op.rename_table("messages_unpartitioned", "messages")
+
+    op.create_primary_key("messages_pkey", "messages", ["id"])
+    op.execute(f"ALTER TABLE messages {', '.join(FOREIGN_KEYS)}")
+    _create_indexes()
+    op.create_unique_constraint("messages_client_id_key", "messages", ["client_id"])
+    op.drop_table("messages_client_ids")
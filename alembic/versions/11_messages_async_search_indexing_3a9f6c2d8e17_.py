@@ -0,0 +1,34 @@
+"""empty message
+
+Revision ID: 3a9f6c2d8e17
+Revises: b7d3e9a41c25
+Create Date: 2026-10-18 14:22:31.904516
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3a9f6c2d8e17"
+down_revision = "b7d3e9a41c25"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column("messages", "search_text", existing_type=postgresql.TSVECTOR(), nullable=True)
+    op.create_index(
+        "ix_messages_not_indexed",
+        "messages",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("search_text IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_not_indexed", table_name="messages", postgresql_where=sa.text("search_text IS NULL"))
+    op.execute("UPDATE messages SET search_text = to_tsvector(lower(text)) WHERE search_text IS NULL")
+    op.alter_column("messages", "search_text", existing_type=postgresql.TSVECTOR(), nullable=False)
@@ -0,0 +1,37 @@
+"""empty message
+
+Revision ID: e5b1c7d2a964
+Revises: 3a9f6c2d8e17
+Create Date: 2026-10-18 16:41:09.327815
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5b1c7d2a964"
+down_revision = "3a9f6c2d8e17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Token identifies a device, only its latest owner is kept
+    op.execute("DELETE FROM devices d USING devices newer WHERE d.token = newer.token AND d.id < newer.id")
+    op.drop_constraint("uqp_user_uid_platform", "devices", type_="unique")
+    op.create_unique_constraint("uq_devices_token", "devices", ["token"])
+    # Tokens of users are read by index only scan
+    op.drop_index("ix_devices_user_uid", table_name="devices")
+    op.create_index(
+        "ix_devices_user_uid", "devices", ["user_uid"], unique=False, postgresql_include=["platform", "token"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_devices_user_uid", table_name="devices")
+    op.create_index("ix_devices_user_uid", "devices", ["user_uid"], unique=False)
+    op.drop_constraint("uq_devices_token", "devices", type_="unique")
+    op.execute(
+        "DELETE FROM devices d USING devices newer "
+        "WHERE d.user_uid = newer.user_uid AND d.platform = newer.platform AND d.id < newer.id"
+    )
+    op.create_unique_constraint("uqp_user_uid_platform", "devices", ["user_uid", "platform"])
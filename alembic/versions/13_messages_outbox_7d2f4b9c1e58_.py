@@ -0,0 +1,34 @@
+"""empty message
+
+Revision ID: 7d2f4b9c1e58
+Revises: e5b1c7d2a964
+Create Date: 2026-10-18 17:28:52.104379
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7d2f4b9c1e58"
+down_revision = "e5b1c7d2a964"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "messages_outbox",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("event_name", sa.String(length=64), nullable=False),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("recipients_uid", postgresql.ARRAY(sa.UUID()), nullable=True),
+        sa.Column("time_created", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("messages_outbox")
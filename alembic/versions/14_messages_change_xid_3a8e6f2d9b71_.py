@@ -0,0 +1,28 @@
+"""empty message
+
+Revision ID: 3a8e6f2d9b71
+Revises: 7d2f4b9c1e58
+Create Date: 2026-10-18 19:04:37.518264
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3a8e6f2d9b71"
+down_revision = "7d2f4b9c1e58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Default is set after the column is added, so existing messages are not rewritten and stay out of sync
+    op.add_column("messages", sa.Column("change_xid", sa.BigInteger(), nullable=True))
+    op.alter_column("messages", "change_xid", server_default=sa.text("(pg_current_xact_id()::text::bigint)"))
+    op.create_index("ix_messages_chat_id_change_xid", "messages", ["chat_id", "change_xid", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_chat_id_change_xid", table_name="messages")
+    op.drop_column("messages", "change_xid")
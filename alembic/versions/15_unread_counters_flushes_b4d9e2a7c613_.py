@@ -0,0 +1,29 @@
+"""empty message
+
+Revision ID: b4d9e2a7c613
+Revises: 3a8e6f2d9b71
+Create Date: 2026-10-19 10:12:45.208361
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b4d9e2a7c613"
+down_revision = "3a8e6f2d9b71"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "unread_counters_flushes",
+        sa.Column("id", sa.UUID(as_uuid=False), nullable=False),
+        sa.Column("time_created", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("unread_counters_flushes")
@@ -0,0 +1,29 @@
+"""empty message
+
+Revision ID: c7e3a1f5d820
+Revises: b4d9e2a7c613
+Create Date: 2026-10-20 11:04:37.512093
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c7e3a1f5d820"
+down_revision = "b4d9e2a7c613"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("messages_outbox", sa.Column("attempts", sa.Integer(), server_default="0", nullable=False))
+    op.add_column(
+        "messages_outbox",
+        sa.Column("time_next_attempt", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("messages_outbox", "time_next_attempt")
+    op.drop_column("messages_outbox", "attempts")
@@ -0,0 +1,58 @@
+"""empty message
+
+Revision ID: 5e2b8c1d9f40
+Revises: 4a7a05f47a6f
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5e2b8c1d9f40"
+down_revision = "4a7a05f47a6f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chats", sa.Column("last_message_id", sa.BigInteger(), nullable=True))
+    op.add_column("chats", sa.Column("last_message_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "chats_relationships",
+        sa.Column("last_message_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE chats
+        SET last_message_id = last_messages.id, last_message_at = last_messages.time_created
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id, time_created
+            FROM messages
+            ORDER BY chat_id, id DESC
+        ) AS last_messages
+        WHERE chats.id = last_messages.chat_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE chats_relationships
+        SET last_message_at = coalesce(chats.last_message_at, chats.time_created)
+        FROM chats
+        WHERE chats.id = chats_relationships.chat_id
+        """
+    )
+    op.create_index(
+        "ix_chats_relationships_chat_list",
+        "chats_relationships",
+        ["user_uid", "state", "time_pinned", sa.text("last_message_at DESC"), sa.text("chat_id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chats_relationships_chat_list", table_name="chats_relationships")
+    op.drop_column("chats_relationships", "last_message_at")
+    op.drop_column("chats", "last_message_at")
+    op.drop_column("chats", "last_message_id")
@@ -0,0 +1,24 @@
+"""empty message
+
+Revision ID: 8c4f1a7e2b63
+Revises: 5e2b8c1d9f40
+Create Date: 2026-10-18 11:40:05.218734
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8c4f1a7e2b63"
+down_revision = "5e2b8c1d9f40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_messages_chat_id_id", "messages", ["chat_id", "id"], unique=False)
+    op.drop_index("ix_messages_chat_id", table_name="messages")
+
+
+def downgrade() -> None:
+    op.create_index("ix_messages_chat_id", "messages", ["chat_id"], unique=False)
+    op.drop_index("ix_messages_chat_id_id", table_name="messages")
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from pydantic.types import UUID4
 
+from app import config
 from app.schemas import chats as s_chat
 from app.schemas import common as s_common
 from app.services import chats as chats_service
+from app.services import sync as sync_service
 from app.services.utils import get_current_user
 
 router = APIRouter(prefix="/management")
@@ -16,9 +18,15 @@ async def create_chat(
     return await chats_service.create_chat(data, current_user_uid)
 
 
-@router.get("/list")
-async def get_chat_list(from_archive: bool = False, user_uid: UUID4 = Depends(get_current_user)) -> list[s_chat.Chat]:
-    return await chats_service.get_chat_list(from_archive, user_uid)
+@router.get("/list", response_model=s_chat.ChatList)
+async def get_chat_list(
+    data: s_chat.GetChatListData = Depends(),
+    user_uid: UUID4 = Depends(get_current_user),
+) -> s_chat.ChatList | Response:
+    if config.application.fast_serialization:
+        content = await chats_service.get_chat_list_json(data, user_uid)
+        return Response(content=content, media_type="application/json")
+    return await chats_service.get_chat_list(data, user_uid)
 
 
 @router.get("/recipients")
@@ -60,9 +68,28 @@ async def unpin_chat(chat_id: int, user_uid: UUID4 = Depends(get_current_user))
     return await chats_service.unpin_chat(chat_id, user_uid)
 
 
-@router.get("/message_history")
+@router.get("/message_history", response_model=list[s_chat.Message])
 async def get_message_history(
     data: s_chat.GetMessageHistoryData = Depends(),
     user_uid: UUID4 = Depends(get_current_user),
-) -> list[s_chat.Message]:
+) -> list[s_chat.Message] | Response:
+    if config.application.fast_serialization:
+        content = await chats_service.get_message_history_json(data, user_uid)
+        return Response(content=content, media_type="application/json")
     return await chats_service.get_message_history(data, user_uid)
+
+
+@router.get("/search")
+async def search_messages(
+    data: s_chat.SearchMessagesData = Depends(),
+    user_uid: UUID4 = Depends(get_current_user),
+) -> s_chat.SearchMessagesResult:
+    return await chats_service.search_messages(data, user_uid)
+
+
+@router.get("/sync")
+async def sync_messages(
+    data: s_chat.SyncData = Depends(),
+    user_uid: UUID4 = Depends(get_current_user),
+) -> s_chat.SyncResult:
+    return await sync_service.get_changes(data, user_uid)
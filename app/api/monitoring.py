@@ -1,5 +1,8 @@
 from fastapi import APIRouter
 
+from app.db.registry import registry
+from app.services.memory_cache import get_caches_stats
+
 router = APIRouter()
 
 
@@ -7,3 +10,9 @@ router = APIRouter()
 async def ping() -> dict:
     """Health check for service"""
     return {"status": "OK"}
+
+
+@router.get("/metrics")
+async def metrics() -> dict:
+    """Hit and miss counters of in-process caches and usage of DB connection pools"""
+    return {"caches": get_caches_stats(), "db_pools": registry.get_pools_stats()}
@@ -4,12 +4,14 @@ __all__ = ["application", "cache", "socketio"]
 from .application import AppSettings
 from .cache import CacheSettings
 from .db import DBSettings
+from .push import PushSettings
 from .socketio import SocketioSettings
 from .web import WebSettings
 
 application: AppSettings = AppSettings()
 cache: CacheSettings = CacheSettings()
 database: DBSettings = DBSettings()
+push: PushSettings = PushSettings()
 socketio: SocketioSettings = SocketioSettings()
 web: WebSettings = WebSettings()
 
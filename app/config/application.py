@@ -17,6 +17,16 @@ class AppSettings(BaseSettings):
 
     user_header_name: str = "user-id"
     message_history_page_size: int = 20
+    chat_list_page_size: int = 20
+    chat_list_max_page_size: int = 100
+    chat_list_recipients_preview_size: int = 3
+    message_search_page_size: int = 20
+    message_search_max_page_size: int = 100
+    sync_page_size: int = 100
+    sync_max_page_size: int = 1000
+
+    # Message history and chat list are serialized to JSON by pydantic-core without validation of response
+    fast_serialization: bool = False
 
     @field_validator("version", mode="before")
     def version_validator(cls, value: Optional[str]) -> str:
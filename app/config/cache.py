@@ -6,6 +6,27 @@ class CacheSettings(BaseSettings):
     max_connections: int = 10
     dsn: RedisDsn = ""  # type: ignore[assignment]
 
-    user_sid_cache_lifetime: int = 2 * 60 * 60
+    # Sids are prolonged by heartbeat of their node, so sids of a crashed node expire soon
+    user_sid_cache_lifetime: int = 60
+    node_heartbeat_interval: float = 10.0
+    # Node is dead when heartbeat has not come for the lifetime, its sessions are removed by other nodes
+    node_lifetime: int = 30
+    # Online users are spread by hash of uid among sets, so nodes do not contend for one key
+    online_users_shards: int = 16
+    presence_events_maxlen: int = 100_000
+
+    users_cache_size: int = 100_000
+    users_cache_ttl: int = 60
+    users_cache_missing_ttl: int = 5
+    users_cache_redis: bool = False
+
+    # Presence of recipients is shared by messages sent in a short time, changes of other processes are seen after ttl
+    presence_cache_size: int = 100_000
+    presence_cache_ttl: float = 1.0
+
+    # Increments of unread counters are kept in memory or redis and written to DB by batches
+    unread_counters_batching: bool = False
+    unread_counters_redis: bool = False
+    unread_counters_flush_interval: float = 1.0
 
     model_config = SettingsConfigDict(env_prefix="cache_")
@@ -7,7 +7,40 @@ class DBSettings(BaseSettings):
     pool_max_overflow: int = 5
     pool_recycle: int = 29
     pool_timeout: int = 10
+    # Statements prepared by every connection of asyncpg, 0 disables the cache, e.g. for pgbouncer in transaction mode
+    prepared_statement_cache_size: int = 100
 
     dsn: PostgresDsn = ""  # type: ignore[assignment]
 
+    # New messages which come within the delay are inserted by one statement
+    messages_batching: bool = False
+    messages_batch_size: int = 100
+    messages_batch_delay: float = 0.003
+
+    # Events of messages are written to outbox in transaction of the change and sent by dispatchers of all nodes
+    messages_outbox: bool = False
+    outbox_batch_size: int = 100
+    outbox_interval: float = 0.05
+    # Sent events are not resent by other dispatchers within the lease, failed ones are dropped after the attempts
+    outbox_lease_time: float = 30.0
+    outbox_max_attempts: int = 5
+
+    # Size of new partitions of messages, the first ones are created by migration with 10M ids
+    messages_partition_size: int = 10_000_000
+    # Every node keeps partitions for the next ids created, seconds between checks
+    messages_partitions_ahead: int = 2
+    messages_partitions_interval: float = 600.0
+
+    # Search vectors of new and changed messages are computed by batches in background
+    search_indexing_batch_size: int = 1000
+    search_indexing_interval: float = 1.0
+
+    # Reads which tolerate replication lag go to healthy replicas, to primary when there are none
+    replica_dsns: list[PostgresDsn] = []
+    replica_max_lag: float = 5.0
+    replica_check_interval: float = 5.0
+    replica_check_timeout: float = 1.0
+    # Reads of a user go to primary for this time after own writes of the user
+    replica_sticky_time: int = 10
+
     model_config = SettingsConfigDict(env_prefix="databases_")
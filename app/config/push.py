@@ -0,0 +1,25 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class PushSettings(BaseSettings):
+    # Import paths of PushSender classes by platform, worker does not start if a platform has no sender
+    senders: dict[str, str] = {}
+    # Platforms without sender use FakeSender, which only logs and keeps notifications in memory, for local runs
+    fake_senders: bool = False
+
+    queue_maxlen: int = 1_000_000
+    read_batch_size: int = 500
+    # Milliseconds
+    read_block: int = 1000
+    # Notifications not delivered by a crashed worker are taken by others after this idle time, ms
+    claim_idle: int = 60_000
+    send_batch_size: int = 500
+    text_preview_length: int = 100
+
+    # Messages of a chat to a user within the window, seconds, become one notification
+    coalescing_window: float = 10.0
+    # Token bucket of notifications per user, tokens per second and size
+    rate_limit: float = 0.2
+    rate_limit_burst: int = 5
+
+    model_config = SettingsConfigDict(env_prefix="push_")
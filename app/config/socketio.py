@@ -1,3 +1,7 @@
+import os
+import socket
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 Seconds = int
@@ -7,4 +11,10 @@ class SocketioSettings(BaseSettings):
     ping_timeout: Seconds = 15
     ping_interval: Seconds = 10
 
+    transports: list[str] = ["polling", "websocket"]
+
+    redis_manager: bool = False
+    redis_manager_channel: str = "socketio"
+    node_id: str = Field(default_factory=lambda: f"{socket.gethostname()}:{os.getpid()}")
+
     model_config = SettingsConfigDict(env_prefix="socketio_")
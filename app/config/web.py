@@ -4,3 +4,4 @@ from pydantic_settings import BaseSettings
 class WebSettings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8061
+    workers: int = 1
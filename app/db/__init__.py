@@ -1 +1,11 @@
-from .models import Chat, ChatRelationship, Device, Message, User
+from .models import (
+    CURRENT_XACT_ID,
+    Chat,
+    ChatRelationship,
+    Device,
+    Message,
+    MessageClientId,
+    MessageOutbox,
+    UnreadCountersFlush,
+    User,
+)
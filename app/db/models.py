@@ -15,6 +15,7 @@ from sqlalchemy import (
     UniqueConstraint,
     func,
 )
+from sqlalchemy import text as sql_text
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column, relationship
 from sqlalchemy.schema import MetaData
@@ -23,6 +24,9 @@ from app.db.enums import ChatState, ChatUserRole, MessageType
 
 Base = declarative_base(metadata=MetaData())
 
+# Id of the writing transaction, all transactions with lower ids are finished when it is below snapshot xmin
+CURRENT_XACT_ID = "(pg_current_xact_id()::text::bigint)"
+
 
 class User(Base):  # type: ignore[valid-type, misc]
     __tablename__ = "users"
@@ -39,6 +43,8 @@ class Chat(Base):  # type: ignore[valid-type, misc]
     state: Mapped[ChatState] = mapped_column(Enum(ChatState), nullable=False)
     time_created: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
     time_updated: Mapped[datetime] = mapped_column(DateTime, onupdate=func.now(), nullable=True)
+    last_message_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    last_message_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
 
     recipients = relationship("ChatRelationship", uselist=True, lazy="noload")
 
@@ -54,11 +60,24 @@ class ChatRelationship(Base):  # type: ignore[valid-type, misc]
     unread_counter: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     time_pinned: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     user_role: Mapped[ChatUserRole] = mapped_column(Enum(ChatUserRole), nullable=False)
+    # Copy of chats.last_message_at, so chat list of user is ordered by index
+    last_message_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     chat: Mapped["Chat"] = relationship(lazy="noload")
     user: Mapped["User"] = relationship(lazy="noload")
 
-    __table_args__ = (PrimaryKeyConstraint("user_uid", "chat_id", name="chats_relationships_pk"),)
+    __table_args__ = (
+        PrimaryKeyConstraint("user_uid", "chat_id", name="chats_relationships_pk"),
+        # Same order as chat list, so a page is read from the index without sorting all chats of user
+        Index(
+            "ix_chats_relationships_chat_list",
+            user_uid,
+            state,
+            time_pinned,
+            last_message_at.desc(),
+            chat_id.desc(),
+        ),
+    )
 
 
 class Message(Base):  # type: ignore[valid-type, misc]
@@ -66,10 +85,11 @@ class Message(Base):  # type: ignore[valid-type, misc]
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_uid: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.uid"), nullable=True, index=True)
-    chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False, index=True)
-    client_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), nullable=False, unique=True)
+    chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False)
+    client_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=False)
-    search_text: Mapped[dict] = mapped_column(TSVECTOR, nullable=False)
+    # Filled by app.services.search_indexer, NULL until the message is indexed
+    search_text: Mapped[dict | None] = mapped_column(TSVECTOR, nullable=True)
     type_: Mapped[MessageType] = mapped_column(Enum(MessageType), nullable=False)
     quoted_message: Mapped[dict] = mapped_column(JSONB, nullable=True)
     mentions: Mapped[dict] = mapped_column(JSONB, nullable=True)
@@ -78,18 +98,64 @@ class Message(Base):  # type: ignore[valid-type, misc]
     original_chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=True)
     time_created: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
     time_updated: Mapped[datetime] = mapped_column(DateTime, onupdate=func.now(), nullable=True)
+    # Set again on every edit and deletion, clients catch up on changes after the last seen one
+    change_xid: Mapped[int | None] = mapped_column(BigInteger, server_default=sql_text(CURRENT_XACT_ID), nullable=True)
+
+    __table_args__ = (
+        Index("search_by_message_text", search_text, postgresql_using="gin"),
+        Index("ix_messages_chat_id_id", chat_id, id),
+        Index("ix_messages_chat_id_change_xid", chat_id, change_xid, id),
+        Index("ix_messages_not_indexed", id, postgresql_where=search_text.is_(None)),
+        {"postgresql_partition_by": "RANGE (id)"},
+    )
+
+
+class MessageClientId(Base):  # type: ignore[valid-type, misc]
+    """Idempotency keys of messages, partitioned messages table can not have unique client_id"""
+
+    __tablename__ = "messages_client_ids"
+
+    client_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
 
-    __table_args__ = (Index("search_by_message_text", search_text, postgresql_using="gin"),)
+class MessageOutbox(Base):  # type: ignore[valid-type, misc]
+    """Events of messages written in transaction of the change, sent by dispatcher of app.services.sio"""
+
+    __tablename__ = "messages_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    event_name: Mapped[str] = mapped_column(String(64), nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    # Recipients of offline notifications, only for new messages
+    recipients_uid: Mapped[list | None] = mapped_column(ARRAY(UUID(as_uuid=True)), nullable=True)
+    time_created: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    # Claimed events are leased to a dispatcher, failed ones are retried by any dispatcher when the lease expires
+    attempts: Mapped[int] = mapped_column(Integer, server_default="0", nullable=False)
+    time_next_attempt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+class UnreadCountersFlush(Base):  # type: ignore[valid-type, misc]
+    """Applied batches of unread counters, a batch retried after failure is not added twice"""
+
+    __tablename__ = "unread_counters_flushes"
+
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    time_created: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
 
 class Device(Base):  # type: ignore[valid-type, misc]
     __tablename__ = "devices"
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
-    user_uid: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.uid"), nullable=True, index=True)
+    user_uid: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.uid"), nullable=True)
     token: Mapped[str] = mapped_column(String(256), nullable=False)
     platform: Mapped[str] = mapped_column(String(32), nullable=False)
     time_created: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
     time_updated: Mapped[datetime] = mapped_column(DateTime, onupdate=func.now(), nullable=True)
 
-    __table_args__ = (UniqueConstraint("user_uid", "platform", name="uqp_user_uid_platform"),)
+    __table_args__ = (
+        UniqueConstraint("token", name="uq_devices_token"),
+        Index("ix_devices_user_uid", "user_uid", postgresql_include=["platform", "token"]),
+    )
@@ -0,0 +1,49 @@
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool which counts checkouts, time of waiting for connection and reconnects"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self.connects = 0
+        self.closes = 0
+        event.listen(self, "connect", self._on_connect)
+        event.listen(self, "close", self._on_close)
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        # Includes opening of a new connection when the idle ones are missing or recycled
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_time = time.perf_counter() - start
+            self.checkouts += 1
+            self.checkout_time += checkout_time
+            self.max_checkout_time = max(self.max_checkout_time, checkout_time)
+
+    def _on_connect(self, *args: Any) -> None:
+        self.connects += 1
+
+    def _on_close(self, *args: Any) -> None:
+        self.closes += 1
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": self.size(),
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "checkout_time": round(self.checkout_time, 6),
+            "max_checkout_time": round(self.max_checkout_time, 6),
+            "connects": self.connects,
+            "closes": self.closes,
+        }
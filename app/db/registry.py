@@ -1,17 +1,31 @@
+import asyncio
+from contextlib import suppress
+from itertools import count
 from typing import Callable
 
+from loguru import logger
 from pydantic import PostgresDsn
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.asyncio.engine import AsyncEngine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
-from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app import config
+from app.db.pool import MeteredQueuePool
+
+# Lag is 0 when replica has replayed everything it received, primary itself has no lag
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
 
 
 class _DBRegistry:
     engine: AsyncEngine
+    autocommit_engine: AsyncEngine
     session: Callable[..., Session]
+    replica_engines: list[AsyncEngine]
+    replica_sessions: list[Callable[..., Session]]
 
     def __init__(
         self,
@@ -20,32 +34,99 @@ class _DBRegistry:
         pool_max_overflow: int = config.database.pool_max_overflow,
         pool_recycle: int = config.database.pool_recycle,
         pool_timeout: int = config.database.pool_timeout,
+        prepared_statement_cache_size: int = config.database.prepared_statement_cache_size,
+        replica_dsns: list[PostgresDsn] = config.database.replica_dsns,
     ):
         self.dsn = dsn
         self.pool_size = pool_size
         self.pool_max_overflow = pool_max_overflow
         self.pool_recycle = pool_recycle
         self.pool_timeout = pool_timeout
+        self.prepared_statement_cache_size = prepared_statement_cache_size
+        self.replica_dsns = replica_dsns
         self.base = declarative_base()
+        self.healthy_replicas: list[int] = []
+        self._replicas_counter = count()
+        self._replicas_check_task: asyncio.Task | None = None
 
-    async def setup(self) -> None:
-        self.engine = create_async_engine(
-            str(self.dsn),
-            poolclass=AsyncAdaptedQueuePool,
+    def _create_engine(self, dsn: PostgresDsn) -> AsyncEngine:
+        return create_async_engine(
+            str(dsn),
+            poolclass=MeteredQueuePool,
             pool_size=self.pool_size,
             max_overflow=self.pool_max_overflow,
             pool_recycle=self.pool_recycle,
             pool_timeout=self.pool_timeout,
+            connect_args={"prepared_statement_cache_size": self.prepared_statement_cache_size},
         )
-        self.session = sessionmaker(  # type: ignore[call-overload]
+
+    @staticmethod
+    def _create_sessionmaker(engine: AsyncEngine) -> Callable[..., Session]:
+        return sessionmaker(  # type: ignore[call-overload]
             autocommit=False,
             autoflush=False,
             expire_on_commit=False,
             class_=AsyncSession,
-            bind=self.engine,
+            bind=engine,
         )
 
+    async def setup(self) -> None:
+        self.engine = self._create_engine(self.dsn)
+        # Single statements which are atomic by themselves, without BEGIN and COMMIT round trips
+        self.autocommit_engine = self.engine.execution_options(isolation_level="AUTOCOMMIT")
+        self.session = self._create_sessionmaker(self.engine)
+
+        self.replica_engines = [self._create_engine(dsn) for dsn in self.replica_dsns]
+        self.replica_sessions = [self._create_sessionmaker(engine) for engine in self.replica_engines]
+        if self.replica_engines:
+            await self.check_replicas()
+            self._replicas_check_task = asyncio.create_task(self._check_replicas_periodically())
+
+    def read_session(self, primary: bool = False) -> Session:
+        """Session of the next healthy replica, reads go to primary when there are none"""
+        if primary or not self.healthy_replicas:
+            return self.session()
+        healthy_replicas = self.healthy_replicas
+        return self.replica_sessions[healthy_replicas[next(self._replicas_counter) % len(healthy_replicas)]]()
+
+    def get_pools_stats(self) -> dict[str, dict[str, float]]:
+        engines = {"primary": self.engine} | {
+            f"replica_{index}": engine for index, engine in enumerate(self.replica_engines)
+        }
+        return {name: engine.pool.stats() for name, engine in engines.items()}  # type: ignore[attr-defined]
+
+    async def _get_replica_lag(self, engine: AsyncEngine) -> float:
+        async with engine.connect() as connection:
+            return float((await connection.execute(REPLICA_LAG_QUERY)).scalar_one())
+
+    async def check_replicas(self) -> None:
+        healthy_replicas = []
+        for index, engine in enumerate(self.replica_engines):
+            try:
+                lag = await asyncio.wait_for(self._get_replica_lag(engine), config.database.replica_check_timeout)
+            except Exception as e:
+                logger.warning(f"Replica {index} is not available: {e!r}")
+                continue
+            if lag > config.database.replica_max_lag:
+                logger.warning(f"Replica {index} lags for {lag:.1f} s")
+                continue
+            healthy_replicas.append(index)
+        self.healthy_replicas = healthy_replicas
+
+    async def _check_replicas_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(config.database.replica_check_interval)
+            await self.check_replicas()
+
     async def close(self) -> None:
+        if self._replicas_check_task is not None:
+            self._replicas_check_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._replicas_check_task
+            self._replicas_check_task = None
+        self.healthy_replicas = []
+        for engine in self.replica_engines:
+            await engine.dispose()
         await self.engine.dispose()
 
 
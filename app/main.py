@@ -9,6 +9,18 @@ from uvicorn.loops.uvloop import uvloop_setup
 from app import api, config
 from app.api.exception_handlers import request_validation_exception_handler
 from app.clients import services_close, services_setup
+from app.services.messages_partitions import (
+    start_partitions_maintainer,
+    stop_partitions_maintainer,
+)
+from app.services.nodes import start_heartbeat, stop_heartbeat
+from app.services.search_indexer import start_indexer, stop_indexer
+from app.services.sio import (
+    clear_node_sessions,
+    start_outbox_dispatcher,
+    stop_outbox_dispatcher,
+)
+from app.services.unread_counters import start_flusher, stop_flusher
 from app.sio import sio
 
 uvloop_setup()
@@ -24,6 +36,18 @@ fastapi_app = FastAPI(
 fastapi_app.include_router(api.router, prefix="/api")
 
 fastapi_app.add_event_handler("startup", services_setup)
+fastapi_app.add_event_handler("startup", clear_node_sessions)
+fastapi_app.add_event_handler("startup", start_heartbeat)
+fastapi_app.add_event_handler("startup", start_flusher)
+fastapi_app.add_event_handler("startup", start_indexer)
+fastapi_app.add_event_handler("startup", start_partitions_maintainer)
+fastapi_app.add_event_handler("startup", start_outbox_dispatcher)
+fastapi_app.add_event_handler("shutdown", stop_outbox_dispatcher)
+fastapi_app.add_event_handler("shutdown", stop_partitions_maintainer)
+fastapi_app.add_event_handler("shutdown", stop_indexer)
+fastapi_app.add_event_handler("shutdown", stop_flusher)
+fastapi_app.add_event_handler("shutdown", stop_heartbeat)
+fastapi_app.add_event_handler("shutdown", clear_node_sessions)
 fastapi_app.add_event_handler("shutdown", services_close)
 fastapi_app.add_exception_handler(RequestValidationError, request_validation_exception_handler)
 
@@ -31,7 +55,21 @@ app = ASGIApp(sio, fastapi_app)
 
 
 def main() -> None:
-    uvicorn.run(app, host=config.web.host, port=config.web.port, access_log=True)
+    if config.web.workers > 1:
+        if not config.socketio.redis_manager:
+            raise RuntimeError("Several workers share clients only through redis manager, set SOCKETIO_REDIS_MANAGER")
+        if "node_id" in config.socketio.model_fields_set:
+            # Workers would share sessions of one node, each of them would remove all of them on shutdown
+            raise RuntimeError("Each worker needs its own node id, unset SOCKETIO_NODE_ID to use ids by process")
+        if "polling" in config.socketio.transports:
+            raise RuntimeError("Polling needs sticky sessions which workers on one port do not have")
+        if config.cache.unread_counters_batching and not config.cache.unread_counters_redis:
+            raise RuntimeError(
+                "Workers see pending unread counters of each other only in redis, set CACHE_UNREAD_COUNTERS_REDIS"
+            )
+    uvicorn.run(
+        "app.main:app", host=config.web.host, port=config.web.port, workers=config.web.workers, access_log=True
+    )
 
 
 if __name__ == "__main__":
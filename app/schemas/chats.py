@@ -11,7 +11,15 @@ __all__ = (
     "CreateChatData",
     "CreateChatResponse",
     "Chat",
+    "ChatList",
+    "GetChatListData",
     "ManageRecipientsData",
+    "FoundMessage",
+    "SearchMessagesData",
+    "SearchMessagesResult",
+    "SyncData",
+    "ChangedMessage",
+    "SyncResult",
 )
 
 
@@ -58,14 +66,46 @@ class Recipient(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class LastMessage(BaseModel):
+    id: int
+    user_uid: UUID4 | None
+    text: str
+    type_: MessageType
+    time_created: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class Chat(BaseModel):
     id: int
     state: ChatState
     recipients: list[Recipient]
+    unread_counter: int = 0
+    last_message: LastMessage | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class GetChatListData(BaseModel):
+    from_archive: bool = False
+    cursor: str | None = None
+    page_size: int = config.application.chat_list_page_size
+
+    @field_validator("page_size")
+    def page_size_in_range(cls, page_size: int) -> int:
+        if not 1 <= page_size <= config.application.chat_list_max_page_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"page_size": f"page size must be from 1 to {config.application.chat_list_max_page_size}"},
+            )
+        return page_size
+
+
+class ChatList(BaseModel):
+    chats: list[Chat]
+    cursor: str | None = None
+
+
 class ManageRecipientsData(BaseModel):
     chat_id: int
     contacts: list[UUID4]
@@ -77,7 +117,6 @@ class Message(BaseModel):
     chat_id: int
     client_id: UUID4
     text: str
-    search_text: str
     type_: MessageType
     quoted_message: None
     mentions: None
@@ -96,3 +135,79 @@ class GetMessageHistoryData(BaseModel):
     page_size: int = config.application.message_history_page_size
     look_forward: bool = False
     include_message: bool = False
+
+
+class SearchMessagesData(BaseModel):
+    query: str
+    chat_id: int | None = None
+    cursor: str | None = None
+    page_size: int = config.application.message_search_page_size
+
+    @field_validator("query")
+    def query_contains_only_spaces(cls, query: str) -> str:
+        clear_query = query.strip()
+        if not clear_query:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail={"query": "query must contain characters"}
+            )
+        return clear_query
+
+    @field_validator("page_size")
+    def page_size_in_range(cls, page_size: int) -> int:
+        if not 1 <= page_size <= config.application.message_search_max_page_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"page_size": f"page size must be from 1 to {config.application.message_search_max_page_size}"},
+            )
+        return page_size
+
+
+class FoundMessage(BaseModel):
+    id: int
+    user_uid: UUID4 | None
+    chat_id: int
+    text: str
+    # HTML escaped fragments of text, found words are wrapped in <b></b>
+    snippet: str
+    type_: MessageType
+    time_created: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SearchMessagesResult(BaseModel):
+    messages: list[FoundMessage]
+    cursor: str | None = None
+
+
+class SyncData(BaseModel):
+    cursor: str | None = None
+    page_size: int = config.application.sync_page_size
+
+    @field_validator("page_size")
+    def page_size_in_range(cls, page_size: int) -> int:
+        if not 1 <= page_size <= config.application.sync_max_page_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"page_size": f"page size must be from 1 to {config.application.sync_max_page_size}"},
+            )
+        return page_size
+
+
+class ChangedMessage(BaseModel):
+    id: int
+    user_uid: UUID4 | None
+    chat_id: int
+    text: str
+    type_: MessageType
+    time_created: datetime
+    time_updated: datetime | None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncResult(BaseModel):
+    messages: list[ChangedMessage]
+    # Position after the last returned change, client passes it to the next sync
+    cursor: str | None = None
+    has_more: bool
@@ -6,6 +6,7 @@ from pydantic.types import UUID4
 
 class SioEvents(enum.StrEnum):
     USER_MISSING = "srv:user:missing"
+    USER_BLOCKED = "srv:user:blocked"
     MESSAGE_NEW = "srv:msg:new"
     MESSAGE_CHANGE = "srv:msg:change"
     TYPING = "srv:typing"
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable
+
+from loguru import logger
+from redis.asyncio.client import Pipeline
+from sqlalchemy import delete, event
+
+from app import config, db, sio
+from app.clients import cache, services_close, services_setup
+from app.db.enums import ChatState, ChatUserRole
+from app.db.registry import registry
+from app.services import cache as cache_service
+from app.services import sio as sio_service
+
+
+async def _create_chat(recipients_count: int) -> tuple[int, list[uuid.UUID]]:
+    users_uid = [uuid.uuid4() for _ in range(recipients_count)]
+    async with registry.session() as session:
+        session.add_all([db.User(uid=user_uid, name=str(user_uid)) for user_uid in users_uid])
+        chat = db.Chat(state=ChatState.ACTIVE)
+        session.add(chat)
+        await session.flush()
+        session.add_all(
+            [
+                db.ChatRelationship(
+                    user_uid=user_uid,
+                    chat_id=chat.id,
+                    chat_name="benchmark",
+                    state=ChatState.ACTIVE,
+                    user_role=ChatUserRole.USER,
+                )
+                for user_uid in users_uid
+            ]
+        )
+        await session.commit()
+    return chat.id, users_uid
+
+
+async def _remove_chat(chat_id: int, users_uid: list[uuid.UUID]) -> None:
+    async with registry.session() as session:
+        await session.execute(delete(db.Message).where(db.Message.chat_id == chat_id))
+        await session.execute(delete(db.ChatRelationship).where(db.ChatRelationship.chat_id == chat_id))
+        await session.execute(delete(db.Chat).where(db.Chat.id == chat_id))
+        await session.execute(delete(db.User).where(db.User.uid.in_(users_uid)))
+        await session.commit()
+
+
+def _count_redis_round_trips() -> Callable[[], int]:
+    round_trips = 0
+    execute_command, pipeline_execute = cache.execute_command, Pipeline.execute
+
+    async def count_command(*args, **kwargs):  # type: ignore[no-untyped-def]
+        nonlocal round_trips
+        round_trips += 1
+        return await execute_command(*args, **kwargs)
+
+    async def count_pipeline(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+        nonlocal round_trips
+        round_trips += 1
+        return await pipeline_execute(self, *args, **kwargs)
+
+    cache.execute_command = count_command  # type: ignore[method-assign]
+    Pipeline.execute = count_pipeline  # type: ignore[method-assign]
+    return lambda: round_trips
+
+
+async def _create_message(chat_id: int, user_uid: uuid.UUID, sid: str) -> float:
+    payload = {"sender_id": str(user_uid), "chat_id": chat_id, "client_id": str(uuid.uuid4()), "text": "hi"}
+    start = time.perf_counter()
+    await sio_service.process_create_message(payload, sid)
+    return time.perf_counter() - start
+
+
+async def _send_sequentially(chat_id: int, user_uid: uuid.UUID, sid: str, messages_count: int) -> list[float]:
+    return [await _create_message(chat_id, user_uid, sid) for _ in range(messages_count)]
+
+
+async def _send_with_rate(chat_id: int, user_uid: uuid.UUID, sid: str, rate: int, duration: float) -> list:
+    # Messages are sent every millisecond by groups, so rate does not depend on latency of previous messages
+    tasks: list[asyncio.Task[float]] = []
+    start = time.perf_counter()
+    for tick in range(int(duration * 1000)):
+        sent_count = int((tick + 1) * rate / 1000) - int(tick * rate / 1000)
+        tasks.extend(asyncio.create_task(_create_message(chat_id, user_uid, sid)) for _ in range(sent_count))
+        await asyncio.sleep(max(start + (tick + 1) / 1000 - time.perf_counter(), 0))
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _print_results(results: list, duration: float, statements_count: int, redis_round_trips: int) -> None:
+    latencies = sorted(result for result in results if isinstance(result, float))
+    errors_count = len(results) - len(latencies)
+    if not latencies:
+        print(f"all {errors_count} messages failed")
+        return
+    print(f"DB statements per message: {statements_count / len(results):.2f}")
+    print(f"redis round trips per message: {redis_round_trips / len(results):.2f}")
+    print(f"throughput: {len(latencies) / duration:.0f} msg/s, errors: {errors_count}")
+    print(
+        f"latency p50: {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+        f"p99: {latencies[-len(latencies) // 100 - 1] * 1000:.2f} ms"
+    )
+
+
+async def benchmark(messages_count: int, recipients_count: int, rates: list[int], duration: float) -> None:
+    await services_setup()
+    chat_id, users_uid = await _create_chat(recipients_count)
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(users_uid[0]), sid)
+
+    statements: list[str] = []
+    event.listen(registry.engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    get_redis_round_trips = _count_redis_round_trips()
+
+    try:
+        print(f"batching: {config.database.messages_batching}, recipients: {recipients_count}")
+        if rates:
+            for rate in rates:
+                statements_count, redis_round_trips = len(statements), get_redis_round_trips()
+                start = time.perf_counter()
+                results = await _send_with_rate(chat_id, users_uid[0], sid, rate, duration)
+                print(f"rate: {rate} msg/s")
+                _print_results(
+                    results,
+                    time.perf_counter() - start,
+                    len(statements) - statements_count,
+                    get_redis_round_trips() - redis_round_trips,
+                )
+        else:
+            start = time.perf_counter()
+            results = await _send_sequentially(chat_id, users_uid[0], sid, messages_count)
+            print(f"messages: {messages_count}")
+            _print_results(results, time.perf_counter() - start, len(statements), get_redis_round_trips())
+    finally:
+        await cache_service.remove_sid_cache(sid)
+        await _remove_chat(chat_id, users_uid)
+        await services_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of new message write path, run it only on test DB")
+    parser.add_argument("--messages", type=int, default=1000, help="send messages one by one")
+    parser.add_argument("--recipients", type=int, default=100)
+    parser.add_argument("--rates", type=int, nargs="*", default=[], help="send messages with rates, msg/s")
+    parser.add_argument("--duration", type=float, default=1, help="duration of every rate, s")
+    parser.add_argument("--batching", action="store_true", help="insert messages by batches")
+    args = parser.parse_args()
+    config.database.messages_batching = args.batching
+    # Logs of every message would be measured instead of the write path
+    logger.remove()
+    sio.sio.logger.setLevel(logging.WARNING)
+    asyncio.run(benchmark(args.messages, args.recipients, args.rates, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import time
+import uuid
+
+from loguru import logger
+from sqlalchemy import delete, text
+
+from app import config, db
+from app.db.enums import ChatState, ChatUserRole
+from app.db.registry import _DBRegistry
+from app.schemas import chats as s_chat
+from app.services import chats as chats_service
+
+# Knee is the concurrency after which throughput grows by less than this ratio
+KNEE_THRESHOLD = 1.1
+
+
+async def _create_chat(pool_registry: _DBRegistry, messages_count: int) -> tuple[int, uuid.UUID]:
+    user_uid = uuid.uuid4()
+    async with pool_registry.session() as session:
+        session.add(db.User(uid=user_uid, name=str(user_uid)))
+        chat = db.Chat(state=ChatState.ACTIVE)
+        session.add(chat)
+        await session.flush()
+        session.add(
+            db.ChatRelationship(
+                user_uid=user_uid,
+                chat_id=chat.id,
+                chat_name="benchmark",
+                state=ChatState.ACTIVE,
+                user_role=ChatUserRole.USER,
+            )
+        )
+        await session.commit()
+    async with pool_registry.autocommit_engine.connect() as connection:
+        await connection.execute(
+            text(
+                "INSERT INTO messages (user_uid, chat_id, client_id, text, type_, time_created) "
+                "SELECT :user_uid, :chat_id, gen_random_uuid(), 'message ' || g, 'FROM_USER', now() "
+                "FROM generate_series(1, :count) g"
+            ),
+            {"user_uid": user_uid, "chat_id": chat.id, "count": messages_count},
+        )
+    return chat.id, user_uid
+
+
+async def _remove_chat(pool_registry: _DBRegistry, chat_id: int, user_uid: uuid.UUID) -> None:
+    async with pool_registry.session() as session:
+        await session.execute(delete(db.Message).where(db.Message.chat_id == chat_id))
+        await session.execute(delete(db.ChatRelationship).where(db.ChatRelationship.chat_id == chat_id))
+        await session.execute(delete(db.Chat).where(db.Chat.id == chat_id))
+        await session.execute(delete(db.User).where(db.User.uid == user_uid))
+        await session.commit()
+
+
+async def _read_history(pool_registry: _DBRegistry, chat_id: int, user_uid: uuid.UUID, deadline: float) -> list:
+    latencies: list[float | Exception] = []
+    while time.perf_counter() < deadline:
+        data = s_chat.GetMessageHistoryData(chat_id=chat_id, message_id=0)
+        start = time.perf_counter()
+        try:
+            async with pool_registry.session() as session:
+                (await session.execute(chats_service._get_message_history_query(data, user_uid))).all()
+        except Exception as e:
+            latencies.append(e)
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def _run_load(
+    pool_registry: _DBRegistry, chat_id: int, user_uid: uuid.UUID, concurrency: int, duration: float
+) -> float:
+    stats = pool_registry.get_pools_stats()["primary"]
+    deadline = time.perf_counter() + duration
+    results = await asyncio.gather(
+        *[_read_history(pool_registry, chat_id, user_uid, deadline) for _ in range(concurrency)]
+    )
+    new_stats = pool_registry.get_pools_stats()["primary"]
+
+    latencies = sorted(result for worker_results in results for result in worker_results if isinstance(result, float))
+    errors_count = sum(len(worker_results) for worker_results in results) - len(latencies)
+    checkouts = new_stats["checkouts"] - stats["checkouts"]
+    checkout_time = (new_stats["checkout_time"] - stats["checkout_time"]) / checkouts if checkouts else 0
+    throughput = len(latencies) / duration
+    p99 = latencies[-len(latencies) // 100 - 1] * 1000 if latencies else 0
+    print(
+        f"  concurrency: {concurrency}, throughput: {throughput:.0f} q/s, p99: {p99:.2f} ms, "
+        f"checkout wait: {checkout_time * 1000:.2f} ms, connects: {new_stats['connects'] - stats['connects']}, "
+        f"errors: {errors_count}"
+    )
+    return throughput
+
+
+async def benchmark(pools: list[str], concurrency_levels: list[int], duration: float, recycle: int) -> None:
+    for pool in pools:
+        pool_size, pool_max_overflow = map(int, pool.split(":"))
+        pool_registry = _DBRegistry(
+            config.database.dsn, pool_size=pool_size, pool_max_overflow=pool_max_overflow, pool_recycle=recycle
+        )
+        await pool_registry.setup()
+        chat_id, user_uid = await _create_chat(pool_registry, 1000)
+        print(f"pool size: {pool_size}, max overflow: {pool_max_overflow}, recycle: {recycle}")
+        try:
+            knee, best_throughput, previous_throughput, previous_concurrency = None, 0.0, 0.0, 0
+            for concurrency in concurrency_levels:
+                throughput = await _run_load(pool_registry, chat_id, user_uid, concurrency, duration)
+                if knee is None and previous_throughput and throughput < previous_throughput * KNEE_THRESHOLD:
+                    knee = previous_concurrency
+                previous_throughput, previous_concurrency = throughput, concurrency
+                best_throughput = max(best_throughput, throughput)
+            print(f"  throughput knee: {knee if knee is not None else 'not reached'}, best: {best_throughput:.0f} q/s")
+        finally:
+            await _remove_chat(pool_registry, chat_id, user_uid)
+            await pool_registry.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of DB connection pool, run it only on test DB")
+    parser.add_argument("--pools", nargs="*", default=["5:5", "10:10", "20:20"], help="pool_size:max_overflow")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32, 64, 128])
+    parser.add_argument("--duration", type=float, default=2, help="duration of every concurrency level, s")
+    parser.add_argument("--recycle", type=int, default=config.database.pool_recycle, help="pool recycle, s")
+    args = parser.parse_args()
+    logger.remove()
+    asyncio.run(benchmark(args.pools, args.concurrency, args.duration, args.recycle))
+
+
+if __name__ == "__main__":
+    main()
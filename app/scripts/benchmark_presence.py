@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from app.clients import cache
+from app.services import cache as cache_service
+from app.services import sio as sio_service
+
+
+async def _create_sessions(users_uid: list[str]) -> None:
+    pipe = cache.pipeline()
+    for user_uid in users_uid:
+        pipe.sadd(f"{cache_service.SID_BY_USER_ID_KEY_PREFIX}{user_uid}", str(uuid.uuid4()))
+    await pipe.execute()
+
+
+async def _remove_sessions(users_uid: list[str]) -> None:
+    await cache.delete(*[f"{cache_service.SID_BY_USER_ID_KEY_PREFIX}{user_uid}" for user_uid in users_uid])
+
+
+async def _get_offline_by_pipeline(recipients_uid: list[str]) -> list[str]:
+    # Previous lookup, a command per recipient and filtering of sessions in python
+    pipe = cache.pipeline()
+    for user_uid in recipients_uid:
+        pipe.smembers(f"{cache_service.SID_BY_USER_ID_KEY_PREFIX}{user_uid}")
+    recipients_sid = await pipe.execute()
+    return [user_uid for user_uid, sessions in zip(recipients_uid, recipients_sid) if sessions == set()]
+
+
+async def _get_offline_by_script(recipients_uid: list[str]) -> list[str]:
+    return await cache_service.get_offline_users(recipients_uid)
+
+
+async def _get_offline_by_local_cache(recipients_uid: list[str]) -> list[str]:
+    return await sio_service._get_offline_recipients_uid(recipients_uid)
+
+
+async def _measure(
+    get_offline: Callable[[list[str]], Awaitable[list[str]]], users_uid: list[str], repeats: int
+) -> float:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await get_offline(users_uid)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[repeats // 2]
+
+
+async def benchmark(recipients: list[int], online_share: float, repeats: int) -> None:
+    try:
+        for recipients_count in recipients:
+            users_uid = [str(uuid.uuid4()) for _ in range(recipients_count)]
+            online_users_uid = users_uid[: int(recipients_count * online_share)]
+            await _create_sessions(online_users_uid)
+            try:
+                pipeline_latency = await _measure(_get_offline_by_pipeline, users_uid, repeats)
+                script_latency = await _measure(_get_offline_by_script, users_uid, repeats)
+                local_latency = await _measure(_get_offline_by_local_cache, users_uid, repeats)
+            finally:
+                await _remove_sessions(online_users_uid)
+                sio_service.presence_cache.clear()
+            print(
+                f"recipients: {recipients_count}, pipeline p50: {pipeline_latency * 1000:.3f} ms, "
+                f"script p50: {script_latency * 1000:.3f} ms, local cache p50: {local_latency * 1000:.3f} ms"
+            )
+    finally:
+        await cache.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of offline recipients lookup in redis")
+    parser.add_argument("--recipients", type=int, nargs="*", default=[10, 1000, 10000], help="recipients per message")
+    parser.add_argument("--online-share", type=float, default=0.5, help="share of recipients with sessions")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.recipients, args.online_share, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
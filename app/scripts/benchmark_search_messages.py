@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import time
+import uuid
+
+from loguru import logger
+from sqlalchemy import delete, text
+
+from app import db
+from app.clients import services_close, services_setup
+from app.db.enums import ChatState, ChatUserRole
+from app.db.registry import registry
+from app.schemas import chats as s_chat
+from app.services import chats as chats_service
+from app.services import messages_partitions
+
+INSERT_BATCH_SIZE = 100_000
+
+# Words of synthetic texts are w0, w1, ..., low numbers are much more frequent like in natural language
+INSERT_MESSAGES_QUERY = text(
+    "INSERT INTO messages (user_uid, chat_id, client_id, text, search_text, type_, time_created) "
+    "SELECT :user_uid, (CAST(:chats_id AS bigint[]))[1 + g % :chats_count], gen_random_uuid(), t.text, "
+    "to_tsvector(t.text), 'FROM_USER', now() FROM generate_series(1, :count) g, "
+    "LATERAL (SELECT string_agg('w' || floor(power(random(), 4) * :vocabulary)::int, ' ') AS text "
+    "FROM generate_series(1, 5 + g % 10)) t"
+)
+
+
+async def _create_chats(chats_count: int) -> tuple[list[int], uuid.UUID]:
+    user_uid = uuid.uuid4()
+    async with registry.session() as session:
+        session.add(db.User(uid=user_uid, name=str(user_uid)))
+        chats = [db.Chat(state=ChatState.ACTIVE) for _ in range(chats_count)]
+        session.add_all(chats)
+        await session.flush()
+        session.add_all(
+            [
+                db.ChatRelationship(
+                    user_uid=user_uid,
+                    chat_id=chat.id,
+                    chat_name="benchmark",
+                    state=ChatState.ACTIVE,
+                    user_role=ChatUserRole.USER,
+                )
+                for chat in chats
+            ]
+        )
+        await session.commit()
+    return [chat.id for chat in chats], user_uid
+
+
+async def _create_messages(chats_id: list[int], user_uid: uuid.UUID, messages_count: int, vocabulary: int) -> None:
+    await messages_partitions.create_partitions(
+        ahead=messages_count // messages_partitions.config.database.messages_partition_size + 1
+    )
+    start = time.perf_counter()
+    for inserted_count in range(0, messages_count, INSERT_BATCH_SIZE):
+        async with registry.autocommit_engine.connect() as connection:
+            await connection.execute(
+                INSERT_MESSAGES_QUERY,
+                {
+                    "user_uid": user_uid,
+                    "chats_id": chats_id,
+                    "chats_count": len(chats_id),
+                    "count": min(INSERT_BATCH_SIZE, messages_count - inserted_count),
+                    "vocabulary": vocabulary,
+                },
+            )
+        print(f"inserted {min(inserted_count + INSERT_BATCH_SIZE, messages_count)} messages", end="\r")
+    async with registry.autocommit_engine.connect() as connection:
+        # Vacuum moves new entries from the pending list of GIN index to its tree, as autovacuum does later
+        await connection.execute(text("VACUUM ANALYZE messages"))
+        await connection.execute(text("ANALYZE chats_relationships"))
+    print(f"corpus of {messages_count} messages is created in {time.perf_counter() - start:.0f} s")
+
+
+async def _remove_corpus(chats_id: list[int], user_uid: uuid.UUID) -> None:
+    async with registry.session() as session:
+        await session.execute(delete(db.Message).where(db.Message.chat_id.in_(chats_id)))
+        await session.execute(delete(db.ChatRelationship).where(db.ChatRelationship.chat_id.in_(chats_id)))
+        await session.execute(delete(db.Chat).where(db.Chat.id.in_(chats_id)))
+        await session.execute(delete(db.User).where(db.User.uid == user_uid))
+        await session.commit()
+
+
+async def _measure(
+    data: s_chat.SearchMessagesData, user_uid: uuid.UUID, repeats: int
+) -> tuple[list[float], str | None]:
+    latencies, cursor = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cursor = (await chats_service.search_messages(data, user_uid)).cursor
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), cursor
+
+
+async def benchmark(messages_count: int, chats_count: int, vocabulary: int, queries: list[str], repeats: int) -> None:
+    await services_setup()
+    chats_id, user_uid = await _create_chats(chats_count)
+    try:
+        await _create_messages(chats_id, user_uid, messages_count, vocabulary)
+        for query in queries:
+            for chat_id in (None, chats_id[0]):
+                data = s_chat.SearchMessagesData(query=query, chat_id=chat_id)
+                latencies, cursor = await _measure(data, user_uid, repeats)
+                next_page_latencies, _ = await _measure(data.model_copy(update={"cursor": cursor}), user_uid, repeats)
+                print(
+                    f"query: {query!r}, {'one chat' if chat_id else 'all chats'}, "
+                    f"first page p50: {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+                    f"next page p50: {next_page_latencies[len(next_page_latencies) // 2] * 1000:.1f} ms"
+                )
+    finally:
+        await _remove_corpus(chats_id, user_uid)
+        await services_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark of message search on synthetic corpus, run it only on test DB"
+    )
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--chats", type=int, default=1000, help="chats of the user, messages are spread evenly")
+    parser.add_argument("--vocabulary", type=int, default=50_000, help="distinct words of synthetic texts")
+    parser.add_argument("--queries", nargs="*", default=["w1", "w300", "w20000", '"w1 w2"', "w1 -w2"])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    logger.remove()
+    asyncio.run(benchmark(args.messages, args.chats, args.vocabulary, args.queries, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
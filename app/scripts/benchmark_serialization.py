@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Mapping
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.db.enums import ChatState, ChatUserRole, MessageType
+from app.schemas import chats as s_chat
+from app.services import chats as chats_service
+
+
+def _get_rows(rows_count: int) -> list[dict[str, Any]]:
+    user_uid = uuid.uuid4()
+    return [
+        {
+            "id": message_id,
+            "user_uid": user_uid,
+            "chat_id": 1,
+            "client_id": uuid.uuid4(),
+            "text": f"Hey, are we still meeting tomorrow at the office near central station? {message_id}",
+            "type_": MessageType.FROM_USER,
+            "quoted_message": None,
+            "mentions": None,
+            "links": None,
+            "original_id": None,
+            "original_chat_id": None,
+            "time_created": datetime.utcnow(),
+            "time_updated": None,
+        }
+        for message_id in range(rows_count)
+    ]
+
+
+def _get_chat_list_page(rows_count: int) -> chats_service.ChatListPage:
+    chats: list[dict[str, Any]] = [
+        {
+            "id": chat_id,
+            "state": ChatState.ACTIVE,
+            "unread_counter": chat_id % 10,
+            "time_pinned": None,
+            "last_message_at": datetime.utcnow(),
+            "last_message_id": chat_id,
+            "last_message_user_uid": uuid.uuid4(),
+            "last_message_text": f"Hey, are we still meeting tomorrow at the office near central station? {chat_id}",
+            "last_message_type_": MessageType.FROM_USER,
+            "last_message_time_created": datetime.utcnow(),
+        }
+        for chat_id in range(rows_count)
+    ]
+    recipients_preview: dict[int, list[Mapping[str, Any]]] = {
+        chat_id: [
+            {
+                "chat_id": chat_id,
+                "user_uid": uuid.uuid4(),
+                "chat_name": f"Chat {chat_id}",
+                "state": ChatState.ACTIVE,
+                "user_role": ChatUserRole.USER,
+                "user_name": f"User {position}",
+            }
+            for position in range(3)
+        ]
+        for chat_id in range(rows_count)
+    }
+    unread_counters = {chat_id: chat_id % 10 for chat_id in range(rows_count)}
+    return chats_service.ChatListPage(chats, recipients_preview, unread_counters, None)
+
+
+async def _serialize_chat_list(page: chats_service.ChatListPage) -> bytes:
+    chat_list = chats_service.build_chat_list(page)
+    field = create_response_field(name="response", type_=s_chat.ChatList)
+    content = await serialize_response(field=field, response_content=chat_list)
+    return JSONResponse(content=content).body
+
+
+async def _serialize_chat_list_fast(page: chats_service.ChatListPage) -> bytes:
+    return chats_service.dump_chat_list_json(page)
+
+
+async def _serialize(rows: list[dict[str, Any]]) -> bytes:
+    # The same steps as FastAPI does for the return annotation of endpoint
+    messages = [s_chat.Message.model_validate(row) for row in rows]
+    field = create_response_field(name="response", type_=list[s_chat.Message])
+    content = await serialize_response(field=field, response_content=messages)
+    return JSONResponse(content=content).body
+
+
+async def _serialize_fast(rows: list[dict[str, Any]]) -> bytes:
+    return chats_service.messages_adapter.dump_json([s_chat.Message.model_construct(**row) for row in rows])
+
+
+async def _measure(serialize: Callable[[Any], Awaitable[bytes]], rows: Any, repeats: int) -> float:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await serialize(rows)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[repeats // 2]
+
+
+async def benchmark(pages: list[int], repeats: int) -> None:
+    for rows_count in pages:
+        rows = _get_rows(rows_count)
+        latency = await _measure(_serialize, rows, repeats)
+        fast_latency = await _measure(_serialize_fast, rows, repeats)
+        print(
+            f"message history rows: {rows_count}, default p50: {latency * 1000:.3f} ms, "
+            f"fast p50: {fast_latency * 1000:.3f} ms, speedup: {latency / fast_latency:.1f}x"
+        )
+        page = _get_chat_list_page(rows_count)
+        latency = await _measure(_serialize_chat_list, page, repeats)
+        fast_latency = await _measure(_serialize_chat_list_fast, page, repeats)
+        print(
+            f"chat list rows: {rows_count}, default p50: {latency * 1000:.3f} ms, "
+            f"fast p50: {fast_latency * 1000:.3f} ms, speedup: {latency / fast_latency:.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark of message history and chat list serialization without DB")
+    parser.add_argument("--pages", type=int, nargs="*", default=[20, 100, 1000], help="rows per page")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.pages, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
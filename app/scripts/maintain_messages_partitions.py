@@ -0,0 +1,27 @@
+import argparse
+import asyncio
+
+from app.clients import services_close, services_setup
+from app.services import messages_partitions
+
+
+async def maintain(ahead: int, keep: int | None) -> None:
+    await services_setup()
+    try:
+        await messages_partitions.create_partitions(ahead)
+        if keep is not None:
+            await messages_partitions.detach_partitions(keep)
+    finally:
+        await services_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create next partitions of messages and detach old ones")
+    parser.add_argument("--ahead", type=int, default=2, help="partitions to keep ready after the current id")
+    parser.add_argument("--keep", type=int, default=None, help="full partitions to keep attached, others are detached")
+    args = parser.parse_args()
+    asyncio.run(maintain(args.ahead, args.keep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+
+from app.clients import services_close, services_setup
+from app.services import push
+
+
+async def run(consumer: str) -> None:
+    await services_setup()
+    try:
+        await push.run_worker(consumer)
+    finally:
+        await services_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deliver push notifications to offline recipients")
+    # Pending notifications of a consumer are read again only by the same name after restart
+    parser.add_argument("--consumer", required=True, help="stable name of the worker in the queue, e.g. push-1")
+    args = parser.parse_args()
+    asyncio.run(run(args.consumer))
+
+
+if __name__ == "__main__":
+    main()
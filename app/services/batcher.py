@@ -0,0 +1,74 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class Batcher(Generic[T, R]):
+    """Collects items submitted within max_delay or up to max_size and handles them by one call"""
+
+    def __init__(
+        self,
+        handler: Callable[[list[T]], Awaitable[list[R]]],
+        max_size: int,
+        max_delay: float,
+        split_on: tuple[type[Exception], ...] = (),
+    ):
+        self.handler = handler
+        self.max_size = max_size
+        self.max_delay = max_delay
+        # Batches failed by these errors are handled again item by item, so an item fails only by own error.
+        # Handler must not change anything when it fails
+        self.split_on = split_on
+        self._items: list[T] = []
+        self._futures: list[asyncio.Future[R]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[R] = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        task = asyncio.create_task(self._handle(items, futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, items: list[T], futures: list[asyncio.Future[R]]) -> None:
+        try:
+            results = await self.handler(items)
+        except self.split_on as e:
+            if len(items) == 1:
+                self._fail(futures, e)
+                return
+            logger.warning(f"Batch of {len(items)} items is failed, items are handled one by one: {e!r}")
+            for item, future in zip(items, futures):
+                await self._handle([item], [future])
+            return
+        except Exception as e:
+            self._fail(futures, e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _fail(self, futures: list[asyncio.Future[R]], e: Exception) -> None:
+        logger.opt(exception=e).error(f"Batch of {len(futures)} items is failed")
+        for future in futures:
+            if not future.done():
+                future.set_exception(e)
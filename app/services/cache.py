@@ -1,38 +1,337 @@
+import enum
+import json
+import uuid
+import zlib
+from typing import Sequence
+
 from loguru import logger
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ResponseError
 
 from app import config
 from app.clients import cache
 
 SID_BY_USER_ID_KEY_PREFIX = "SID_BY_USER_ID:"
 USER_ID_BY_SID_KEY_PREFIX = "USER_ID_BY_SID:"
-ONLINE_USER_KEY = "ONLINE_USER_KEY"
+ONLINE_USERS_KEY_PREFIX = "ONLINE_USERS:"
+PRESENCE_EVENTS_KEY = "PRESENCE_EVENTS"
+NODE_BY_SID_KEY_PREFIX = "NODE_BY_SID:"
+USER_ID_BY_SID_BY_NODE_KEY_PREFIX = "USER_ID_BY_SID_BY_NODE:"
+NODE_KEY_PREFIX = "NODE:"
+NODES_KEY = "NODES"
+NODE_REAPING_LOCK_KEY_PREFIX = "NODE_REAPING_LOCK:"
+USER_STATE_KEY_PREFIX = "USER_STATE:"
+UNREAD_COUNTERS_KEY = "UNREAD_COUNTERS"
+UNREAD_COUNTERS_IN_FLIGHT_KEY = "UNREAD_COUNTERS_IN_FLIGHT"
+UNREAD_COUNTERS_FLUSH_ID_FIELD = "flush_id"
+UNREAD_COUNTERS_LOCK_KEY = "UNREAD_COUNTERS_LOCK"
+RECENT_WRITE_KEY_PREFIX = "RECENT_WRITE:"
+PUSH_QUEUE_KEY = "PUSH_QUEUE"
+PUSH_QUEUE_GROUP = "push"
+PUSH_COALESCING_KEY_PREFIX = "PUSH_COALESCING:"
+PUSH_COALESCING_DUE_KEY = "PUSH_COALESCING_DUE"
+PUSH_COALESCING_SENDING_KEY = "PUSH_COALESCING_SENDING"
+PUSH_LIMITED_ENTRY_KEY_PREFIX = "PUSH_LIMITED_ENTRY:"
+# Notifications decided for a queue entry are kept until it is acknowledged, at most this time, ms
+PUSH_LIMITED_ENTRY_LIFETIME = 24 * 3600 * 1000
+PUSH_RATE_LIMIT_KEY_PREFIX = "PUSH_RATE_LIMIT:"
+
+# Pending deltas become in-flight as a whole with their flush id, in-flight deltas of a failed flush are kept,
+# so they are applied again with the same id
+# Flush id is kept in the hash before it is renamed, a hash without one (e.g. left by older versions) gets a new id,
+# which is stored, so a failed flush of it is retried with the same id
+_START_UNREAD_COUNTERS_FLUSH_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[2])
+end
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# Flush id and deltas are written in one step, so a flush never takes deltas without their id
+_INCREMENT_UNREAD_COUNTERS_SCRIPT = """
+redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2])
+for i = 3, #ARGV do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], 1)
+end
+"""
+
+_FINISH_UNREAD_COUNTERS_FLUSH_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+# Presence of all recipients is checked in one round trip instead of a command per recipient
+_GET_OFFLINE_USERS_SCRIPT = """
+local offline = {}
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 0 then
+        offline[#offline + 1] = ARGV[i]
+    end
+end
+return offline
+"""
+
+# Set of sids is the reference count of user sessions, user is online while any of devices is connected.
+# Changes of presence are published to the stream in the same step, so events follow each other in right order.
+# Online set is checked instead of the count, so a user whose sids expired still gets offline event once.
+_ADD_SID_SCRIPT = """
+redis.call('SADD', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if redis.call('SADD', KEYS[2], ARGV[2]) == 1 then
+    redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[4], '*', 'user_uid', ARGV[2], 'state', 'online')
+end
+"""
+
+_REMOVE_SID_SCRIPT = """
+redis.call('SREM', KEYS[1], ARGV[1])
+if redis.call('SCARD', KEYS[1]) == 0 and redis.call('SREM', KEYS[2], ARGV[2]) == 1 then
+    redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[3], '*', 'user_uid', ARGV[2], 'state', 'offline')
+end
+"""
+
+
+class PresenceState(enum.StrEnum):
+    ONLINE = "online"
+    OFFLINE = "offline"
+
+
+# Token bucket of user notifications, ARGV[1..7] of scripts below are now (ms), window (ms), rate (1/s), burst,
+# prefixes of coalescing and rate limit keys, and claim idle time (ms) after which a notification being sent is retried
+_TAKE_PUSH_TOKEN_FUNCTION = """
+local function take_token(key, now, rate, burst)
+    local bucket = redis.call('HMGET', key, 'tokens', 'time')
+    local tokens = math.min(burst, (tonumber(bucket[1]) or burst) + (now - (tonumber(bucket[2]) or now)) * rate / 1000)
+    local taken = tokens >= 1
+    if taken then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'time', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+    return taken
+end
+local now, window, rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local claim_idle = tonumber(ARGV[7])
+-- Coalescing state outlives its window and the lease of its notification being sent
+local lifetime = 2 * window + claim_idle + 1000
+"""
+
+# Notification of (user, chat) is sent at once and opens a window, messages within the window or over rate limit
+# are counted and sent as one notification when the window is over. Keys of users are built here from prefixes.
+# Notifications to send are kept by queue entry until it is acknowledged, so a retried entry is not counted again.
+_COALESCE_PUSH_NOTIFICATIONS_SCRIPT = (
+    _TAKE_PUSH_TOKEN_FUNCTION
+    + """
+local limited_prefix, limited_lifetime, entries_count = ARGV[8], ARGV[9], tonumber(ARGV[10])
+local sent_by_entry = {}
+for i = 11, 10 + entries_count do
+    sent_by_entry[ARGV[i]] = {}
+end
+local sent = {}
+for i = 11 + entries_count, #ARGV, 6 do
+    local user_uid, chat_id = ARGV[i], ARGV[i + 1]
+    local member = user_uid .. ':' .. chat_id
+    local key = ARGV[5] .. member
+    local window_end = tonumber(redis.call('HGET', key, 'window_end')) or 0
+    if window_end <= now and take_token(ARGV[6] .. user_uid, now, rate, burst) then
+        redis.call('HSET', key, 'window_end', now + window, 'count', 0)
+        for j = i, i + 4 do
+            sent[#sent + 1] = ARGV[j]
+            table.insert(sent_by_entry[ARGV[i + 5]], ARGV[j])
+        end
+    else
+        if window_end <= now then
+            window_end = now + window
+            redis.call('HSET', key, 'window_end', window_end)
+        end
+        redis.call('HINCRBY', key, 'count', ARGV[i + 4])
+        redis.call('HSET', key, 'message_id', ARGV[i + 2], 'text', ARGV[i + 3])
+        redis.call('ZADD', KEYS[1], window_end, member)
+    end
+    redis.call('PEXPIRE', key, lifetime)
+end
+for entry_id, fields in pairs(sent_by_entry) do
+    redis.call('SET', limited_prefix .. entry_id, cjson.encode(fields), 'PX', limited_lifetime)
+end
+return sent
+"""
+)
+
+# Sent notifications are leased in KEYS[2] until acknowledged, counts of leases older than claim idle time
+# are returned, so a notification whose delivery failed is sent again
+_POP_DUE_PUSH_NOTIFICATIONS_SCRIPT = (
+    _TAKE_PUSH_TOKEN_FUNCTION
+    + """
+for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - claim_idle)) do
+    local key = ARGV[5] .. member
+    redis.call('HINCRBY', key, 'count', tonumber(redis.call('HGET', key, 'sending_count')) or 0)
+    redis.call('HDEL', key, 'sending_count')
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZADD', KEYS[1], 'LT', now, member)
+end
+local sent = {}
+for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, ARGV[8])) do
+    local key = ARGV[5] .. member
+    local pending = redis.call('HMGET', key, 'count', 'message_id', 'text')
+    local separator = string.find(member, ':', 1, true)
+    local user_uid = string.sub(member, 1, separator - 1)
+    if (tonumber(pending[1]) or 0) == 0 then
+        redis.call('ZREM', KEYS[1], member)
+    elseif take_token(ARGV[6] .. user_uid, now, rate, burst) then
+        sent[#sent + 1] = user_uid
+        sent[#sent + 1] = string.sub(member, separator + 1)
+        sent[#sent + 1] = pending[2]
+        sent[#sent + 1] = pending[3]
+        sent[#sent + 1] = pending[1]
+        redis.call('HINCRBY', key, 'sending_count', pending[1])
+        redis.call('HSET', key, 'window_end', now + window, 'count', 0)
+        redis.call('PEXPIRE', key, lifetime)
+        redis.call('ZREM', KEYS[1], member)
+        redis.call('ZADD', KEYS[2], now, member)
+    else
+        redis.call('HSET', key, 'window_end', now + window)
+        redis.call('PEXPIRE', key, lifetime)
+        redis.call('ZADD', KEYS[1], now + window, member)
+    end
+end
+return sent
+"""
+)
+
+_ACK_DUE_PUSH_NOTIFICATIONS_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    local key = ARGV[1] .. ARGV[i]
+    if redis.call('HEXISTS', key, 'sending_count') == 1
+        and redis.call('HINCRBY', key, 'sending_count', -ARGV[i + 1]) <= 0 then
+        redis.call('HDEL', key, 'sending_count')
+        redis.call('ZREM', KEYS[1], ARGV[i])
+    end
+end
+"""
+
+
+# Events of a sid always come to the node which owns it, so its user is known without redis
+local_user_uid_by_sid: dict[str, str] = {}
 
 
 async def create_sid_cache(user_uid: str, sid: str) -> None:
     pipe = cache.pipeline()
+    _add_sid(pipe, config.socketio.node_id, sid, user_uid)
+    await pipe.execute()
+    local_user_uid_by_sid[sid] = user_uid
 
-    pipe.sadd(f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}", sid)
-    pipe.expire(f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}", config.cache.user_sid_cache_lifetime)
+
+def _add_sid(pipe: Pipeline, node_id: str, sid: str, user_uid: str) -> None:
+    pipe.eval(
+        _ADD_SID_SCRIPT,
+        3,
+        f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}",
+        _get_online_users_key(user_uid),
+        PRESENCE_EVENTS_KEY,
+        sid,
+        user_uid,
+        config.cache.user_sid_cache_lifetime,
+        config.cache.presence_events_maxlen,
+    )
 
     pipe.set(f"{USER_ID_BY_SID_KEY_PREFIX}{sid}", user_uid, ex=config.cache.user_sid_cache_lifetime)
 
-    pipe.sadd(ONLINE_USER_KEY, user_uid)
-    await pipe.execute()
+    pipe.set(f"{NODE_BY_SID_KEY_PREFIX}{sid}", node_id, ex=config.cache.user_sid_cache_lifetime)
+    # Sessions of node do not expire, they are removed by the node itself or by reaping when it is dead
+    pipe.hset(f"{USER_ID_BY_SID_BY_NODE_KEY_PREFIX}{node_id}", sid, user_uid)
+    pipe.sadd(NODES_KEY, node_id)
 
 
 async def remove_sid_cache(sid: str) -> None:
-    user_uid = await get_user_uid_by_sid(sid)
+    user_uid, node_id = await cache.mget(f"{USER_ID_BY_SID_KEY_PREFIX}{sid}", f"{NODE_BY_SID_KEY_PREFIX}{sid}")
     logger.debug(f"User Id from cache: {user_uid}")
     pipe = cache.pipeline()
-    pipe.delete(f"{USER_ID_BY_SID_KEY_PREFIX}{sid}")
+    _remove_sid(pipe, sid, user_uid)
+    if node_id:
+        pipe.hdel(f"{USER_ID_BY_SID_BY_NODE_KEY_PREFIX}{node_id}", sid)
+    await pipe.execute()
+
+
+async def remove_node_sid_cache(node_id: str) -> None:
+    user_uid_by_sid = await cache.hgetall(f"{USER_ID_BY_SID_BY_NODE_KEY_PREFIX}{node_id}")
+    pipe = cache.pipeline()
+    for sid, user_uid in user_uid_by_sid.items():
+        _remove_sid(pipe, sid, user_uid)
+    pipe.delete(f"{USER_ID_BY_SID_BY_NODE_KEY_PREFIX}{node_id}", f"{NODE_KEY_PREFIX}{node_id}")
+    pipe.srem(NODES_KEY, node_id)
+    await pipe.execute()
+
+
+async def refresh_node_cache(node_id: str, user_uid_by_sid: dict[str, str]) -> bool:
+    """Marks node as alive and prolongs its sids in one round trip, False if node or any session is missing"""
+    pipe = cache.pipeline(transaction=False)
+    pipe.set(f"{NODE_KEY_PREFIX}{node_id}", 1, ex=config.cache.node_lifetime, get=True)
+    pipe.sadd(NODES_KEY, node_id)
+    for sid in user_uid_by_sid:
+        pipe.expire(f"{USER_ID_BY_SID_KEY_PREFIX}{sid}", config.cache.user_sid_cache_lifetime)
+        pipe.expire(f"{NODE_BY_SID_KEY_PREFIX}{sid}", config.cache.user_sid_cache_lifetime)
+        pipe.hexists(f"{USER_ID_BY_SID_BY_NODE_KEY_PREFIX}{node_id}", sid)
+    for user_uid in set(user_uid_by_sid.values()):
+        pipe.expire(f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}", config.cache.user_sid_cache_lifetime)
+    node_alive, _, *sessions_alive = await pipe.execute()
+    return node_alive is not None and all(sessions_alive)
+
+
+async def restore_node_sid_cache(node_id: str, user_uid_by_sid: dict[str, str]) -> None:
+    """Writes again all sessions of node, users who were taken for offline get online event"""
+    pipe = cache.pipeline(transaction=False)
+    for sid, user_uid in user_uid_by_sid.items():
+        _add_sid(pipe, node_id, sid, user_uid)
+    pipe.set(f"{NODE_KEY_PREFIX}{node_id}", 1, ex=config.cache.node_lifetime)
+    pipe.sadd(NODES_KEY, node_id)
+    await pipe.execute()
+
+
+async def get_dead_nodes() -> list[str]:
+    nodes_id = list(await cache.smembers(NODES_KEY))
+    pipe = cache.pipeline()
+    for node_id in nodes_id:
+        pipe.exists(f"{NODE_KEY_PREFIX}{node_id}")
+    return [node_id for node_id, is_alive in zip(nodes_id, await pipe.execute()) if not is_alive]
+
+
+async def acquire_node_reaping_lock(node_id: str, lifetime: int) -> bool:
+    return bool(await cache.set(f"{NODE_REAPING_LOCK_KEY_PREFIX}{node_id}", 1, ex=lifetime, nx=True))
+
+
+def _remove_sid(pipe: Pipeline, sid: str, user_uid: str | None) -> None:
+    local_user_uid_by_sid.pop(sid, None)
+    pipe.delete(f"{USER_ID_BY_SID_KEY_PREFIX}{sid}", f"{NODE_BY_SID_KEY_PREFIX}{sid}")
     if user_uid:
         logger.debug(f"User key: {SID_BY_USER_ID_KEY_PREFIX}{user_uid}")
-        pipe.srem(f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}", sid)
-        pipe.srem(ONLINE_USER_KEY, user_uid)
-    await pipe.execute()
+        pipe.eval(
+            _REMOVE_SID_SCRIPT,
+            3,
+            f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}",
+            _get_online_users_key(user_uid),
+            PRESENCE_EVENTS_KEY,
+            sid,
+            user_uid,
+            config.cache.presence_events_maxlen,
+        )
+
+
+def _get_online_users_key(user_uid: str) -> str:
+    return f"{ONLINE_USERS_KEY_PREFIX}{zlib.crc32(user_uid.encode()) % config.cache.online_users_shards}"
 
 
 async def get_user_uid_by_sid(sid: str) -> None | str:
+    if sid in local_user_uid_by_sid:
+        return local_user_uid_by_sid[sid]
     return await cache.get(f"{USER_ID_BY_SID_KEY_PREFIX}{sid}")
 
 
@@ -40,14 +339,213 @@ async def get_all_sid_by_user_uid(user_uid: str) -> set[str]:
     return await cache.smembers(f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}")
 
 
+async def get_node_by_sid(sid: str) -> None | str:
+    return await cache.get(f"{NODE_BY_SID_KEY_PREFIX}{sid}")
+
+
+async def get_all_sid_by_node(node_id: str) -> set[str]:
+    return set(await cache.hkeys(f"{USER_ID_BY_SID_BY_NODE_KEY_PREFIX}{node_id}"))
+
+
 async def get_online_users() -> set[str]:
-    return await cache.smembers(ONLINE_USER_KEY)
+    pipe = cache.pipeline()
+    for shard in range(config.cache.online_users_shards):
+        pipe.smembers(f"{ONLINE_USERS_KEY_PREFIX}{shard}")
+    return set().union(*await pipe.execute())
+
 
+async def get_presence_events(
+    last_id: str = "0", count: int = 100, block: int | None = None
+) -> list[tuple[str, str, PresenceState]]:
+    """Presence changes after `last_id` as (event id, user uid, state), `block` waits for new ones in ms"""
+    streams = await cache.xread({PRESENCE_EVENTS_KEY: last_id}, count=count, block=block)
+    if not streams:
+        return []
+    return [(event_id, event["user_uid"], PresenceState(event["state"])) for event_id, event in streams[0][1]]
 
-async def get_online_session(recipients_uid: list[str]) -> dict[str, set]:
+
+async def get_users_sid(users_uid: list[str]) -> set[str]:
+    if not users_uid:
+        return set()
+    return await cache.sunion([f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}" for user_uid in users_uid])  # type: ignore[return-value]
+
+
+async def get_offline_users(users_uid: list[str]) -> list[str]:
+    if not users_uid:
+        return []
+    keys = [f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}" for user_uid in users_uid]
+    return await cache.eval(_GET_OFFLINE_USERS_SCRIPT, len(keys), *keys, *users_uid)
+
+
+async def create_user_state_cache(user_uid: str, user_state: str, lifetime: int) -> None:
+    await cache.set(f"{USER_STATE_KEY_PREFIX}{user_uid}", user_state, ex=lifetime)
+
+
+async def get_user_state_cache(user_uid: str) -> None | str:
+    return await cache.get(f"{USER_STATE_KEY_PREFIX}{user_uid}")
+
+
+async def remove_user_state_cache(user_uid: str) -> None:
+    await cache.delete(f"{USER_STATE_KEY_PREFIX}{user_uid}")
+
+
+def _get_unread_counter_field(chat_id: int, user_uid: str) -> str:
+    return f"{chat_id}:{user_uid}"
+
+
+async def increment_unread_counters_cache(chat_id: int, users_uid: list[str], flush_id: str) -> None:
+    await cache.eval(
+        _INCREMENT_UNREAD_COUNTERS_SCRIPT,
+        1,
+        UNREAD_COUNTERS_KEY,
+        UNREAD_COUNTERS_FLUSH_ID_FIELD,
+        flush_id,
+        *[_get_unread_counter_field(chat_id, user_uid) for user_uid in users_uid],
+    )
+
+
+def _parse_unread_counters(unread_counters: dict[str, str]) -> tuple[str, dict[tuple[int, str], int]]:
+    flush_id = unread_counters.pop(UNREAD_COUNTERS_FLUSH_ID_FIELD)
+    result = {}
+    for field, delta in unread_counters.items():
+        chat_id, user_uid = field.split(":", 1)
+        result[(int(chat_id), user_uid)] = int(delta)
+    return flush_id, result
+
+
+async def start_unread_counters_flush() -> tuple[str, dict[tuple[int, str], int]] | None:
+    fields = await cache.eval(
+        _START_UNREAD_COUNTERS_FLUSH_SCRIPT,
+        2,
+        UNREAD_COUNTERS_KEY,
+        UNREAD_COUNTERS_IN_FLIGHT_KEY,
+        UNREAD_COUNTERS_FLUSH_ID_FIELD,
+        str(uuid.uuid4()),
+    )
+    if not fields:
+        return None
+    return _parse_unread_counters(dict(zip(fields[::2], fields[1::2])))
+
+
+async def finish_unread_counters_flush(flush_id: str) -> None:
+    await cache.eval(
+        _FINISH_UNREAD_COUNTERS_FLUSH_SCRIPT,
+        1,
+        UNREAD_COUNTERS_IN_FLIGHT_KEY,
+        UNREAD_COUNTERS_FLUSH_ID_FIELD,
+        flush_id,
+    )
+
+
+async def get_user_unread_counters_cache(user_uid: str, chats_id: list[int]) -> list[tuple[str, dict[int, int]]]:
+    """Pending and in-flight deltas of user by their flush ids, read together in one step"""
+    if not chats_id:
+        return []
+    fields = [UNREAD_COUNTERS_FLUSH_ID_FIELD] + [_get_unread_counter_field(chat_id, user_uid) for chat_id in chats_id]
     pipe = cache.pipeline()
-    for user_uid in recipients_uid:
-        pipe.smembers(f"{SID_BY_USER_ID_KEY_PREFIX}{user_uid}")
-    recipients_sid = await pipe.execute()
+    pipe.hmget(UNREAD_COUNTERS_KEY, fields)
+    pipe.hmget(UNREAD_COUNTERS_IN_FLIGHT_KEY, fields)
+    result = []
+    for flush_id, *deltas in await pipe.execute():
+        unread_counters = {chat_id: int(delta) for chat_id, delta in zip(chats_id, deltas) if delta}
+        if flush_id and unread_counters:
+            result.append((flush_id, unread_counters))
+    return result
+
+
+async def acquire_unread_counters_lock(token: str, lifetime: float) -> bool:
+    return bool(await cache.set(UNREAD_COUNTERS_LOCK_KEY, token, nx=True, px=int(lifetime * 1000)))
+
+
+async def release_unread_counters_lock(token: str) -> None:
+    await cache.eval(_RELEASE_LOCK_SCRIPT, 1, UNREAD_COUNTERS_LOCK_KEY, token)
+
+
+async def create_recent_write_cache(user_uid: str, lifetime: int) -> None:
+    await cache.set(f"{RECENT_WRITE_KEY_PREFIX}{user_uid}", 1, ex=lifetime)
+
+
+async def has_recent_write_cache(user_uid: str) -> bool:
+    return bool(await cache.exists(f"{RECENT_WRITE_KEY_PREFIX}{user_uid}"))
+
+
+async def create_push_queue_group() -> None:
+    try:
+        await cache.xgroup_create(PUSH_QUEUE_KEY, PUSH_QUEUE_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def add_push_queue(notification: dict[str, str | int]) -> None:
+    await cache.xadd(PUSH_QUEUE_KEY, notification, maxlen=config.push.queue_maxlen, approximate=True)
+
+
+async def read_push_queue(consumer: str, count: int, block: int | None = None) -> list[tuple[str, dict[str, str]]]:
+    """Entries left unacknowledged by other consumers for claim idle time go first, then new ones"""
+    claimed = await cache.xautoclaim(
+        PUSH_QUEUE_KEY, PUSH_QUEUE_GROUP, consumer, min_idle_time=config.push.claim_idle, count=count
+    )
+    if claimed[1]:
+        return claimed[1]
+    streams = await cache.xreadgroup(PUSH_QUEUE_GROUP, consumer, {PUSH_QUEUE_KEY: ">"}, count=count, block=block)
+    if not streams:
+        return []
+    return streams[0][1]
+
+
+async def ack_push_queue(entries_id: list[str]) -> None:
+    if entries_id:
+        pipe = cache.pipeline(transaction=False)
+        pipe.xack(PUSH_QUEUE_KEY, PUSH_QUEUE_GROUP, *entries_id)
+        pipe.delete(*[f"{PUSH_LIMITED_ENTRY_KEY_PREFIX}{entry_id}" for entry_id in entries_id])
+        await pipe.execute()
+
+
+def _get_push_limits_args(now: int) -> list[int | float | str]:
+    return [
+        now,
+        int(config.push.coalescing_window * 1000),
+        config.push.rate_limit,
+        config.push.rate_limit_burst,
+        PUSH_COALESCING_KEY_PREFIX,
+        PUSH_RATE_LIMIT_KEY_PREFIX,
+        config.push.claim_idle,
+    ]
+
+
+async def get_limited_push_entries(entries_id: list[str]) -> dict[str, list[str]]:
+    """Flat fields of notifications decided for entries which were already limited by coalescing and rate limits"""
+    if not entries_id:
+        return {}
+    limited = await cache.mget([f"{PUSH_LIMITED_ENTRY_KEY_PREFIX}{entry_id}" for entry_id in entries_id])
+    # Empty lua table is encoded as an object
+    return {entry_id: json.loads(fields) or [] for entry_id, fields in zip(entries_id, limited) if fields is not None}
+
+
+async def coalesce_push_notifications(
+    notifications: Sequence[tuple[str, int, int, str, int, str]], entries_id: list[str], now: int
+) -> list[str]:
+    """Takes (user uid, chat id, message id, text, count, entry id) and returns flat fields of ones to send now"""
+    args = _get_push_limits_args(now)
+    args.extend([PUSH_LIMITED_ENTRY_KEY_PREFIX, PUSH_LIMITED_ENTRY_LIFETIME, len(entries_id), *entries_id])
+    for notification in notifications:
+        args.extend(notification)
+    return await cache.eval(_COALESCE_PUSH_NOTIFICATIONS_SCRIPT, 1, PUSH_COALESCING_DUE_KEY, *args)
+
+
+async def pop_due_push_notifications(now: int, count: int) -> list[str]:
+    """Flat fields of notifications whose coalescing window is over, they are leased until acknowledged"""
+    args = _get_push_limits_args(now)
+    return await cache.eval(
+        _POP_DUE_PUSH_NOTIFICATIONS_SCRIPT, 2, PUSH_COALESCING_DUE_KEY, PUSH_COALESCING_SENDING_KEY, *args, count
+    )
+
 
-    return {recipient_uid: recipient_sid for recipient_uid, recipient_sid in zip(recipients_uid, recipients_sid)}
+async def ack_due_push_notifications(notifications: Sequence[tuple[str, int, int, str, int]]) -> None:
+    if not notifications:
+        return
+    args: list[str | int] = [PUSH_COALESCING_KEY_PREFIX]
+    for user_uid, chat_id, _, _, messages_count in notifications:
+        args.extend([f"{user_uid}:{chat_id}", messages_count])
+    await cache.eval(_ACK_DUE_PUSH_NOTIFICATIONS_SCRIPT, 1, PUSH_COALESCING_SENDING_KEY, *args)
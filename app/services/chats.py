@@ -1,17 +1,43 @@
+import base64
+import json
 from datetime import datetime
+from typing import Any, Mapping, NamedTuple, Sequence
 
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter
 from pydantic.types import UUID4
-from sqlalchemy import UnaryExpression, and_, select, update
+from sqlalchemy import (
+    REAL,
+    Select,
+    UnaryExpression,
+    and_,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import InstrumentedAttribute, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 from sqlalchemy.sql.expression import ColumnElement
 
-from app import db
-from app.db.enums import ChatState, ChatUserRole
+from app import config, db
+from app.db.enums import ChatState, ChatUserRole, MessageType
 from app.db.registry import registry
 from app.schemas import chats as s_chat
 from app.schemas import common as s_common
+from app.services import replicas as replicas_service
+from app.services import sio as sio_service
+from app.services import unread_counters as unread_counters_service
+
+SEARCH_HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=20, MinWords=5, MaxFragments=2"
+# Text is escaped before highlighting, so the only markup of a snippet is <b> of the found words
+SEARCH_HEADLINE_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#39;"))
+
+messages_adapter = TypeAdapter(list[s_chat.Message])
+chat_list_adapter = TypeAdapter(s_chat.ChatList)
 
 
 async def create_chat(data: s_chat.CreateChatData, current_user_uid: UUID4) -> s_chat.CreateChatResponse:
@@ -39,43 +65,205 @@ async def create_chat(data: s_chat.CreateChatData, current_user_uid: UUID4) -> s
     except IntegrityError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
+    await replicas_service.mark_user_write(str(current_user_uid))
+    await sio_service.join_chat_room(data.contacts, chat.id)
     return s_chat.CreateChatResponse(chat_id=chat.id, chat_name=data.chat_name, contacts=data.contacts)
 
 
-async def get_chat_list(from_archive: bool, user_id: UUID4) -> list[s_chat.Chat]:
+def _encode_chat_list_cursor(time_pinned: datetime | None, last_message_at: datetime, chat_id: int) -> str:
+    cursor = {
+        "time_pinned": time_pinned.isoformat() if time_pinned else None,
+        "last_message_at": last_message_at.isoformat(),
+        "chat_id": chat_id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def _decode_chat_list_cursor(cursor: str) -> tuple[datetime | None, datetime, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor))
+        time_pinned = datetime.fromisoformat(data["time_pinned"]) if data["time_pinned"] else None
+        return time_pinned, datetime.fromisoformat(data["last_message_at"]), int(data["chat_id"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"cursor": "invalid cursor"})
+
+
+def _get_chat_list_cursor_condition(cursor: str) -> ColumnElement[bool]:
+    # Pinned chats go first in order of pinning, others are sorted by last message
+    time_pinned, last_message_at, chat_id = _decode_chat_list_cursor(cursor)
+    activity_condition = tuple_(db.ChatRelationship.last_message_at, db.ChatRelationship.chat_id) < tuple_(
+        literal(last_message_at), literal(chat_id)
+    )
+    unpinned_condition = and_(db.ChatRelationship.time_pinned.is_(None), activity_condition)
+    if time_pinned is None:
+        return unpinned_condition
+    return or_(
+        db.ChatRelationship.time_pinned > time_pinned,
+        and_(db.ChatRelationship.time_pinned == time_pinned, activity_condition),
+        db.ChatRelationship.time_pinned.is_(None),
+    )
+
+
+class ChatListPage(NamedTuple):
+    chats: Sequence[Mapping[str, Any]]
+    recipients_preview: dict[int, list[Mapping[str, Any]]]
+    unread_counters: dict[int, int]
+    cursor: str | None
+
+
+async def _get_chat_list_page(data: s_chat.GetChatListData, user_id: UUID4) -> ChatListPage:
     condition = db.ChatRelationship.user_uid == user_id
 
-    if from_archive:
+    if data.from_archive:
         condition &= db.ChatRelationship.state == ChatState.ARCHIVE
     else:
         condition &= db.ChatRelationship.state == ChatState.ACTIVE
 
-    chat_subquery = (
-        select(db.ChatRelationship.chat_id)
+    if data.cursor:
+        condition &= _get_chat_list_cursor_condition(data.cursor)
+
+    # Only columns of the response are read, rows are not loaded to ORM entities
+    query = (
+        select(
+            db.Chat.id,
+            db.Chat.state,
+            db.ChatRelationship.unread_counter,
+            db.ChatRelationship.time_pinned,
+            db.ChatRelationship.last_message_at,
+            db.Message.id.label("last_message_id"),
+            db.Message.user_uid.label("last_message_user_uid"),
+            db.Message.text.label("last_message_text"),
+            db.Message.type_.label("last_message_type_"),
+            db.Message.time_created.label("last_message_time_created"),
+        )
         .select_from(db.ChatRelationship)
+        .join(db.Chat, db.Chat.id == db.ChatRelationship.chat_id)
+        .outerjoin(db.Message, db.Message.id == db.Chat.last_message_id)
         .where(condition)
-        .order_by(db.ChatRelationship.time_pinned, db.ChatRelationship.chat_id)
-        .subquery("chat_subquery")
+        .order_by(
+            db.ChatRelationship.time_pinned.asc().nulls_last(),
+            db.ChatRelationship.last_message_at.desc(),
+            db.ChatRelationship.chat_id.desc(),
+        )
+        .limit(data.page_size + 1)
     )
 
+    async with replicas_service.read_session(str(user_id)) as session:
+        chat_list = (await session.execute(query)).mappings().all()
+        next_page_row = chat_list[data.page_size] if len(chat_list) > data.page_size else None
+        chat_list = chat_list[: data.page_size]
+        recipients_preview = await _get_recipients_preview(session, [row["id"] for row in chat_list])
+
+    unread_counters = await unread_counters_service.get_unread_counters(
+        str(user_id), {row["id"]: row["unread_counter"] for row in chat_list}
+    )
+    cursor = None
+    if next_page_row:
+        last_row = chat_list[-1]
+        cursor = _encode_chat_list_cursor(last_row["time_pinned"], last_row["last_message_at"], last_row["id"])
+    return ChatListPage(chat_list, recipients_preview, unread_counters, cursor)
+
+
+def _get_last_message_fields(row: Mapping[str, Any]) -> dict | None:
+    if row["last_message_id"] is None:
+        return None
+    return {field: row[f"last_message_{field}"] for field in s_chat.LastMessage.model_fields}
+
+
+def _get_recipient_fields(row: Mapping[str, Any]) -> dict:
+    fields = {field: row[field] for field in s_chat.Recipient.model_fields if field != "user"}
+    return fields | {"user": {"name": row["user_name"]} if row["user_name"] is not None else None}
+
+
+def build_chat_list(page: ChatListPage) -> s_chat.ChatList:
+    chats = [
+        s_chat.Chat.model_validate(
+            {
+                "id": row["id"],
+                "state": row["state"],
+                "recipients": [
+                    _get_recipient_fields(recipient) for recipient in page.recipients_preview.get(row["id"], [])
+                ],
+                "unread_counter": page.unread_counters[row["id"]],
+                "last_message": _get_last_message_fields(row),
+            }
+        )
+        for row in page.chats
+    ]
+    return s_chat.ChatList(chats=chats, cursor=page.cursor)
+
+
+async def get_chat_list(data: s_chat.GetChatListData, user_id: UUID4) -> s_chat.ChatList:
+    return build_chat_list(await _get_chat_list_page(data, user_id))
+
+
+def dump_chat_list_json(page: ChatListPage) -> bytes:
+    # Columns have types of the model fields, so rows are not validated again
+    chats = []
+    for row in page.chats:
+        recipients = []
+        for recipient in page.recipients_preview.get(row["id"], []):
+            fields = _get_recipient_fields(recipient)
+            if fields["user"] is not None:
+                fields["user"] = s_chat.User.model_construct(**fields["user"])
+            recipients.append(s_chat.Recipient.model_construct(**fields))
+        last_message = _get_last_message_fields(row)
+        chats.append(
+            s_chat.Chat.model_construct(
+                id=row["id"],
+                state=row["state"],
+                recipients=recipients,
+                unread_counter=page.unread_counters[row["id"]],
+                last_message=s_chat.LastMessage.model_construct(**last_message) if last_message else None,
+            )
+        )
+    return chat_list_adapter.dump_json(s_chat.ChatList.model_construct(chats=chats, cursor=page.cursor))
+
+
+async def get_chat_list_json(data: s_chat.GetChatListData, user_id: UUID4) -> bytes:
+    return dump_chat_list_json(await _get_chat_list_page(data, user_id))
+
+
+async def _get_recipients_preview(session: AsyncSession, chats_id: list[int]) -> dict[int, list[Mapping[str, Any]]]:
+    if not chats_id:
+        return {}
+    ranked_recipients = (
+        select(
+            db.ChatRelationship.chat_id,
+            db.ChatRelationship.user_uid,
+            db.ChatRelationship.chat_name,
+            db.ChatRelationship.state,
+            db.ChatRelationship.user_role,
+            func.row_number()
+            .over(
+                partition_by=db.ChatRelationship.chat_id,
+                order_by=(db.ChatRelationship.user_role, db.ChatRelationship.user_uid),
+            )
+            .label("position"),
+        )
+        .where(db.ChatRelationship.chat_id.in_(chats_id))
+        .subquery("ranked_recipients")
+    )
     query = (
-        select(db.Chat)
-        .options(selectinload(db.Chat.recipients).options(joinedload(db.ChatRelationship.user)))
-        .join(chat_subquery, db.Chat.id == chat_subquery.c.chat_id)
+        select(ranked_recipients, db.User.name.label("user_name"))
+        .outerjoin(db.User, db.User.uid == ranked_recipients.c.user_uid)
+        .where(ranked_recipients.c.position <= config.application.chat_list_recipients_preview_size)
+        .order_by(ranked_recipients.c.chat_id, ranked_recipients.c.position)
     )
 
-    async with registry.session() as session:
-        chat_list = await session.execute(query)
-        return [s_chat.Chat.model_validate(row) for row in chat_list.scalars()]
+    recipients_preview: dict[int, list[Mapping[str, Any]]] = {}
+    for row in (await session.execute(query)).mappings():
+        recipients_preview.setdefault(row["chat_id"], []).append(row)
+    return recipients_preview
 
 
-async def get_chat_recipients(chat_id: int, user_uid: UUID4) -> list[s_chat.Recipient]:
+async def get_chat_recipients(chat_id: int, user_uid: UUID4, from_primary: bool = False) -> list[s_chat.Recipient]:
     query = select(db.ChatRelationship).where(
         and_(db.ChatRelationship.chat_id == chat_id, db.ChatRelationship.state != ChatState.DELETED)
     )
-    async with registry.session() as session:
-        chat_recipients = await session.execute(query)
-        chat_recipients = [s_chat.Recipient.model_validate(row) for row in chat_recipients.scalars()]
+    async with replicas_service.read_session(str(user_uid), primary=from_primary) as session:
+        rows = await session.execute(query)
+        chat_recipients = [s_chat.Recipient.model_validate(row) for row in rows.scalars()]
     if not chat_recipients:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     if user_uid not in [recipient.user_uid for recipient in chat_recipients]:
@@ -84,7 +272,8 @@ async def get_chat_recipients(chat_id: int, user_uid: UUID4) -> list[s_chat.Reci
 
 
 async def add_recipients(data: s_chat.ManageRecipientsData, user_uid: UUID4) -> s_common.ChatApiResponse:
-    chat_recipients = await get_chat_recipients(data.chat_id, user_uid)
+    # Members are checked on primary, a lagging replica could miss recent changes of the chat
+    chat_recipients = await get_chat_recipients(data.chat_id, user_uid, from_primary=True)
     chat_recipients_uids = [recipient.user_uid for recipient in chat_recipients]
     new_recipients_uids = [contact_uid for contact_uid in data.contacts if contact_uid not in chat_recipients_uids]
     if not new_recipients_uids:
@@ -110,11 +299,14 @@ async def add_recipients(data: s_chat.ManageRecipientsData, user_uid: UUID4) ->
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail={"contacts": "one of contacts is not exist"}
         )
+    await replicas_service.mark_user_write(str(user_uid))
+    await sio_service.join_chat_room(new_recipients_uids, data.chat_id)
     return s_common.ChatApiResponse(result=s_common.Result(success=True))
 
 
 async def delete_recipients(data: s_chat.ManageRecipientsData, user_uid: UUID4) -> s_common.ChatApiResponse:
-    chat_recipients = await get_chat_recipients(data.chat_id, user_uid)
+    # Members are checked on primary, a lagging replica could miss recent changes of the chat
+    chat_recipients = await get_chat_recipients(data.chat_id, user_uid, from_primary=True)
     chat_recipients_uids = [recipient.user_uid for recipient in chat_recipients]
     recipients_uids_for_delete = [contact_uid for contact_uid in data.contacts if contact_uid in chat_recipients_uids]
     if not recipients_uids_for_delete:
@@ -141,6 +333,8 @@ async def delete_recipients(data: s_chat.ManageRecipientsData, user_uid: UUID4)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail={"contacts": "one of contacts is not exist"}
         )
+    await replicas_service.mark_user_write(str(user_uid))
+    await sio_service.leave_chat_room(recipients_uids_for_delete, data.chat_id)
     return s_common.ChatApiResponse(result=s_common.Result(success=True))
 
 
@@ -161,6 +355,8 @@ async def archive_chat(chat_id: int, user_uid: UUID4) -> s_common.ChatApiRespons
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
         await session.commit()
 
+    await replicas_service.mark_user_write(str(user_uid))
+    await sio_service.leave_chat_room([user_uid], chat_id)
     return s_common.ChatApiResponse(result=s_common.Result(success=True))
 
 
@@ -181,6 +377,8 @@ async def unarchive_chat(chat_id: int, user_uid: UUID4) -> s_common.ChatApiRespo
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
         await session.commit()
 
+    await replicas_service.mark_user_write(str(user_uid))
+    await sio_service.join_chat_room([user_uid], chat_id)
     return s_common.ChatApiResponse(result=s_common.Result(success=True))
 
 
@@ -201,6 +399,7 @@ async def pin_chat(chat_id: int, user_uid: UUID4) -> s_common.ChatApiResponse:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
         await session.commit()
 
+    await replicas_service.mark_user_write(str(user_uid))
     return s_common.ChatApiResponse(result=s_common.Result(success=True))
 
 
@@ -221,6 +420,7 @@ async def unpin_chat(chat_id: int, user_uid: UUID4) -> s_common.ChatApiResponse:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
         await session.commit()
 
+    await replicas_service.mark_user_write(str(user_uid))
     return s_common.ChatApiResponse(result=s_common.Result(success=True))
 
 
@@ -252,21 +452,102 @@ def _get_message_history_order_by(look_forward: bool) -> UnaryExpression[int] |
     return order_by
 
 
-async def get_message_history(data: s_chat.GetMessageHistoryData, user_uid: UUID4) -> list[s_chat.Message]:
+def _get_message_history_query(data: s_chat.GetMessageHistoryData, user_uid: UUID4) -> Select:
     condition = _get_message_history_condition(data)
     order_by = _get_message_history_order_by(look_forward=data.look_forward)
+    is_member = (
+        select(db.ChatRelationship.chat_id)
+        .where(
+            and_(db.ChatRelationship.chat_id == db.Message.chat_id, db.ChatRelationship.user_uid == user_uid),
+        )
+        .exists()
+    )
 
-    query = (
-        select(db.Message)
+    # Only columns of the response are loaded, search vectors are as large as texts
+    columns = [getattr(db.Message, field) for field in s_chat.Message.model_fields]
+    return select(*columns).where(condition & is_member).order_by(order_by).limit(data.page_size)
+
+
+async def get_message_history(data: s_chat.GetMessageHistoryData, user_uid: UUID4) -> list[s_chat.Message]:
+    query = _get_message_history_query(data, user_uid)
+
+    async with replicas_service.read_session(str(user_uid)) as session:
+        message_history = await session.execute(query)
+        return [s_chat.Message.model_validate(row) for row in message_history]
+
+
+async def get_message_history_json(data: s_chat.GetMessageHistoryData, user_uid: UUID4) -> bytes:
+    query = _get_message_history_query(data, user_uid)
+
+    async with replicas_service.read_session(str(user_uid)) as session:
+        message_history = (await session.execute(query)).mappings().all()
+    # Columns have types of the model fields, so rows are not validated again
+    return messages_adapter.dump_json([s_chat.Message.model_construct(**row) for row in message_history])
+
+
+def _encode_search_cursor(rank: float, message_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"rank": rank, "message_id": message_id}).encode()).decode()
+
+
+def _decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor))
+        return float(data["rank"]), int(data["message_id"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"cursor": "invalid cursor"})
+
+
+async def search_messages(data: s_chat.SearchMessagesData, user_uid: UUID4) -> s_chat.SearchMessagesResult:
+    ts_query = func.websearch_to_tsquery(data.query)
+    rank = func.ts_rank(db.Message.search_text, ts_query, type_=REAL)
+    condition = and_(db.Message.search_text.bool_op("@@")(ts_query), db.Message.type_ != MessageType.DELETED)
+
+    if data.chat_id is not None:
+        condition &= db.Message.chat_id == data.chat_id
+
+    if data.cursor:
+        # Rank is returned as float4 and compared as it is, so pages do not skip messages with equal ranks
+        cursor_rank, cursor_message_id = _decode_search_cursor(data.cursor)
+        condition &= tuple_(rank, db.Message.id) < tuple_(literal(cursor_rank, REAL), literal(cursor_message_id))
+
+    found_messages = (
+        select(
+            db.Message.id,
+            db.Message.user_uid,
+            db.Message.chat_id,
+            db.Message.text,
+            db.Message.type_,
+            db.Message.time_created,
+            rank.label("rank"),
+        )
         .join(
             db.ChatRelationship,
-            and_(db.ChatRelationship.chat_id == data.chat_id, db.ChatRelationship.user_uid == user_uid),
+            and_(
+                db.ChatRelationship.chat_id == db.Message.chat_id,
+                db.ChatRelationship.user_uid == user_uid,
+                db.ChatRelationship.state != ChatState.DELETED,
+            ),
         )
         .where(condition)
-        .order_by(order_by)
-        .limit(data.page_size)
+        .order_by(rank.desc(), db.Message.id.desc())
+        .limit(data.page_size + 1)
+        .subquery()
+    )
+    # Snippets are built only for the found page, ts_headline parses the whole text of a message
+    escaped_text: ColumnElement[str] = found_messages.c.text
+    for char, escaped_char in SEARCH_HEADLINE_ESCAPES:
+        escaped_text = func.replace(escaped_text, char, escaped_char)
+    query = select(
+        found_messages, func.ts_headline(escaped_text, ts_query, SEARCH_HEADLINE_OPTIONS).label("snippet")
+    ).order_by(found_messages.c.rank.desc(), found_messages.c.id.desc())
+
+    async with replicas_service.read_session(str(user_uid)) as session:
+        rows = (await session.execute(query)).all()
+
+    cursor = None
+    if len(rows) > data.page_size:
+        rows = rows[: data.page_size]
+        cursor = _encode_search_cursor(rows[-1].rank, rows[-1].id)
+    return s_chat.SearchMessagesResult(
+        messages=[s_chat.FoundMessage.model_validate(row) for row in rows], cursor=cursor
     )
-
-    async with registry.session() as session:
-        message_history = await session.execute(query)
-        return [s_chat.Message.model_validate(row) for row in message_history.scalars()]
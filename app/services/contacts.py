@@ -1,4 +1,6 @@
 from pydantic.types import UUID4
+from sqlalchemy import any_, bindparam, delete, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app import db
@@ -9,17 +11,46 @@ from app.schemas import contacts as s_contacts
 
 async def save_device_token(user_uid: UUID4, token_data: s_contacts.TokenData) -> s_common.ChatApiResponse:
     async with registry.session() as session:
-        query = (
-            pg_insert(db.Device)
-            .values(
-                user_uid=user_uid,
-                token=token_data.token,
-                platform=token_data.device_type,
-            )
-            .on_conflict_do_nothing(constraint="uqp_user_uid_platform")
+        query = pg_insert(db.Device).values(
+            user_uid=user_uid,
+            token=token_data.token,
+            platform=token_data.device_type,
+        )
+        # Token of a device passes to the user who logged in on it last
+        query = query.on_conflict_do_update(
+            constraint="uq_devices_token",
+            set_={
+                "user_uid": query.excluded.user_uid,
+                "platform": query.excluded.platform,
+                "time_updated": func.now(),
+            },
         )
 
         await session.execute(query)
         await session.commit()
 
         return s_common.ChatApiResponse(result=s_common.Result(success=True))
+
+
+async def get_tokens(users_uid: list[str]) -> list[tuple[s_contacts.PlatformName, str, str]]:
+    """(platform, user uid, token) of all devices of users ordered by platform"""
+    # Array is one parameter for any number of users, IN has a parameter per user
+    query = (
+        select(db.Device.platform, db.Device.user_uid, db.Device.token)
+        .where(db.Device.user_uid == any_(bindparam("users_uid", users_uid, type_=ARRAY(UUID(as_uuid=False)))))
+        .order_by(db.Device.platform)
+    )
+    async with registry.session() as session:
+        rows = await session.execute(query)
+    return [(s_contacts.PlatformName(platform), str(user_uid), token) for platform, user_uid, token in rows]
+
+
+async def delete_tokens(tokens: list[str]) -> int:
+    """Removes tokens which providers reported as not registered"""
+    query = delete(db.Device).where(
+        db.Device.token == any_(bindparam("tokens", tokens, type_=ARRAY(db.Device.token.type)))
+    )
+    async with registry.session() as session:
+        deleted_count = (await session.execute(query)).rowcount
+        await session.commit()
+    return deleted_count
@@ -0,0 +1,108 @@
+import asyncio
+import re
+from contextlib import suppress
+from typing import NamedTuple
+
+from loguru import logger
+from sqlalchemy import text
+
+from app import config
+from app.db.registry import registry
+
+PARTITION_NAME_PREFIX = "messages_p"
+_LOCK_KEY = "hashtext('messages_partitions')"
+_PARTITION_BOUND_PATTERN = re.compile(r"FROM \((?:MINVALUE|'?(-?\d+)'?)\) TO \('?(-?\d+)'?\)")
+
+_maintain_task: asyncio.Task | None = None
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: int | None
+    upper: int
+
+
+async def get_partitions() -> list[Partition]:
+    query = text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'messages'::regclass"
+    )
+    async with registry.session() as session:
+        rows = (await session.execute(query)).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _PARTITION_BOUND_PATTERN.search(bound)
+        if not match:
+            raise ValueError(f"Unexpected bound of partition {name}: {bound}")
+        lower, upper = match.groups()
+        partitions.append(Partition(name, int(lower) if lower is not None else None, int(upper)))
+    return sorted(partitions, key=lambda partition: partition.upper)
+
+
+async def _get_current_id() -> int:
+    async with registry.session() as session:
+        return (await session.execute(text("SELECT last_value FROM messages_id_seq"))).scalar_one()
+
+
+async def create_partitions(ahead: int) -> list[str]:
+    """Creates partitions until ids of next `ahead` partitions are available"""
+    created: list[str] = []
+    # Nodes maintain partitions concurrently, the missing ones are created by one of them in one transaction
+    async with registry.session() as session:
+        if not (await session.execute(text(f"SELECT pg_try_advisory_xact_lock({_LOCK_KEY})"))).scalar_one():
+            return created
+        partitions = await get_partitions()
+        upper = partitions[-1].upper
+        required_upper = await _get_current_id() + ahead * config.database.messages_partition_size
+        while upper <= required_upper:
+            name = f"{PARTITION_NAME_PREFIX}{upper}"
+            lower, upper = upper, upper + config.database.messages_partition_size
+            await session.execute(
+                text(f"CREATE TABLE {name} PARTITION OF messages FOR VALUES FROM ({lower}) TO ({upper})")
+            )
+            created.append(name)
+        await session.commit()
+    for name in created:
+        logger.info(f"Partition {name} is created")
+    return created
+
+
+async def detach_partitions(keep: int) -> list[str]:
+    """Detaches full partitions except `keep` latest ones, detached tables are left for archiving"""
+    current_id = await _get_current_id()
+    full_partitions = [partition for partition in await get_partitions() if partition.upper <= current_id]
+    old_partitions = full_partitions[: max(len(full_partitions) - keep, 0)]
+
+    async with registry.autocommit_engine.connect() as connection:
+        for partition in old_partitions:
+            await connection.execute(text(f"ALTER TABLE messages DETACH PARTITION {partition.name} CONCURRENTLY"))
+            await connection.execute(
+                text("DELETE FROM messages_client_ids WHERE message_id < :upper"), {"upper": partition.upper}
+            )
+            logger.info(f"Partition {partition.name} is detached")
+    return [partition.name for partition in old_partitions]
+
+
+async def _maintain_periodically() -> None:
+    while True:
+        try:
+            await create_partitions(config.database.messages_partitions_ahead)
+        except Exception:
+            logger.exception("Partitions of messages are not created")
+        await asyncio.sleep(config.database.messages_partitions_interval)
+
+
+async def start_partitions_maintainer() -> None:
+    global _maintain_task
+    _maintain_task = asyncio.create_task(_maintain_periodically())
+
+
+async def stop_partitions_maintainer() -> None:
+    global _maintain_task
+    if _maintain_task is None:
+        return
+    _maintain_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await _maintain_task
+    _maintain_task = None
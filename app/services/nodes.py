@@ -0,0 +1,57 @@
+import asyncio
+from contextlib import suppress
+
+from loguru import logger
+
+from app import config
+from app.services import cache as cache_service
+
+_heartbeat_task: asyncio.Task | None = None
+
+
+async def beat() -> None:
+    # All sids of the node are known locally, because events of a sid always come to its node
+    user_uid_by_sid = dict(cache_service.local_user_uid_by_sid)
+    if not await cache_service.refresh_node_cache(config.socketio.node_id, user_uid_by_sid):
+        if user_uid_by_sid:
+            logger.warning(f"Sessions of node {config.socketio.node_id} were removed while connected, restoring them")
+        await cache_service.restore_node_sid_cache(config.socketio.node_id, user_uid_by_sid)
+
+
+async def reap_dead_nodes() -> list[str]:
+    """Removes sessions of nodes without heartbeat, each dead node is reaped by one of alive nodes"""
+    reaped = []
+    for node_id in await cache_service.get_dead_nodes():
+        if node_id == config.socketio.node_id:
+            continue
+        if not await cache_service.acquire_node_reaping_lock(node_id, config.cache.node_lifetime):
+            continue
+        await cache_service.remove_node_sid_cache(node_id)
+        logger.warning(f"Sessions of dead node {node_id} are removed")
+        reaped.append(node_id)
+    return reaped
+
+
+async def _beat_periodically() -> None:
+    while True:
+        try:
+            await beat()
+            await reap_dead_nodes()
+        except Exception:
+            logger.exception("Heartbeat of node is failed")
+        await asyncio.sleep(config.cache.node_heartbeat_interval)
+
+
+async def start_heartbeat() -> None:
+    global _heartbeat_task
+    _heartbeat_task = asyncio.create_task(_beat_periodically())
+
+
+async def stop_heartbeat() -> None:
+    global _heartbeat_task
+    if _heartbeat_task is None:
+        return
+    _heartbeat_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await _heartbeat_task
+    _heartbeat_task = None
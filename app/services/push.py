@@ -0,0 +1,171 @@
+import abc
+import asyncio
+import importlib
+import time
+from collections import deque
+from itertools import groupby
+from typing import NamedTuple
+
+from loguru import logger
+
+from app import config
+from app.schemas.contacts import PlatformName
+from app.services import cache as cache_service
+from app.services import contacts as contacts_service
+
+
+class Notification(NamedTuple):
+    user_uid: str
+    chat_id: int
+    message_id: int
+    text: str
+    messages_count: int
+
+    @property
+    def body(self) -> str:
+        return self.text if self.messages_count == 1 else f"{self.messages_count} new messages"
+
+
+class PushSender(abc.ABC):
+    """Delivers notifications of one platform to provider"""
+
+    @abc.abstractmethod
+    async def send(self, notifications: list[tuple[str, Notification]]) -> list[str]:
+        """Sends notifications to device tokens, returns tokens rejected by provider"""
+
+
+class FakeSender(PushSender):
+    """Keeps latest notifications in memory, for local runs and tests"""
+
+    def __init__(self, maxlen: int = 10_000) -> None:
+        self.sent: deque[tuple[str, Notification]] = deque(maxlen=maxlen)
+
+    async def send(self, notifications: list[tuple[str, Notification]]) -> list[str]:
+        logger.info(f"Fake sender got {len(notifications)} notifications")
+        self.sent.extend(notifications)
+        return []
+
+
+senders: dict[PlatformName, PushSender] = {}
+
+
+def get_sender(platform: PlatformName) -> PushSender:
+    if platform not in senders:
+        if platform in config.push.senders:
+            module_name, class_name = config.push.senders[platform].rsplit(".", 1)
+            senders[platform] = getattr(importlib.import_module(module_name), class_name)()
+        elif config.push.fake_senders:
+            logger.warning(f"Sender of {platform} notifications is not configured, they are not delivered")
+            senders[platform] = FakeSender()
+        else:
+            raise RuntimeError(f"Sender of {platform} notifications is not configured")
+    return senders[platform]
+
+
+async def enqueue_notification(recipients_uid: list[str], message: dict) -> None:
+    # One entry per message, recipients are expanded by worker
+    await cache_service.add_push_queue(
+        {
+            "recipients_uid": ",".join(recipients_uid),
+            "chat_id": message["chat_id"],
+            "message_id": message["id"],
+            "text": (message.get("text") or "")[: config.push.text_preview_length],
+        }
+    )
+
+
+def _coalesce(entries: list[tuple[str, dict[str, str]]]) -> list[tuple[Notification, str]]:
+    """Burst of messages of a chat to a user becomes one notification about the latest of them, with its entry id"""
+    notifications: dict[tuple[str, int], tuple[Notification, str]] = {}
+    for entry_id, entry in entries:
+        chat_id = int(entry["chat_id"])
+        for user_uid in entry["recipients_uid"].split(","):
+            previous = notifications.get((user_uid, chat_id))
+            notification = Notification(
+                user_uid=user_uid,
+                chat_id=chat_id,
+                message_id=int(entry["message_id"]),
+                text=entry["text"],
+                messages_count=previous[0].messages_count + 1 if previous else 1,
+            )
+            notifications[(user_uid, chat_id)] = (notification, entry_id)
+    return list(notifications.values())
+
+
+def _now() -> int:
+    return int(time.time() * 1000)
+
+
+def _parse_notifications(fields: list[str]) -> list[Notification]:
+    return [
+        Notification(user_uid, int(chat_id), int(message_id), text, int(messages_count))
+        for user_uid, chat_id, message_id, text, messages_count in zip(*[iter(fields)] * 5)
+    ]
+
+
+async def limit(entries: list[tuple[str, dict[str, str]]]) -> list[Notification]:
+    """Notifications allowed now by coalescing windows and rate limits, others are kept in redis until due"""
+    if not entries:
+        return []
+    # Entries retried after failed delivery get the notifications decided for them before
+    limited = await cache_service.get_limited_push_entries([entry_id for entry_id, _ in entries])
+    notifications = [notification for fields in limited.values() for notification in _parse_notifications(fields)]
+    new_entries = [(entry_id, entry) for entry_id, entry in entries if entry_id not in limited]
+    if new_entries:
+        fields = await cache_service.coalesce_push_notifications(
+            [(*notification, entry_id) for notification, entry_id in _coalesce(new_entries)],
+            [entry_id for entry_id, _ in new_entries],
+            _now(),
+        )
+        notifications.extend(_parse_notifications(fields))
+    return notifications
+
+
+async def pop_due() -> list[Notification]:
+    return _parse_notifications(await cache_service.pop_due_push_notifications(_now(), config.push.read_batch_size))
+
+
+async def deliver(notifications: list[Notification]) -> None:
+    if not notifications:
+        return
+    notifications_by_user_uid: dict[str, list[Notification]] = {}
+    for notification in notifications:
+        notifications_by_user_uid.setdefault(notification.user_uid, []).append(notification)
+    devices = await contacts_service.get_tokens(list(notifications_by_user_uid))
+    for platform, platform_devices in groupby(devices, key=lambda device: device[0]):
+        messages = [
+            (token, notification)
+            for _, user_uid, token in platform_devices
+            for notification in notifications_by_user_uid[user_uid]
+        ]
+        sender = get_sender(platform)
+        for start in range(0, len(messages), config.push.send_batch_size):
+            rejected_tokens = await sender.send(messages[start : start + config.push.send_batch_size])
+            if rejected_tokens:
+                logger.info(f"Tokens rejected by {platform} are removed: {rejected_tokens}")
+                await contacts_service.delete_tokens(rejected_tokens)
+
+
+async def process_queue(consumer: str, block: int | None = None) -> int:
+    """Delivers one batch of queue and due notifications, both are acknowledged only after delivery"""
+    entries = await cache_service.read_push_queue(consumer, count=config.push.read_batch_size, block=block)
+    notifications = await limit(entries)
+    due_notifications = await pop_due()
+    await deliver(notifications + due_notifications)
+    await cache_service.ack_due_push_notifications(due_notifications)
+    await cache_service.ack_push_queue([entry_id for entry_id, _ in entries])
+    return len(entries)
+
+
+async def run_worker(consumer: str) -> None:
+    # Notifications of a platform without sender would be acknowledged and lost, so the worker does not start
+    for platform in PlatformName:
+        get_sender(platform)
+    await cache_service.create_push_queue_group()
+    logger.info(f"Push worker {consumer} is started")
+    while True:
+        try:
+            await process_queue(consumer, block=config.push.read_block)
+        except Exception:
+            logger.exception("Notifications are not delivered")
+            await asyncio.sleep(config.push.read_block / 1000)
@@ -0,0 +1,22 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import config
+from app.db.registry import registry
+from app.services import cache as cache_service
+
+
+async def mark_user_write(user_uid: str) -> None:
+    # Workers share the mark in redis, so the next read of the user sees the write on any worker
+    if config.database.replica_dsns:
+        await cache_service.create_recent_write_cache(user_uid, config.database.replica_sticky_time)
+
+
+@asynccontextmanager
+async def read_session(user_uid: str, primary: bool = False) -> AsyncIterator[AsyncSession]:
+    if not primary and registry.healthy_replicas:
+        primary = await cache_service.has_recent_write_cache(user_uid)
+    async with registry.read_session(primary=primary) as session:
+        yield session
@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import suppress
+
+from loguru import logger
+from sqlalchemy import and_, func, select, update
+
+from app import config, db
+from app.db.registry import registry
+
+_index_task: asyncio.Task | None = None
+
+
+async def index_messages(batch_size: int) -> int:
+    # Rows locked by another worker are skipped, so several workers index different batches
+    not_indexed_query = (
+        select(db.Message.id)
+        .where(db.Message.search_text.is_(None))
+        .order_by(db.Message.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    query = (
+        update(db.Message)
+        .values(
+            search_text=func.to_tsvector(func.lower(db.Message.text)),
+            # Indexing is not an edit of the message
+            time_updated=db.Message.time_updated,
+        )
+        .where(and_(db.Message.id.in_(not_indexed_query.scalar_subquery()), db.Message.search_text.is_(None)))
+        .execution_options(synchronize_session=False)
+    )
+    async with registry.autocommit_engine.connect() as connection:
+        indexed_count = (await connection.execute(query)).rowcount
+    if indexed_count:
+        logger.debug(f"Indexed {indexed_count} messages")
+    return indexed_count
+
+
+async def _index_periodically() -> None:
+    while True:
+        try:
+            # Backlog is indexed without pauses, an idle worker only polls the partial index
+            while await index_messages(config.database.search_indexing_batch_size) == (
+                config.database.search_indexing_batch_size
+            ):
+                pass
+        except Exception:
+            logger.exception("Messages are not indexed")
+        await asyncio.sleep(config.database.search_indexing_interval)
+
+
+async def start_indexer() -> None:
+    global _index_task
+    _index_task = asyncio.create_task(_index_periodically())
+
+
+async def stop_indexer() -> None:
+    global _index_task
+    if _index_task is None:
+        return
+    _index_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await _index_task
+    _index_task = None
@@ -1,23 +1,58 @@
-from itertools import chain
+import asyncio
+from contextlib import suppress
+from datetime import timedelta
 
 from fastapi import HTTPException, status
 from loguru import logger
 from pydantic.types import UUID4
-from sqlalchemy import and_, func, select, update
+from sqlalchemy import (
+    UUID,
+    BigInteger,
+    Sequence,
+    Text,
+    and_,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    update,
+    values,
+)
 from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.functions import coalesce
 from starlette.datastructures import Headers
 
 from app import config, db, sio
-from app.db.enums import MessageType
+from app.db.enums import ChatState, MessageType
 from app.db.registry import registry
+from app.schemas import chats as s_chat
 from app.schemas import sio as s_sio
 from app.services import cache as cache_service
-from app.services.utils import check_user_uid_by_sid
-from app.sio.constants import NAMESPACE
+from app.services import push as push_service
+from app.services import replicas as replicas_service
+from app.services import sync as sync_service
+from app.services import unread_counters as unread_counters_service
+from app.services import users as users_service
+from app.services.batcher import Batcher
+from app.services.memory_cache import TTLCache
+from app.services.utils import check_user_uid_by_sid, get_timestamp
+from app.sio.constants import CHAT_ROOM_PREFIX, NAMESPACE
 
 DELETED_MESSAGE_TEXT = "deleted"
+MESSAGES_ID_SEQUENCE = Sequence("messages_id_seq")
+
+# Whether user has any session, sessions of this process update it at once
+presence_cache: TTLCache[str, bool] = TTLCache(
+    name="presence", maxsize=config.cache.presence_cache_size, ttl=config.cache.presence_cache_ttl
+)
+
+_outbox_task: asyncio.Task | None = None
 
 
 async def connect(sid: str, environ: dict) -> str | None:  # type: ignore[return]
@@ -26,17 +61,61 @@ async def connect(sid: str, environ: dict) -> str | None:  # type: ignore[return
     user_id = headers.get(config.application.user_header_name)
     if not user_id:
         return s_sio.SioEvents.USER_MISSING
-    query = select(db.User).where(db.User.uid == user_id)
-    async with registry.session() as session:
-        if not (await session.execute(query)).scalar():
-            return s_sio.SioEvents.USER_MISSING
+    user_state = await users_service.get_user_state(user_id)
+    if user_state == users_service.UserState.MISSING:
+        return s_sio.SioEvents.USER_MISSING
+    if user_state == users_service.UserState.BLOCKED:
+        return s_sio.SioEvents.USER_BLOCKED
     logger.debug(f"User id - {user_id}")
     await cache_service.create_sid_cache(user_id, sid)
+    presence_cache.set(user_id, True)
+    for chat_id in await _get_user_chats_id(user_id):
+        sio.sio.enter_room(sid, get_chat_room(chat_id), namespace=NAMESPACE)
     logger.info(f"Connect user: {user_id} with sid: {sid}")
 
 
 async def disconnect(sid: str) -> None:
+    user_uid = cache_service.local_user_uid_by_sid.get(sid)
     await cache_service.remove_sid_cache(sid)
+    if user_uid:
+        presence_cache.delete(user_uid)
+
+
+async def clear_node_sessions() -> None:
+    await cache_service.remove_node_sid_cache(config.socketio.node_id)
+
+
+def get_chat_room(chat_id: int) -> str:
+    return f"{CHAT_ROOM_PREFIX}{chat_id}"
+
+
+async def join_chat_room(users_uid: list[UUID4], chat_id: int) -> None:
+    room = get_chat_room(chat_id)
+    for sid in await _get_users_sid(users_uid):
+        await sio.sio.manager.propagate_enter_room(sid, NAMESPACE, room)
+
+
+async def leave_chat_room(users_uid: list[UUID4], chat_id: int) -> None:
+    room = get_chat_room(chat_id)
+    for sid in await _get_users_sid(users_uid):
+        await sio.sio.manager.propagate_leave_room(sid, NAMESPACE, room)
+
+
+async def _get_users_sid(users_uid: list[UUID4]) -> list[str]:
+    return list(await cache_service.get_users_sid([str(user_uid) for user_uid in users_uid]))
+
+
+async def _get_user_chats_id(user_uid: str) -> list[int]:
+    query = select(db.ChatRelationship.chat_id).where(
+        and_(
+            db.ChatRelationship.user_uid == user_uid,
+            db.ChatRelationship.state.notin_((ChatState.ARCHIVE, ChatState.DELETED)),
+        )
+    )
+    async with registry.session() as session:
+        chats_id = await session.execute(query)
+
+    return list(chats_id.scalars())
 
 
 @check_user_uid_by_sid
@@ -44,13 +123,18 @@ async def process_create_message(sio_payload: dict, sid: str) -> None:
     saved_message_data = await _save_message(s_sio.NewMessagePayload(**sio_payload))
 
     if saved_message_data:
-        sio_payload["id"] = saved_message_data[0]
-        sio_payload["time_created"] = saved_message_data[1].timestamp()
+        await replicas_service.mark_user_write(sio_payload["sender_id"])
+        if config.database.messages_outbox:
+            return
+        sio_payload["id"] = saved_message_data.id
+        sio_payload["time_created"] = get_timestamp(saved_message_data.time_created)
+        sio_payload["sync_cursor"] = saved_message_data.sync_cursor
         await _send_message(
             message=sio_payload,
             event_name=s_sio.SioEvents.MESSAGE_NEW,
             sid=sid,
             send_to_offline=True,
+            recipients_uid=[str(recipient_uid) for recipient_uid in saved_message_data.recipients_uid or []],
         )
 
 
@@ -60,7 +144,11 @@ async def process_edit_message(sio_payload: dict, sid: str) -> None:
 
     if not edited_message_data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    sio_payload["time_updated"] = edited_message_data[0].timestamp()
+    await replicas_service.mark_user_write(sio_payload["sender_id"])
+    if config.database.messages_outbox:
+        return
+    sio_payload["time_updated"] = get_timestamp(edited_message_data.time_updated)
+    sio_payload["sync_cursor"] = edited_message_data.sync_cursor
     await _send_message(
         message=sio_payload,
         event_name=s_sio.SioEvents.MESSAGE_CHANGE,
@@ -85,11 +173,15 @@ async def process_delete_messages(sio_payload: dict, sid: str) -> None:
 
     if not deleted_messages_data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    await replicas_service.mark_user_write(sio_payload["sender_id"])
+    if config.database.messages_outbox:
+        return
     del sio_payload["message_ids"]
     for row in deleted_messages_data:
         sio_payload["text"] = DELETED_MESSAGE_TEXT
         sio_payload["id"] = row.id
-        sio_payload["time_updated"] = row.time_updated.timestamp()
+        sio_payload["time_updated"] = get_timestamp(row.time_updated)
+        sio_payload["sync_cursor"] = row.sync_cursor
         await _send_message(
             message=sio_payload,
             event_name=s_sio.SioEvents.MESSAGE_CHANGE,
@@ -97,52 +189,222 @@ async def process_delete_messages(sio_payload: dict, sid: str) -> None:
         )
 
 
-async def _save_message(message_for_saving: s_sio.NewMessagePayload) -> tuple | None:
-    async with registry.session() as session:
-        insert_message_query = (
-            pg_insert(db.Message)
-            .values(
-                **message_for_saving.model_dump(),
-                search_text=func.to_tsvector(coalesce(message_for_saving.text.lower(), "")),
-                type_=MessageType.FROM_USER,
-            )
-            .on_conflict_do_nothing(
-                constraint="messages_client_id_key",
+@check_user_uid_by_sid
+async def process_sync(sio_payload: dict, sid: str) -> dict:
+    data = s_chat.SyncData(**sio_payload)
+    sync_result = await sync_service.get_changes(data, sio_payload["sender_id"])
+    return sync_result.model_dump(mode="json")
+
+
+async def _save_message(message_for_saving: s_sio.NewMessagePayload) -> Row | None:
+    if config.database.messages_batching:
+        return await messages_batcher.submit(message_for_saving)
+    return (await _save_messages([message_for_saving]))[0]
+
+
+async def _save_messages(messages_for_saving: list[s_sio.NewMessagePayload]) -> list[Row | None]:
+    # Insert, counters update and recipients select are one statement, so it is one round trip to DB.
+    # DML inside CTE works only with core tables. Search vectors are left for app.services.search_indexer
+    messages_table = db.Message.__table__
+    client_ids_table = db.MessageClientId.__table__
+    relationships_table = db.ChatRelationship.__table__
+    chats_table = db.Chat.__table__
+    unique_messages: dict[UUID4, s_sio.NewMessagePayload] = {}
+    for message_for_saving in messages_for_saving:
+        unique_messages.setdefault(message_for_saving.client_id, message_for_saving)
+    messages_data = values(
+        column("client_id", UUID),
+        column("user_uid", UUID),
+        column("chat_id", BigInteger),
+        column("text", Text),
+        name="messages_data",
+    ).data(
+        [(message.client_id, message.user_uid, message.chat_id, message.text) for message in unique_messages.values()]
+    )
+    # Messages table is partitioned and can not have unique client_id, so new keys reserve ids of messages
+    insert_client_ids_cte = (
+        pg_insert(client_ids_table)
+        .from_select(["client_id", "message_id"], select(messages_data.c.client_id, MESSAGES_ID_SEQUENCE.next_value()))
+        .on_conflict_do_nothing(index_elements=["client_id"])
+        .returning(client_ids_table.c.client_id, client_ids_table.c.message_id)
+        .cte("new_client_ids")
+    )
+    insert_messages_cte = (
+        pg_insert(messages_table)
+        .from_select(
+            ["id", "user_uid", "chat_id", "client_id", "text", "type_"],
+            select(
+                insert_client_ids_cte.c.message_id,
+                messages_data.c.user_uid,
+                messages_data.c.chat_id,
+                messages_data.c.client_id,
+                messages_data.c.text,
+                literal(MessageType.FROM_USER, messages_table.c.type_.type),
+            ).join_from(
+                messages_data, insert_client_ids_cte, messages_data.c.client_id == insert_client_ids_cte.c.client_id
+            ),
+        )
+        .returning(
+            messages_table.c.id,
+            messages_table.c.client_id,
+            messages_table.c.time_created,
+            messages_table.c.chat_id,
+            messages_table.c.user_uid,
+            messages_table.c.text,
+        )
+        .cte("new_messages")
+    )
+    recipients_condition = and_(
+        relationships_table.c.chat_id == insert_messages_cte.c.chat_id,
+        relationships_table.c.user_uid != insert_messages_cte.c.user_uid,
+        relationships_table.c.state != ChatState.DELETED,
+    )
+    # Recipients are NULL for a message without them, as in array_agg of no rows
+    recipients_cte = (
+        select(
+            insert_messages_cte.c.id,
+            func.array_agg(relationships_table.c.user_uid)
+            .filter(relationships_table.c.user_uid.is_not(None))
+            .label("recipients_uid"),
+        )
+        .select_from(insert_messages_cte.outerjoin(relationships_table, recipients_condition))
+        .group_by(insert_messages_cte.c.id)
+        .cte("new_messages_recipients")
+    )
+    messages_with_recipients = insert_messages_cte.join(
+        recipients_cte, recipients_cte.c.id == insert_messages_cte.c.id
+    )
+    save_messages_query = select(
+        insert_messages_cte.c.id,
+        insert_messages_cte.c.client_id,
+        insert_messages_cte.c.time_created,
+        insert_messages_cte.c.chat_id,
+        recipients_cte.c.recipients_uid,
+        sync_service.SYNC_CURSOR.label("sync_cursor"),
+    ).select_from(messages_with_recipients)
+    chats_activity_cte = (
+        select(
+            relationships_table.c.chat_id,
+            relationships_table.c.user_uid,
+            func.count()
+            .filter(insert_messages_cte.c.user_uid != relationships_table.c.user_uid)
+            .label("messages_count"),
+            func.max(insert_messages_cte.c.time_created).label("last_message_at"),
+        )
+        .select_from(
+            insert_messages_cte.join(
+                relationships_table,
+                and_(
+                    relationships_table.c.chat_id == insert_messages_cte.c.chat_id,
+                    relationships_table.c.state != ChatState.DELETED,
+                ),
             )
         )
-        saved_message_data = (
-            await session.execute(insert_message_query.returning(db.Message.id, db.Message.time_created))
-        ).first()
-
-        if saved_message_data:
-            await _update_unread_counter(message_for_saving, session)
-
-        await session.commit()
-    return saved_message_data
-
+        .group_by(relationships_table.c.chat_id, relationships_table.c.user_uid)
+        .cte("chats_activity")
+    )
+    update_relationships_query = update(relationships_table).where(
+        and_(
+            relationships_table.c.chat_id == chats_activity_cte.c.chat_id,
+            relationships_table.c.user_uid == chats_activity_cte.c.user_uid,
+        )
+    )
+    last_message_at = func.greatest(relationships_table.c.last_message_at, chats_activity_cte.c.last_message_at)
+    if config.cache.unread_counters_batching:
+        # Member rows of hot chats are not rewritten by every message, chat list order is precise to flush interval
+        update_relationships_query = update_relationships_query.values(last_message_at=last_message_at).where(
+            relationships_table.c.last_message_at
+            < chats_activity_cte.c.last_message_at - timedelta(seconds=config.cache.unread_counters_flush_interval)
+        )
+    else:
+        update_relationships_query = update_relationships_query.values(
+            unread_counter=relationships_table.c.unread_counter + chats_activity_cte.c.messages_count,
+            last_message_at=last_message_at,
+        )
 
-async def _update_unread_counter(message: s_sio.NewMessagePayload, session: AsyncSession) -> None:
-    update_unread_counter_query = (
-        update(db.ChatRelationship)
-        .values(unread_counter=db.ChatRelationship.unread_counter + 1)
+    last_messages_cte = (
+        select(
+            insert_messages_cte.c.chat_id,
+            func.max(insert_messages_cte.c.id).label("id"),
+            func.max(insert_messages_cte.c.time_created).label("time_created"),
+        )
+        .group_by(insert_messages_cte.c.chat_id)
+        .cte("last_messages")
+    )
+    # Statements of concurrent batches may commit in any order, the last message is never moved back
+    update_chats_query = (
+        update(chats_table)
+        .values(last_message_id=last_messages_cte.c.id, last_message_at=last_messages_cte.c.time_created)
         .where(
             and_(
-                db.ChatRelationship.chat_id == message.chat_id,
-                db.ChatRelationship.user_uid != message.user_uid,
+                chats_table.c.id == last_messages_cte.c.chat_id,
+                or_(chats_table.c.last_message_id.is_(None), chats_table.c.last_message_id < last_messages_cte.c.id),
             )
         )
     )
+    save_messages_query = save_messages_query.add_cte(update_relationships_query.cte("updated_relationships")).add_cte(
+        update_chats_query.cte("updated_chats")
+    )
+    if config.database.messages_outbox:
+        # The same payload as process_create_message sends, events are committed together with messages
+        insert_outbox_query = insert(db.MessageOutbox.__table__).from_select(
+            ["event_name", "chat_id", "payload", "recipients_uid"],
+            select(
+                literal(str(s_sio.SioEvents.MESSAGE_NEW)),
+                insert_messages_cte.c.chat_id,
+                func.jsonb_build_object(
+                    "sender_id",
+                    insert_messages_cte.c.user_uid,
+                    "chat_id",
+                    insert_messages_cte.c.chat_id,
+                    "client_id",
+                    insert_messages_cte.c.client_id,
+                    "text",
+                    insert_messages_cte.c.text,
+                    "id",
+                    insert_messages_cte.c.id,
+                    "time_created",
+                    func.extract("epoch", insert_messages_cte.c.time_created),
+                    "sync_cursor",
+                    sync_service.SYNC_CURSOR,
+                ),
+                recipients_cte.c.recipients_uid,
+            )
+            .select_from(messages_with_recipients)
+            .order_by(insert_messages_cte.c.id),
+        )
+        save_messages_query = save_messages_query.add_cte(insert_outbox_query.cte("outbox_events"))
 
-    await session.execute(update_unread_counter_query)
+    async with registry.autocommit_engine.connect() as connection:
+        saved_messages_data = {row.client_id: row for row in await connection.execute(save_messages_query)}
 
+    if config.cache.unread_counters_batching:
+        for row in saved_messages_data.values():
+            await unread_counters_service.increment(
+                row.chat_id, [str(recipient_uid) for recipient_uid in row.recipients_uid or []]
+            )
+    # Duplicates of client_id in one batch are saved only once, like repeated requests
+    return [saved_messages_data.pop(message.client_id, None) for message in messages_for_saving]
 
-async def _update_message(message_for_update: s_sio.EditMessagePayload) -> tuple | None:
+
+messages_batcher: Batcher[s_sio.NewMessagePayload, Row | None] = Batcher(
+    handler=_save_messages,
+    max_size=config.database.messages_batch_size,
+    max_delay=config.database.messages_batch_delay,
+    # A message of unknown chat or a deadlock with a concurrent batch fails the statement of the whole batch
+    split_on=(DBAPIError,),
+)
+
+
+async def _update_message(message_for_update: s_sio.EditMessagePayload) -> Row | None:
+    # Core table, ORM statements can not return SQL expressions like the sync cursor
     async with registry.session() as session:
         update_message_query = (
-            update(db.Message)
+            update(db.Message.__table__)
             .values(
                 text=message_for_update.text,
-                search_text=func.to_tsvector(coalesce(message_for_update.text.lower(), "")),
+                search_text=None,
+                change_xid=literal_column(db.CURRENT_XACT_ID),
             )
             .where(
                 and_(
@@ -151,7 +413,16 @@ async def _update_message(message_for_update: s_sio.EditMessagePayload) -> tuple
                 )
             )
         )
-        updated_message_data = (await session.execute(update_message_query.returning(db.Message.time_updated))).first()
+        updated_message_data = (
+            await session.execute(
+                update_message_query.returning(db.Message.time_updated, sync_service.SYNC_CURSOR.label("sync_cursor"))
+            )
+        ).first()
+        if updated_message_data and config.database.messages_outbox:
+            payload = message_for_update.model_dump(by_alias=True, mode="json")
+            payload["time_updated"] = get_timestamp(updated_message_data.time_updated)
+            payload["sync_cursor"] = updated_message_data.sync_cursor
+            await _add_outbox_events(session, s_sio.SioEvents.MESSAGE_CHANGE, [payload])
 
         await session.commit()
     return updated_message_data
@@ -160,11 +431,12 @@ async def _update_message(message_for_update: s_sio.EditMessagePayload) -> tuple
 async def _delete_messages(message_for_delete: s_sio.DeleteMessagesPayload) -> list:
     async with registry.session() as session:
         delete_messages_query = (
-            update(db.Message)
+            update(db.Message.__table__)
             .values(
                 text=DELETED_MESSAGE_TEXT,
-                search_text=func.to_tsvector(coalesce(DELETED_MESSAGE_TEXT, "")),
+                search_text=None,
                 type_=MessageType.DELETED,
+                change_xid=literal_column(db.CURRENT_XACT_ID),
             )
             .where(
                 and_(
@@ -175,56 +447,174 @@ async def _delete_messages(message_for_delete: s_sio.DeleteMessagesPayload) -> l
             )
         )
         deleted_messages_data = (
-            await session.execute(delete_messages_query.returning(db.Message.id, db.Message.time_updated))
+            await session.execute(
+                delete_messages_query.returning(
+                    db.Message.id, db.Message.time_updated, sync_service.SYNC_CURSOR.label("sync_cursor")
+                )
+            )
         ).all()
+        if deleted_messages_data and config.database.messages_outbox:
+            payload = message_for_delete.model_dump(by_alias=True, mode="json", exclude={"message_ids"})
+            payloads = [
+                payload
+                | {
+                    "text": DELETED_MESSAGE_TEXT,
+                    "id": row.id,
+                    "time_updated": get_timestamp(row.time_updated),
+                    "sync_cursor": row.sync_cursor,
+                }
+                for row in deleted_messages_data
+            ]
+            await _add_outbox_events(session, s_sio.SioEvents.MESSAGE_CHANGE, payloads)
 
         await session.commit()
     return deleted_messages_data
 
 
+async def _add_outbox_events(session: AsyncSession, event_name: str, payloads: list[dict]) -> None:
+    await session.execute(
+        insert(db.MessageOutbox),
+        [{"event_name": event_name, "chat_id": payload["chat_id"], "payload": payload} for payload in payloads],
+    )
+
+
+async def dispatch_outbox(batch_size: int) -> int:
+    # Events are claimed by a short transaction, no locks are held while they are sent. Events claimed by another
+    # dispatcher are skipped until its lease expires, a failed event does not block the next ones.
+    claimable_events_query = (
+        select(db.MessageOutbox.id)
+        .where(db.MessageOutbox.time_next_attempt <= func.now())
+        .order_by(db.MessageOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claim_query = (
+        update(db.MessageOutbox)
+        .where(db.MessageOutbox.id.in_(claimable_events_query.scalar_subquery()))
+        .values(
+            attempts=db.MessageOutbox.attempts + 1,
+            time_next_attempt=func.now() + timedelta(seconds=config.database.outbox_lease_time),
+        )
+        .returning(
+            db.MessageOutbox.id,
+            db.MessageOutbox.event_name,
+            db.MessageOutbox.payload,
+            db.MessageOutbox.recipients_uid,
+            db.MessageOutbox.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    async with registry.session() as session:
+        events = sorted((await session.execute(claim_query)).all(), key=lambda event: event.id)
+        await session.commit()
+
+    done_events_id = []
+    for event in events:
+        try:
+            await _send_message(
+                message=event.payload,
+                event_name=event.event_name,
+                send_to_offline=event.recipients_uid is not None,
+                recipients_uid=[str(recipient_uid) for recipient_uid in event.recipients_uid or []],
+            )
+        except Exception:
+            if event.attempts < config.database.outbox_max_attempts:
+                logger.exception(f"Event {event.id} of outbox is not sent, attempt {event.attempts}")
+                continue
+            logger.exception(f"Event {event.id} of outbox is dropped after {event.attempts} attempts: {event.payload}")
+        done_events_id.append(event.id)
+
+    if done_events_id:
+        async with registry.session() as session:
+            await session.execute(delete(db.MessageOutbox).where(db.MessageOutbox.id.in_(done_events_id)))
+            await session.commit()
+    return len(events)
+
+
+async def _dispatch_periodically() -> None:
+    while True:
+        try:
+            while await dispatch_outbox(config.database.outbox_batch_size) == config.database.outbox_batch_size:
+                pass
+        except Exception:
+            logger.exception("Events of outbox are not sent")
+        await asyncio.sleep(config.database.outbox_interval)
+
+
+async def start_outbox_dispatcher() -> None:
+    global _outbox_task
+    if config.database.messages_outbox:
+        _outbox_task = asyncio.create_task(_dispatch_periodically())
+
+
+async def stop_outbox_dispatcher() -> None:
+    global _outbox_task
+    if _outbox_task is None:
+        return
+    _outbox_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await _outbox_task
+    _outbox_task = None
+
+
 async def _send_message(
     message: dict,
     event_name: str,
     sid: str = "",
     send_to_offline: bool = False,
+    recipients_uid: list[str] | None = None,
 ) -> None:
-    recipients_uid = await _get_recipients_uid(message["chat_id"])
-    logger.debug(f"Recipients for - {event_name} - {recipients_uid}")
-    recipients_data = await cache_service.get_online_session(recipients_uid=recipients_uid)
-    online_recipients_sid = _get_online_recipients_sid(recipients_data)
-    if online_recipients_sid:
-        logger.debug(f"Online recipients for - {event_name} - {online_recipients_sid}")
-        await _send_online_message(recipients_sid=online_recipients_sid, message=message, event_name=event_name)
+    await _send_online_message(chat_id=message["chat_id"], message=message, event_name=event_name)
     if send_to_offline:
-        offline_recipients_uid = _get_offline_recipients_uid(recipients_data)
+        if recipients_uid is None:
+            recipients_uid = await _get_recipients_uid(message["chat_id"])
+        logger.debug(f"Recipients for - {event_name} - {recipients_uid}")
+        offline_recipients_uid = await _get_offline_recipients_uid(recipients_uid)
         if offline_recipients_uid:
-            logger.debug(f"Online recipients for - {event_name} - {offline_recipients_uid}")
+            logger.debug(f"Offline recipients for - {event_name} - {offline_recipients_uid}")
             await _send_ofline_message(
                 recipients_uid=offline_recipients_uid, message=message, sender_uid=message["sender_id"]
             )
 
 
 async def _get_recipients_uid(chat_id: int) -> list[str]:
-    query = select(db.ChatRelationship.user_uid).where(db.ChatRelationship.chat_id == chat_id)
+    query = select(db.ChatRelationship.user_uid).where(
+        and_(db.ChatRelationship.chat_id == chat_id, db.ChatRelationship.state != ChatState.DELETED)
+    )
     async with registry.session() as session:
         chat_recipients = await session.execute(query)
 
     return [str(recipient_uid) for recipient_uid in chat_recipients.scalars()]
 
 
-def _get_online_recipients_sid(recipients_data: dict[str, set]) -> list[str]:
-    return [recipient_sid for recipient_sid in chain(*recipients_data.values()) if recipient_sid != set()]
-
+async def _get_offline_recipients_uid(recipients_uid: list[str]) -> list[str]:
+    offline_recipients_uid = []
+    unknown_recipients_uid = []
+    for recipient_uid in recipients_uid:
+        is_online = presence_cache.get(recipient_uid)
+        if is_online is None:
+            unknown_recipients_uid.append(recipient_uid)
+        elif not is_online:
+            offline_recipients_uid.append(recipient_uid)
 
-def _get_offline_recipients_uid(recipients_data: dict[str, set]) -> list[str]:
-    return [recipient_data[0] for recipient_data in recipients_data.items() if recipient_data[1] == set()]
+    if unknown_recipients_uid:
+        offline_users_uid = await cache_service.get_offline_users(unknown_recipients_uid)
+        for recipient_uid in unknown_recipients_uid:
+            presence_cache.set(recipient_uid, True)
+        for recipient_uid in offline_users_uid:
+            presence_cache.set(recipient_uid, False)
+        offline_recipients_uid.extend(offline_users_uid)
+    return offline_recipients_uid
 
 
-async def _send_online_message(recipients_sid: list[str], message: dict, event_name: str) -> None:
-    logger.info(f"Send {event_name} message - {message} to {recipients_sid}")
-    for sid in recipients_sid:
-        await sio.sio.emit(event=event_name, data=message, to=sid, namespace=NAMESPACE)
+async def _send_online_message(chat_id: int, message: dict, event_name: str) -> None:
+    room = get_chat_room(chat_id)
+    logger.info(f"Send {event_name} message - {message} to {room}")
+    await sio.sio.emit(event=event_name, data=message, room=room, namespace=NAMESPACE)
 
 
 async def _send_ofline_message(recipients_uid: list[str], message: dict, sender_uid: UUID4) -> None:
-    pass
+    # Only enqueued here, notifications are delivered by push worker
+    recipients_uid = [recipient_uid for recipient_uid in recipients_uid if recipient_uid != str(sender_uid)]
+    if recipients_uid:
+        await push_service.enqueue_notification(recipients_uid, message)
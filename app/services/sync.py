@@ -0,0 +1,99 @@
+import base64
+import json
+
+from fastapi import HTTPException, status
+from pydantic.types import UUID4
+from sqlalchemy import (
+    BigInteger,
+    String,
+    Text,
+    and_,
+    cast,
+    func,
+    literal,
+    literal_column,
+    select,
+    true,
+    tuple_,
+)
+
+from app import db
+from app.db.enums import ChatState
+from app.schemas import chats as s_chat
+from app.services import replicas as replicas_service
+
+# Transactions with lower ids are finished, so changes below it can not appear behind a returned cursor
+SNAPSHOT_XMIN = literal_column("(pg_snapshot_xmin(pg_current_snapshot())::text::bigint)", BigInteger)
+# Cursor before all changes which are not finished yet, in format of _encode_sync_cursor. It is built by DB,
+# so events written by a statement, also to outbox, carry the position of sync after them
+SYNC_CURSOR = func.translate(
+    func.encode(
+        func.convert_to(cast(func.json_build_object("change_xid", SNAPSHOT_XMIN, "message_id", 0), Text), "UTF8"),
+        "base64",
+    ),
+    "+/",
+    "-_",
+    type_=String,
+)
+
+
+def _encode_sync_cursor(change_xid: int, message_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"change_xid": change_xid, "message_id": message_id}).encode()).decode()
+
+
+def _decode_sync_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor))
+        return int(data["change_xid"]), int(data["message_id"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"cursor": "invalid cursor"})
+
+
+async def get_changes(data: s_chat.SyncData, user_uid: UUID4 | str) -> s_chat.SyncResult:
+    """New, edited and deleted messages of all chats of user after the cursor, in order of writing transactions"""
+    if not data.cursor:
+        # Client starts from the current position, missed history is read by message_history of chats
+        async with replicas_service.read_session(str(user_uid), primary=True) as session:
+            cursor = (await session.execute(select(SYNC_CURSOR))).scalar_one()
+        return s_chat.SyncResult(messages=[], cursor=cursor, has_more=False)
+
+    condition = db.Message.change_xid < SNAPSHOT_XMIN
+    change_xid, message_id = _decode_sync_cursor(data.cursor)
+    condition &= tuple_(db.Message.change_xid, db.Message.id) > tuple_(literal(change_xid), literal(message_id))
+
+    user_chats = (
+        select(db.ChatRelationship.chat_id)
+        .where(
+            and_(
+                db.ChatRelationship.user_uid == user_uid,
+                db.ChatRelationship.state != ChatState.DELETED,
+            )
+        )
+        .subquery()
+    )
+    # Every chat reads at most a page from the index, so a long offline user does not sort all history of chats
+    chat_changes = (
+        select(*[getattr(db.Message, field) for field in s_chat.ChangedMessage.model_fields], db.Message.change_xid)
+        .where(and_(db.Message.chat_id == user_chats.c.chat_id, condition))
+        .order_by(db.Message.change_xid, db.Message.id)
+        .limit(data.page_size + 1)
+        .lateral()
+    )
+    query = (
+        select(chat_changes)
+        .select_from(user_chats.join(chat_changes, true()))
+        .order_by(chat_changes.c.change_xid, chat_changes.c.id)
+        .limit(data.page_size + 1)
+    )
+
+    # Lagging replica may miss finished changes, they would be skipped by the returned cursor
+    async with replicas_service.read_session(str(user_uid), primary=True) as session:
+        rows = (await session.execute(query)).all()
+
+    has_more = len(rows) > data.page_size
+    rows = rows[: data.page_size]
+    return s_chat.SyncResult(
+        messages=[s_chat.ChangedMessage.model_validate(row) for row in rows],
+        cursor=_encode_sync_cursor(rows[-1].change_xid, rows[-1].id) if rows else data.cursor,
+        has_more=has_more,
+    )
@@ -0,0 +1,191 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from contextlib import suppress
+from datetime import timedelta
+from typing import NamedTuple
+
+from loguru import logger
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    and_,
+    column,
+    delete,
+    exists,
+    func,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import config, db
+from app.db.registry import registry
+from app.services import cache as cache_service
+
+FLUSH_LOCK_LIFETIME = 30
+# Ids of applied batches are kept much longer than a batch can stay in redis after it is applied
+FLUSH_ID_LIFETIME = timedelta(days=1)
+
+
+class PendingUnreadCounters(NamedTuple):
+    flush_id: str
+    unread_counters: dict[int, int]
+
+
+pending_unread_counters: defaultdict[tuple[int, str], int] = defaultdict(int)
+_pending_flush_id = str(uuid.uuid4())
+_in_flight_unread_counters: tuple[str, dict[tuple[int, str], int]] | None = None
+_flush_task: asyncio.Task | None = None
+
+
+async def increment(chat_id: int, users_uid: list[str]) -> None:
+    if not users_uid:
+        return
+    if config.cache.unread_counters_redis:
+        await cache_service.increment_unread_counters_cache(chat_id, users_uid, str(uuid.uuid4()))
+        return
+    for user_uid in users_uid:
+        pending_unread_counters[(chat_id, user_uid)] += 1
+
+
+async def get_pending(user_uid: str, chats_id: list[int]) -> list[PendingUnreadCounters]:
+    """Deltas of pending and in-flight batches, each of them is added to DB counters only until it is applied"""
+    if not config.cache.unread_counters_batching:
+        return []
+    if config.cache.unread_counters_redis:
+        return [
+            PendingUnreadCounters(flush_id, unread_counters)
+            for flush_id, unread_counters in await cache_service.get_user_unread_counters_cache(user_uid, chats_id)
+        ]
+    batches: list[tuple[str, dict[tuple[int, str], int]]] = [(_pending_flush_id, pending_unread_counters)]
+    if _in_flight_unread_counters:
+        batches.append(_in_flight_unread_counters)
+    pending = []
+    for flush_id, unread_counters in batches:
+        user_unread_counters = {
+            chat_id: unread_counters[(chat_id, user_uid)]
+            for chat_id in chats_id
+            if (chat_id, user_uid) in unread_counters
+        }
+        if user_unread_counters:
+            pending.append(PendingUnreadCounters(flush_id, user_unread_counters))
+    return pending
+
+
+async def get_unread_counters(user_uid: str, unread_counters: dict[int, int]) -> dict[int, int]:
+    """Counters read from DB by chat id with deltas which are not applied yet"""
+    pending = await get_pending(user_uid, list(unread_counters))
+    if not pending:
+        return unread_counters
+
+    applied = [
+        exists().where(db.UnreadCountersFlush.id == batch.flush_id).label(f"applied_{i}")
+        for i, batch in enumerate(pending)
+    ]
+    query = select(db.ChatRelationship.chat_id, db.ChatRelationship.unread_counter, *applied).where(
+        and_(
+            db.ChatRelationship.user_uid == user_uid,
+            db.ChatRelationship.chat_id.in_({chat_id for batch in pending for chat_id in batch.unread_counters}),
+        )
+    )
+    # Counters and applied batches are read again in one snapshot of primary, a batch is removed from redis
+    # after its commit, so it is either seen in redis or in this snapshot
+    async with registry.session() as session:
+        rows = (await session.execute(query)).all()
+
+    unread_counters = dict(unread_counters)
+    for chat_id, unread_counter, *batches_applied in rows:
+        unread_counters[chat_id] = unread_counter + sum(
+            batch.unread_counters.get(chat_id, 0)
+            for batch, batch_applied in zip(pending, batches_applied)
+            if not batch_applied
+        )
+    return unread_counters
+
+
+async def flush() -> None:
+    # Deltas stay visible for reads until the DB is updated, a failed batch is applied again with the same flush id
+    global _in_flight_unread_counters, _pending_flush_id
+    if config.cache.unread_counters_redis:
+        token = str(uuid.uuid4())
+        if not await cache_service.acquire_unread_counters_lock(token, FLUSH_LOCK_LIFETIME):
+            return
+        try:
+            in_flight = await cache_service.start_unread_counters_flush()
+            if in_flight:
+                await _update_unread_counters(*in_flight)
+                await cache_service.finish_unread_counters_flush(in_flight[0])
+        finally:
+            await cache_service.release_unread_counters_lock(token)
+        return
+
+    if _in_flight_unread_counters is None and pending_unread_counters:
+        _in_flight_unread_counters = (_pending_flush_id, dict(pending_unread_counters))
+        pending_unread_counters.clear()
+        _pending_flush_id = str(uuid.uuid4())
+    if _in_flight_unread_counters is None:
+        return
+    await _update_unread_counters(*_in_flight_unread_counters)
+    _in_flight_unread_counters = None
+
+
+async def _update_unread_counters(flush_id: str, unread_counters: dict[tuple[int, str], int]) -> None:
+    deltas = values(
+        column("chat_id", BigInteger), column("user_uid", UUID), column("delta", Integer), name="deltas"
+    ).data([(chat_id, user_uid, delta) for (chat_id, user_uid), delta in unread_counters.items()])
+    query = (
+        update(db.ChatRelationship)
+        .values(unread_counter=db.ChatRelationship.unread_counter + deltas.c.delta)
+        .where(
+            and_(
+                db.ChatRelationship.chat_id == deltas.c.chat_id,
+                db.ChatRelationship.user_uid == deltas.c.user_uid,
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    async with registry.session() as session:
+        applied = await session.execute(
+            pg_insert(db.UnreadCountersFlush)
+            .values(id=flush_id)
+            .on_conflict_do_nothing()
+            .returning(db.UnreadCountersFlush.id)
+        )
+        if applied.first() is None:
+            logger.warning(f"Unread counters of flush {flush_id} are already applied")
+            return
+        await session.execute(query)
+        await session.execute(
+            delete(db.UnreadCountersFlush).where(db.UnreadCountersFlush.time_created < func.now() - FLUSH_ID_LIFETIME)
+        )
+        await session.commit()
+    logger.debug(f"Flushed {len(unread_counters)} unread counters")
+
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(config.cache.unread_counters_flush_interval)
+        try:
+            await flush()
+        except Exception:
+            logger.exception("Unread counters are not flushed")
+
+
+async def start_flusher() -> None:
+    global _flush_task
+    if config.cache.unread_counters_batching:
+        _flush_task = asyncio.create_task(_flush_periodically())
+
+
+async def stop_flusher() -> None:
+    global _flush_task
+    if _flush_task is None:
+        return
+    _flush_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await _flush_task
+    _flush_task = None
+    await flush()
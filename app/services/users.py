@@ -0,0 +1,66 @@
+import enum
+import uuid
+
+from sqlalchemy import select
+
+from app import config, db
+from app.db.registry import registry
+from app.services import cache as cache_service
+from app.services.memory_cache import TTLCache
+
+
+class UserState(enum.StrEnum):
+    ACTIVE = "active"
+    BLOCKED = "blocked"
+    MISSING = "missing"
+
+
+users_cache: TTLCache[str, UserState] = TTLCache(
+    name="users", maxsize=config.cache.users_cache_size, ttl=config.cache.users_cache_ttl
+)
+
+
+async def get_user_state(user_uid: str) -> UserState:
+    try:
+        user_uid = str(uuid.UUID(user_uid))
+    except ValueError:
+        return UserState.MISSING
+
+    user_state = users_cache.get(user_uid)
+    if user_state is not None:
+        return user_state
+
+    cached_state = await cache_service.get_user_state_cache(user_uid) if config.cache.users_cache_redis else None
+    if cached_state:
+        user_state = UserState(cached_state)
+    else:
+        user_state = await _select_user_state(user_uid)
+        if config.cache.users_cache_redis:
+            await cache_service.create_user_state_cache(user_uid, user_state, lifetime=_get_lifetime(user_state))
+
+    users_cache.set(user_uid, user_state, ttl=_get_lifetime(user_state))
+    return user_state
+
+
+async def invalidate_user_cache(user_uid: str) -> None:
+    user_uid = str(uuid.UUID(user_uid))
+    users_cache.delete(user_uid)
+    if config.cache.users_cache_redis:
+        await cache_service.remove_user_state_cache(user_uid)
+
+
+async def _select_user_state(user_uid: str) -> UserState:
+    query = select(db.User.uid, db.User.is_blocked).where(db.User.uid == user_uid)
+    async with registry.session() as session:
+        user = (await session.execute(query)).first()
+
+    if not user:
+        return UserState.MISSING
+    return UserState.BLOCKED if user.is_blocked else UserState.ACTIVE
+
+
+def _get_lifetime(user_state: UserState) -> int:
+    # Unknown users may be created at any moment, so they are remembered only for a short time
+    if user_state == UserState.MISSING:
+        return config.cache.users_cache_missing_ttl
+    return config.cache.users_cache_ttl
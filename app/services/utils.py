@@ -1,26 +1,31 @@
 import uuid
+from datetime import datetime, timezone
 from functools import wraps
 from typing import Awaitable, Callable, TypeVar
 
 from fastapi import Header, HTTPException, status
 from pydantic.types import UUID4
-from sqlalchemy import select
 
-from app.db import User
-from app.db.registry import registry
 from app.services import cache as cache_service
+from app.services import users as users_service
 
 T = TypeVar("T")
 
 
+def get_timestamp(value: datetime) -> float:
+    # Naive timestamps of DB are UTC, as EXTRACT(epoch) reads them for payloads built by DB
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
 async def get_current_user(user_id: str | None = Header(default=None)) -> UUID4:
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
-    async with registry.session() as session:
-        user = (await session.execute(select(User).where(User.uid == user_id))).scalars().first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user_state = await users_service.get_user_state(user_id)
+    if user_state == users_service.UserState.MISSING:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    if user_state == users_service.UserState.BLOCKED:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is blocked")
 
     return uuid.UUID(user_id)
 
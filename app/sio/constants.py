@@ -1,3 +1,4 @@
 NAMESPACE = "/chat_v1"
+CHAT_ROOM_PREFIX = "chat:"
 
 USER_HEADER_NAME = "smart-user-id"
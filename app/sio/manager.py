@@ -0,0 +1,62 @@
+import pickle
+from typing import Any, AsyncGenerator
+
+import socketio
+
+from app import config
+
+ENTER_ROOM_METHOD = "enter_room"
+LEAVE_ROOM_METHOD = "leave_room"
+
+
+class AsyncChatManager(socketio.AsyncManager):
+    """Client manager for a single process, all clients and rooms live in this process."""
+
+    async def propagate_enter_room(self, sid: str, namespace: str, room: str) -> None:
+        if self.is_connected(sid, namespace):
+            self.enter_room(sid, namespace, room)
+
+    async def propagate_leave_room(self, sid: str, namespace: str, room: str) -> None:
+        self.leave_room(sid, namespace, room)
+
+
+class AsyncRedisChatManager(socketio.AsyncRedisManager):
+    """Client manager for several processes or nodes connected through redis pub/sub.
+
+    Socket.IO keeps rooms in memory of the process which owns the client connection, so room changes
+    for clients connected to other processes are published to the channel and applied by the owner.
+    """
+
+    async def propagate_enter_room(self, sid: str, namespace: str, room: str) -> None:
+        if self.is_connected(sid, namespace):
+            self.enter_room(sid, namespace, room)
+        else:
+            await self._publish({"method": ENTER_ROOM_METHOD, "sid": sid, "namespace": namespace, "room": room})
+
+    async def propagate_leave_room(self, sid: str, namespace: str, room: str) -> None:
+        if self.is_connected(sid, namespace):
+            self.leave_room(sid, namespace, room)
+        else:
+            await self._publish({"method": LEAVE_ROOM_METHOD, "sid": sid, "namespace": namespace, "room": room})
+
+    async def _listen(self) -> AsyncGenerator[Any, None]:
+        async for message in super()._listen():
+            try:
+                data = pickle.loads(message)
+            except Exception:
+                yield message
+                continue
+
+            if not isinstance(data, dict) or data.get("method") not in (ENTER_ROOM_METHOD, LEAVE_ROOM_METHOD):
+                yield data
+            elif self.is_connected(data["sid"], data["namespace"]):
+                if data["method"] == ENTER_ROOM_METHOD:
+                    self.enter_room(data["sid"], data["namespace"], data["room"])
+                else:
+                    self.leave_room(data["sid"], data["namespace"], data["room"])
+
+
+def get_client_manager() -> AsyncChatManager | AsyncRedisChatManager:
+    if config.socketio.redis_manager:
+        return AsyncRedisChatManager(url=str(config.cache.dsn), channel=config.socketio.redis_manager_channel)
+    return AsyncChatManager()
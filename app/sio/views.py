@@ -5,11 +5,13 @@ from loguru import logger
 from app import config
 from app.services import sio as sio_service
 from app.sio.constants import NAMESPACE
+from app.sio.manager import get_client_manager
 
 sio = socketio.AsyncServer(
     async_mode="asgi",
     allow_upgrades=True,
-    # client_manager=socketio.AsyncRedisManager(url=config.cache.dsn),
+    client_manager=get_client_manager(),
+    transports=config.socketio.transports,
     ping_timeout=config.socketio.ping_timeout,
     ping_interval=config.socketio.ping_interval,
     cors_allowed_origins="*",
@@ -77,3 +79,14 @@ async def delete_messages_handler(sid: str, message: dict) -> dict:
         return {"error": e.detail, "error_code": e.status_code}
     except Exception as e:
         return {"error": str(e), "error_code": 500}
+
+
+@sio.on("usr:sync", namespace=NAMESPACE)
+async def sync_handler(sid: str, message: dict) -> dict:
+    logger.debug(f"Sync messages: {message}")
+    try:
+        return {"result": await sio_service.process_sync(message, sid)}
+    except HTTPException as e:
+        return {"error": e.detail, "error_code": e.status_code}
+    except Exception as e:
+        return {"error": str(e), "error_code": 500}
@@ -104,11 +104,13 @@ async def test_add_recipients_if_one_of_contacts_already_in_chat(
 
 
 @pytest.mark.usefixtures("clear_db")
-async def test_add_recipients(client: "AsyncClient", user_db_f, chat_relationship_db_f, chat_db_f) -> None:
+async def test_add_recipients(client: "AsyncClient", user_db_f, chat_relationship_db_f, chat_db_f, mocker) -> None:
     user_1 = await user_db_f.create()
     user_2 = await user_db_f.create()
     chat_rel = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
 
+    join_chat_room_mock = mocker.patch("app.services.chats.sio_service.join_chat_room")
+
     response = await client.post(
         app.other_asgi_app.url_path_for("add_recipients"),
         headers={config.application.user_header_name: str(chat_rel.user_uid)},
@@ -117,6 +119,7 @@ async def test_add_recipients(client: "AsyncClient", user_db_f, chat_relationshi
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"result": {"success": True}}
+    join_chat_room_mock.assert_awaited_once_with([user_1.uid, user_2.uid], chat_rel.chat_id)
 
     async with registry.session() as session:
         query = select(func.count()).select_from(ChatRelationship).where(ChatRelationship.chat_id == chat_rel.chat_id)
@@ -24,6 +24,8 @@ if TYPE_CHECKING:
         ("pin_chat", "POST"),
         ("unpin_chat", "POST"),
         ("get_message_history", "GET"),
+        ("search_messages", "GET"),
+        ("sync_messages", "GET"),
     ],
 )
 async def test_request_without_user_id(client: "AsyncClient", view_name, method: str) -> None:
@@ -46,6 +48,8 @@ async def test_request_without_user_id(client: "AsyncClient", view_name, method:
         ("pin_chat", "POST"),
         ("unpin_chat", "POST"),
         ("get_message_history", "GET"),
+        ("search_messages", "GET"),
+        ("sync_messages", "GET"),
     ],
 )
 async def test_request_with_user_not_exist(client: "AsyncClient", view_name: str, method: str) -> None:
@@ -58,3 +62,26 @@ async def test_request_with_user_not_exist(client: "AsyncClient", view_name: str
 
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
     assert response.json() == {"detail": "User not found"}
+
+
+@pytest.mark.parametrize(
+    "view_name,method",
+    [
+        ("create_chat", "POST"),
+        ("get_chat_list", "GET"),
+        ("get_message_history", "GET"),
+        ("search_messages", "GET"),
+        ("sync_messages", "GET"),
+    ],
+)
+@pytest.mark.usefixtures("clear_db")
+async def test_request_with_blocked_user(client: "AsyncClient", user_db_f, view_name: str, method: str) -> None:
+    user = await user_db_f.create(is_blocked=True)
+    response = await client.request(
+        method=method,
+        url=app.other_asgi_app.url_path_for(view_name),
+        headers={config.application.user_header_name: str(user.uid)},
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "User is blocked"}
@@ -67,9 +67,11 @@ async def test_archive_chat_if_chat_already_archived(client: "AsyncClient", chat
 
 
 @pytest.mark.usefixtures("clear_db")
-async def test_archive_chat(client: "AsyncClient", chat_relationship_db_f) -> None:
+async def test_archive_chat(client: "AsyncClient", chat_relationship_db_f, mocker) -> None:
     chat_rel = await chat_relationship_db_f.create()
 
+    leave_chat_room_mock = mocker.patch("app.services.chats.sio_service.leave_chat_room")
+
     response = await client.post(
         app.other_asgi_app.url_path_for("archive_chat"),
         headers={config.application.user_header_name: str(chat_rel.user_uid)},
@@ -78,6 +80,7 @@ async def test_archive_chat(client: "AsyncClient", chat_relationship_db_f) -> No
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"result": {"success": True}}
+    leave_chat_room_mock.assert_awaited_once_with([chat_rel.user_uid], chat_rel.chat_id)
 
     async with registry.session() as session:
         query = (
@@ -143,9 +146,11 @@ async def test_unarchive_chat_if_chat_not_archived(client: "AsyncClient", chat_r
 
 
 @pytest.mark.usefixtures("clear_db")
-async def test_unarchive_chat(client: "AsyncClient", chat_relationship_db_f) -> None:
+async def test_unarchive_chat(client: "AsyncClient", chat_relationship_db_f, mocker) -> None:
     chat_rel = await chat_relationship_db_f.create(state=ChatState.ARCHIVE)
 
+    join_chat_room_mock = mocker.patch("app.services.chats.sio_service.join_chat_room")
+
     response = await client.post(
         app.other_asgi_app.url_path_for("unarchive_chat"),
         headers={config.application.user_header_name: str(chat_rel.user_uid)},
@@ -154,6 +159,7 @@ async def test_unarchive_chat(client: "AsyncClient", chat_relationship_db_f) ->
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"result": {"success": True}}
+    join_chat_room_mock.assert_awaited_once_with([chat_rel.user_uid], chat_rel.chat_id)
 
     async with registry.session() as session:
         query = (
@@ -4,9 +4,12 @@ from typing import TYPE_CHECKING
 
 import pytest
 from fastapi import status
+from sqlalchemy import update
 
 from app import config
-from app.db.enums import ChatState
+from app.db import Chat, ChatRelationship
+from app.db.enums import ChatState, ChatUserRole
+from app.db.registry import registry
 from app.main import app
 from tests.app.api.chats.utils import generate_chat_history
 
@@ -24,7 +27,7 @@ async def test_get_chat_list_empty(client: "AsyncClient", user_db_f) -> None:
     )
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == []
+    assert response.json() == {"chats": [], "cursor": None}
 
 
 @pytest.mark.usefixtures("clear_db")
@@ -41,8 +44,8 @@ async def test_get_chat_list(client: "AsyncClient", user_db_f, chat_db_f, chat_r
     )
 
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.json()) == 5, response.json()
-    for chat in response.json():
+    assert len(response.json()["chats"]) == 5, response.json()
+    for chat in response.json()["chats"]:
         assert len(chat["recipients"]) == 2
         assert str(user.uid) in [recipient["user_uid"] for recipient in chat["recipients"]]
         assert user.name in [recipient["user"]["name"] for recipient in chat["recipients"]]
@@ -61,9 +64,9 @@ async def test_get_chat_list_check_filter_archive(client: "AsyncClient", chat_re
     )
 
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.json()) == 2, response.json()
+    assert len(response.json()["chats"]) == 2, response.json()
 
-    for chat in response.json():
+    for chat in response.json()["chats"]:
         assert chat["id"] in active_chat_ids
         assert str(user.uid) in [recipient["user_uid"] for recipient in chat["recipients"]]
         for recipient in chat["recipients"]:
@@ -86,9 +89,9 @@ async def test_get_archive_chat_list(client: "AsyncClient", chat_relationship_db
     )
 
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.json()) == 2, response.json()
+    assert len(response.json()["chats"]) == 2, response.json()
 
-    for chat in response.json():
+    for chat in response.json()["chats"]:
         assert chat["id"] in archived_chat_ids
         assert str(user.uid) in [recipient["user_uid"] for recipient in chat["recipients"]]
         for recipient in chat["recipients"]:
@@ -110,7 +113,124 @@ async def test_get_chat_list_with_pinned_chats(client: "AsyncClient", chat_relat
     )
 
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.json()) == 3, response.json()
+    assert len(response.json()["chats"]) == 3, response.json()
 
-    for chat, exp_chat in zip(response.json(), expected_chat_list):
+    for chat, exp_chat in zip(response.json()["chats"], expected_chat_list):
         assert chat["id"] == exp_chat.chat_id
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_chat_list_pages(client: "AsyncClient", user_db_f, chat_relationship_db_f) -> None:
+    user = await user_db_f.create()
+    unpinned_chat_rels = [
+        await chat_relationship_db_f.create(user=user, last_message_at=datetime(2024, 1, day)) for day in range(1, 4)
+    ]
+    pinned_chat_rels = [
+        await chat_relationship_db_f.create(user=user, time_pinned=datetime.utcnow()) for _ in range(2)
+    ]
+    expected_chat_ids = [chat_rel.chat_id for chat_rel in pinned_chat_rels + unpinned_chat_rels[::-1]]
+
+    chat_ids, cursors, params = [], [], {"page_size": 2}
+    while True:
+        response = await client.get(
+            app.other_asgi_app.url_path_for("get_chat_list"),
+            headers={config.application.user_header_name: str(user.uid)},
+            params=params,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        chat_ids.extend(chat["id"] for chat in response.json()["chats"])
+        cursors.append(response.json()["cursor"])
+        if not response.json()["cursor"]:
+            break
+        params["cursor"] = response.json()["cursor"]
+
+    assert chat_ids == expected_chat_ids
+    assert len(cursors) == 3
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_chat_list_recipients_preview(client: "AsyncClient", chat_relationship_db_f) -> None:
+    chat_rel = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    for _ in range(config.application.chat_list_recipients_preview_size + 2):
+        await chat_relationship_db_f.create(chat=chat_rel.chat)
+
+    response = await client.get(
+        app.other_asgi_app.url_path_for("get_chat_list"),
+        headers={config.application.user_header_name: str(chat_rel.user_uid)},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    recipients = response.json()["chats"][0]["recipients"]
+    assert len(recipients) == config.application.chat_list_recipients_preview_size
+    assert recipients[0]["user_uid"] == str(chat_rel.user_uid)
+
+
+@pytest.mark.usefixtures("clear_db")
+@pytest.mark.parametrize("params", [{"cursor": "invalid"}, {"page_size": 0}])
+async def test_get_chat_list_invalid_params(client: "AsyncClient", user_db_f, params) -> None:
+    user = await user_db_f.create()
+
+    response = await client.get(
+        app.other_asgi_app.url_path_for("get_chat_list"),
+        headers={config.application.user_header_name: str(user.uid)},
+        params=params,
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_chat_list_with_last_message(
+    client: "AsyncClient", user_db_f, chat_relationship_db_f, message_db_f
+) -> None:
+    user = await user_db_f.create()
+    chat_rel1 = await chat_relationship_db_f.create(user=user, last_message_at=datetime(2024, 1, 2))
+    chat_rel2 = await chat_relationship_db_f.create(user=user, last_message_at=datetime(2024, 1, 1))
+    message = await message_db_f.create(user_uid=user.uid, chat_id=chat_rel2.chat_id)
+    async with registry.session() as session:
+        await session.execute(update(Chat).where(Chat.id == chat_rel2.chat_id).values(last_message_id=message.id))
+        await session.execute(
+            update(ChatRelationship)
+            .where(ChatRelationship.chat_id == chat_rel2.chat_id)
+            .values(last_message_at=datetime(2024, 1, 3))
+        )
+        await session.commit()
+
+    response = await client.get(
+        app.other_asgi_app.url_path_for("get_chat_list"),
+        headers={config.application.user_header_name: str(user.uid)},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    chats = response.json()["chats"]
+    assert [chat["id"] for chat in chats] == [chat_rel2.chat_id, chat_rel1.chat_id]
+    assert chats[0]["last_message"]["id"] == message.id
+    assert chats[0]["last_message"]["text"] == message.text
+    assert chats[1]["last_message"] is None
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_chat_list_fast_serialization(
+    client: "AsyncClient", user_db_f, chat_relationship_db_f, message_db_f, mocker
+) -> None:
+    user = await user_db_f.create()
+    chat_rel = await chat_relationship_db_f.create(user=user, time_pinned=datetime(2024, 1, 1))
+    await chat_relationship_db_f.create(chat=chat_rel.chat)
+    await chat_relationship_db_f.create(user=user)
+    message = await message_db_f.create(user_uid=user.uid, chat_id=chat_rel.chat_id)
+    async with registry.session() as session:
+        await session.execute(update(Chat).where(Chat.id == chat_rel.chat_id).values(last_message_id=message.id))
+        await session.commit()
+
+    request_data = {
+        "url": app.other_asgi_app.url_path_for("get_chat_list"),
+        "headers": {config.application.user_header_name: str(user.uid)},
+        "params": {"page_size": 1},
+    }
+    response = await client.get(**request_data)
+    mocker.patch.object(config.application, "fast_serialization", True)
+    fast_response = await client.get(**request_data)
+
+    assert fast_response.status_code == status.HTTP_200_OK
+    assert fast_response.headers["content-type"] == "application/json"
+    assert fast_response.json() == response.json()
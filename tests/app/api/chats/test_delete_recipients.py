@@ -157,11 +157,13 @@ async def test_delete_all_recipients(client: "AsyncClient", chat_relationship_db
 
 
 @pytest.mark.usefixtures("clear_db")
-async def test_delete_recipients(client: "AsyncClient", chat_relationship_db_f) -> None:
+async def test_delete_recipients(client: "AsyncClient", chat_relationship_db_f, mocker) -> None:
     chat_rel_1 = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
     chat_rel_2 = await chat_relationship_db_f.create(chat__id=chat_rel_1.chat_id)
     chat_rel_3 = await chat_relationship_db_f.create(chat__id=chat_rel_1.chat_id)
 
+    leave_chat_room_mock = mocker.patch("app.services.chats.sio_service.leave_chat_room")
+
     response = await client.post(
         app.other_asgi_app.url_path_for("delete_recipients"),
         headers={config.application.user_header_name: str(chat_rel_1.user_uid)},
@@ -170,6 +172,7 @@ async def test_delete_recipients(client: "AsyncClient", chat_relationship_db_f)
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"result": {"success": True}}
+    leave_chat_room_mock.assert_awaited_once_with([chat_rel_3.user_uid], chat_rel_1.chat_id)
 
     async with registry.session() as session:
         query = (
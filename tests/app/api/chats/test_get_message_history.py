@@ -1,12 +1,18 @@
+import re
 from random import randint
 from typing import TYPE_CHECKING
 
 import pytest
 from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
 
 from app import config
 from app.db.enums import ChatUserRole
+from app.db.registry import registry
 from app.main import app
+from app.schemas.chats import GetMessageHistoryData
+from app.services import chats as chats_service
 from tests.app.api.chats.utils import get_sorted_messages_id_list
 
 if TYPE_CHECKING:
@@ -54,6 +60,7 @@ async def test_get_message_history(client: "AsyncClient", chat_relationship_db_f
         assert message["user_uid"] == str(chat_rel.user_uid)
         assert message["chat_id"] == chat_rel.chat_id
         assert message["id"] == message_id
+        assert "search_text" not in message
 
 
 @pytest.mark.usefixtures("clear_db")
@@ -236,3 +243,45 @@ async def test_get_message_history_with_message_id_and_look_forward_param_includ
         assert message["user_uid"] == str(chat_rel.user_uid)
         assert message["chat_id"] == chat_rel.chat_id
         assert message["id"] == message_id
+
+
+@pytest.mark.usefixtures("clear_db")
+@pytest.mark.parametrize("look_forward", [False, True])
+async def test_get_message_history_uses_ordered_index_scan(chat_relationship_db_f, message_db_f, look_forward) -> None:
+    chat_rel = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    await get_sorted_messages_id_list(5, chat_rel.user_uid, chat_rel.chat_id, message_db_f)
+    query = chats_service._get_message_history_query(
+        GetMessageHistoryData(chat_id=chat_rel.chat_id, message_id=3, look_forward=look_forward),
+        chat_rel.user_uid,
+    )
+    compiled_query = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+
+    async with registry.session() as session:
+        # Tiny test tables are cheaper to read fully, so planner is asked to prefer indexes
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join((await session.execute(text(f"EXPLAIN {compiled_query}"))).scalars())
+
+    assert re.search(r"Index Scan (Backward )?using \w*chat_id_id\w* on messages", plan), plan
+    assert "Sort" not in plan, plan
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_message_history_fast_serialization(
+    client: "AsyncClient", chat_relationship_db_f, message_db_f, mocker
+) -> None:
+    chat_rel = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    await get_sorted_messages_id_list(5, chat_rel.user_uid, chat_rel.chat_id, message_db_f)
+
+    request_data = {
+        "url": app.other_asgi_app.url_path_for("get_message_history"),
+        "headers": {config.application.user_header_name: str(chat_rel.user_uid)},
+        "params": {"chat_id": chat_rel.chat_id},
+    }
+    response = await client.get(**request_data)
+    mocker.patch.object(config.application, "fast_serialization", True)
+    fast_response = await client.get(**request_data)
+
+    assert fast_response.status_code == status.HTTP_200_OK
+    assert fast_response.headers["content-type"] == "application/json"
+    assert len(fast_response.json()) == 5
+    assert fast_response.json() == response.json()
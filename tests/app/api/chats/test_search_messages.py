@@ -0,0 +1,134 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from fastapi import status
+
+from app import config
+from app.db.enums import ChatState, ChatUserRole, MessageType
+from app.main import app
+from app.services import search_indexer as search_indexer_service
+
+if TYPE_CHECKING:
+    from httpx import AsyncClient
+
+
+async def _search(client: "AsyncClient", user_uid, **params):
+    return await client.get(
+        app.other_asgi_app.url_path_for("search_messages"),
+        headers={config.application.user_header_name: str(user_uid)},
+        params=params,
+    )
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_search_messages(client: "AsyncClient", user_db_f, chat_relationship_db_f, message_db_f) -> None:
+    user = await user_db_f.create()
+    chat_rel1 = await chat_relationship_db_f.create(user=user, user_role=ChatUserRole.CREATOR)
+    chat_rel2 = await chat_relationship_db_f.create(user=user)
+    deleted_chat_rel = await chat_relationship_db_f.create(user=user, state=ChatState.DELETED)
+    other_chat_rel = await chat_relationship_db_f.create()
+    message1 = await message_db_f.create(
+        user_uid=user.uid, chat_id=chat_rel1.chat_id, text="Hello world", search_text=None
+    )
+    message2 = await message_db_f.create(
+        user_uid=user.uid, chat_id=chat_rel2.chat_id, text="hello again", search_text=None
+    )
+    for chat_id in (deleted_chat_rel.chat_id, other_chat_rel.chat_id):
+        await message_db_f.create(user_uid=user.uid, chat_id=chat_id, text="hello", search_text=None)
+    await message_db_f.create(
+        user_uid=user.uid, chat_id=chat_rel1.chat_id, text="hello", type_=MessageType.DELETED, search_text=None
+    )
+    await message_db_f.create(user_uid=user.uid, chat_id=chat_rel1.chat_id, text="goodbye", search_text=None)
+    await search_indexer_service.index_messages(batch_size=10)
+
+    response = await _search(client, user.uid, query="HELLO")
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["cursor"] is None
+    assert {message["id"] for message in result["messages"]} == {message1.id, message2.id}
+    found_message = next(message for message in result["messages"] if message["id"] == message1.id)
+    assert found_message["chat_id"] == chat_rel1.chat_id
+    assert found_message["text"] == "Hello world"
+    assert found_message["snippet"] == "<b>Hello</b> world"
+
+    response = await _search(client, user.uid, query="hello", chat_id=chat_rel2.chat_id)
+
+    assert [message["id"] for message in response.json()["messages"]] == [message2.id]
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_search_messages_with_websearch_syntax(
+    client: "AsyncClient", chat_relationship_db_f, message_db_f
+) -> None:
+    chat_rel = await chat_relationship_db_f.create()
+    message = await message_db_f.create(
+        user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id, text="red car is fast", search_text=None
+    )
+    for text in ("red blue car", "car is red"):
+        await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id, text=text, search_text=None)
+    await search_indexer_service.index_messages(batch_size=10)
+
+    response = await _search(client, chat_rel.user_uid, query='"red car" -blue')
+
+    assert [message["id"] for message in response.json()["messages"]] == [message.id]
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_search_messages_pages(client: "AsyncClient", chat_relationship_db_f, message_db_f) -> None:
+    chat_rel = await chat_relationship_db_f.create()
+    messages = [
+        await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id, text=text, search_text=None)
+        for text in ("cat and dog", "cat cat cat", "cat", "dog", "cat and cat")
+    ]
+    await search_indexer_service.index_messages(batch_size=10)
+
+    messages_id, cursor = [], None
+    for _ in range(3):
+        params = {"query": "cat", "page_size": 2} | ({"cursor": cursor} if cursor else {})
+        result = (await _search(client, chat_rel.user_uid, **params)).json()
+        messages_id.extend(message["id"] for message in result["messages"])
+        cursor = result["cursor"]
+        if not cursor:
+            break
+
+    assert cursor is None
+    assert messages_id[0] == messages[1].id
+    assert sorted(messages_id) == sorted([messages[0].id, messages[1].id, messages[2].id, messages[4].id])
+
+
+@pytest.mark.parametrize(
+    "params,detail",
+    [
+        ({"query": " "}, {"query": "query must contain characters"}),
+        ({"query": "cat", "page_size": 0}, {"page_size": "page size must be from 1 to 100"}),
+        ({"query": "cat", "cursor": "invalid"}, {"cursor": "invalid cursor"}),
+    ],
+)
+@pytest.mark.usefixtures("clear_db")
+async def test_search_messages_invalid_params(client: "AsyncClient", user_db_f, params, detail) -> None:
+    user = await user_db_f.create()
+
+    response = await _search(client, user.uid, **params)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": detail}
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_search_messages_escapes_snippet(client: "AsyncClient", chat_relationship_db_f, message_db_f) -> None:
+    chat_rel = await chat_relationship_db_f.create()
+    await message_db_f.create(
+        user_uid=chat_rel.user_uid,
+        chat_id=chat_rel.chat_id,
+        text="<img src=x onerror=alert(1)> hello & 'bye'",
+        search_text=None,
+    )
+    await search_indexer_service.index_messages(batch_size=10)
+
+    response = await _search(client, chat_rel.user_uid, query="hello")
+
+    snippet = response.json()["messages"][0]["snippet"]
+    assert "<b>hello</b>" in snippet
+    assert "&gt;" in snippet
+    assert not {"<", ">", "'"} & set(snippet.replace("<b>", "").replace("</b>", ""))
@@ -0,0 +1,187 @@
+import uuid
+from typing import TYPE_CHECKING
+
+import pytest
+from fastapi import status
+
+from app import config
+from app.db import Message
+from app.db.enums import ChatState, MessageType
+from app.db.registry import registry
+from app.main import app
+from app.services import cache as cache_service
+from app.services import sio as sio_service
+from tests.factories.schemas import (
+    SioDeleteMessagesPayloadFactory,
+    SioEditMessagePayloadFactory,
+)
+
+if TYPE_CHECKING:
+    from httpx import AsyncClient
+
+
+async def _sync(client: "AsyncClient", user_uid, **params):
+    return await client.get(
+        app.other_asgi_app.url_path_for("sync_messages"),
+        headers={config.application.user_header_name: str(user_uid)},
+        params=params,
+    )
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_sync_messages(client: "AsyncClient", user_db_f, chat_relationship_db_f, message_db_f) -> None:
+    user = await user_db_f.create()
+    chat_rel1 = await chat_relationship_db_f.create(user=user)
+    chat_rel2 = await chat_relationship_db_f.create(user=user, state=ChatState.ARCHIVE)
+    deleted_chat_rel = await chat_relationship_db_f.create(user=user, state=ChatState.DELETED)
+    other_chat_rel = await chat_relationship_db_f.create()
+    await message_db_f.create(user_uid=user.uid, chat_id=chat_rel1.chat_id)
+
+    response = await _sync(client, user.uid)
+
+    assert response.status_code == status.HTTP_200_OK
+    start_result = response.json()
+    assert start_result["messages"] == []
+    assert start_result["cursor"]
+    assert start_result["has_more"] is False
+
+    message1 = await message_db_f.create(user_uid=user.uid, chat_id=chat_rel1.chat_id)
+    message2 = await message_db_f.create(user_uid=user.uid, chat_id=chat_rel2.chat_id)
+    message3 = await message_db_f.create(user_uid=user.uid, chat_id=chat_rel1.chat_id)
+    for chat_id in (deleted_chat_rel.chat_id, other_chat_rel.chat_id):
+        await message_db_f.create(user_uid=user.uid, chat_id=chat_id)
+
+    response = await _sync(client, user.uid, cursor=start_result["cursor"])
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [message["id"] for message in result["messages"]] == [message1.id, message2.id, message3.id]
+    assert result["cursor"]
+    assert result["has_more"] is False
+
+    await sio_service._delete_messages(
+        SioDeleteMessagesPayloadFactory.build(sender_id=user.uid, chat_id=chat_rel1.chat_id, message_ids=[message3.id])
+    )
+    await sio_service._update_message(
+        SioEditMessagePayloadFactory.build(
+            sender_id=user.uid, chat_id=chat_rel1.chat_id, message_id=message1.id, text="edited"
+        )
+    )
+
+    response = await _sync(client, user.uid, cursor=result["cursor"])
+
+    changed_messages = response.json()["messages"]
+    assert [(message["id"], message["type_"], message["text"]) for message in changed_messages] == [
+        (message3.id, MessageType.DELETED, sio_service.DELETED_MESSAGE_TEXT),
+        (message1.id, MessageType.FROM_USER, "edited"),
+    ]
+    assert all(message["time_updated"] for message in changed_messages)
+    assert (await _sync(client, user.uid, cursor=response.json()["cursor"])).json() == {
+        "messages": [],
+        "cursor": response.json()["cursor"],
+        "has_more": False,
+    }
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_sync_messages_pages(client: "AsyncClient", chat_relationship_db_f, message_db_f) -> None:
+    chat_rels = [await chat_relationship_db_f.create() for _ in range(2)]
+    user_uid = chat_rels[0].user_uid
+    await chat_relationship_db_f.create(user=chat_rels[0].user, chat=chat_rels[1].chat)
+    cursor = (await _sync(client, user_uid)).json()["cursor"]
+    messages = [await message_db_f.create(user_uid=user_uid, chat_id=chat_rels[i % 2].chat_id) for i in range(5)]
+
+    synced_messages_id = []
+    params = {"page_size": 2, "cursor": cursor}
+    has_more = True
+    while has_more:
+        result = (await _sync(client, user_uid, **params)).json()
+        assert len(result["messages"]) <= 2
+        synced_messages_id.extend(message["id"] for message in result["messages"])
+        params["cursor"], has_more = result["cursor"], result["has_more"]
+
+    assert synced_messages_id == [message.id for message in messages]
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_sync_waits_for_running_transactions(
+    client: "AsyncClient", chat_relationship_db_f, message_db_f
+) -> None:
+    chat_rel = await chat_relationship_db_f.create()
+    cursor = (await _sync(client, chat_rel.user_uid)).json()["cursor"]
+    message1 = await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id)
+
+    async with registry.session() as session:
+        # Transaction starts writing before the next message and commits after it
+        message2 = Message(
+            id=message1.id + 1000,
+            user_uid=chat_rel.user_uid,
+            chat_id=chat_rel.chat_id,
+            client_id=uuid.uuid4(),
+            text="text",
+            type_=MessageType.FROM_USER,
+        )
+        session.add(message2)
+        await session.flush()
+        message3 = await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id)
+
+        result = (await _sync(client, chat_rel.user_uid, cursor=cursor)).json()
+
+        assert [message["id"] for message in result["messages"]] == [message1.id]
+        await session.commit()
+
+    result = (await _sync(client, chat_rel.user_uid, cursor=result["cursor"])).json()
+
+    assert [message["id"] for message in result["messages"]] == [message2.id, message3.id]
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_sync_messages_with_invalid_cursor(client: "AsyncClient", user_db_f) -> None:
+    user = await user_db_f.create()
+
+    response = await _sync(client, user.uid, cursor="invalid")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.usefixtures("clear_db")
+@pytest.mark.parametrize("page_size", (0, config.application.sync_max_page_size + 1))
+async def test_sync_messages_with_wrong_page_size(client: "AsyncClient", user_db_f, page_size: int) -> None:
+    user = await user_db_f.create()
+
+    response = await _sync(client, user.uid, page_size=page_size)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db")
+async def test_sync_from_cursor_of_event(client: "AsyncClient", chat_relationship_db_f, message_db_f, mocker) -> None:
+    chat_rel = await chat_relationship_db_f.create()
+    message1 = await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id)
+    message2 = await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id)
+    send_message_mock = mocker.patch("app.services.sio._send_message")
+
+    await sio_service._update_message(
+        SioEditMessagePayloadFactory.build(
+            sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id, message_id=message2.id, text="edited"
+        )
+    )
+    edited_message = await sio_service._update_message(
+        SioEditMessagePayloadFactory.build(
+            sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id, message_id=message1.id, text="edited"
+        )
+    )
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    payload = SioDeleteMessagesPayloadFactory.build(
+        sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id, message_ids=[message2.id]
+    ).model_dump(by_alias=True, mode="json")
+    await sio_service.process_delete_messages(sio_payload=payload, sid=sid)
+    event_cursor = send_message_mock.await_args.kwargs["message"]["sync_cursor"]
+
+    result = (await _sync(client, chat_rel.user_uid, cursor=edited_message.sync_cursor)).json()
+    event_result = (await _sync(client, chat_rel.user_uid, cursor=event_cursor)).json()
+
+    # Changes committed before the event are behind its cursor, the change of the event itself may be repeated
+    assert [message["id"] for message in result["messages"]] == [message1.id, message2.id]
+    assert [message["id"] for message in event_result["messages"]] == [message2.id]
@@ -56,23 +56,55 @@ async def test_put_notifications_token(user_db_f, client: "AsyncClient") -> None
 @pytest.mark.usefixtures("clear_db")
 async def test_put_notifications_token_retry(user_db_f, client: "AsyncClient") -> None:
     user = await user_db_f.create()
-    request_body = TokenDataFactory.build(device_type=PlatformName.IOS)
-    response = await client.post(
-        app.other_asgi_app.url_path_for("put_notifications_token"),
-        json=jsonable_encoder(request_body),
-        headers={config.application.user_header_name: str(user.uid)},
-    )
-    assert response.status_code == status.HTTP_200_OK
-
-    response = await client.post(
-        app.other_asgi_app.url_path_for("put_notifications_token"),
-        json=jsonable_encoder(TokenDataFactory.build(device_type=PlatformName.IOS)),
-        headers={config.application.user_header_name: str(user.uid)},
-    )
-    assert response.status_code == status.HTTP_200_OK
+    request_body = TokenDataFactory.build()
+    for _ in range(2):
+        response = await client.post(
+            app.other_asgi_app.url_path_for("put_notifications_token"),
+            json=jsonable_encoder(request_body),
+            headers={config.application.user_header_name: str(user.uid)},
+        )
+        assert response.status_code == status.HTTP_200_OK
 
     async with registry.session() as session:
         query = select(Device).where(Device.user_uid == user.uid)
         devices = (await session.execute(query)).scalars().all()
     assert len(devices) == 1
     assert devices[0].token == request_body.token
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_put_notifications_token_several_devices(user_db_f, client: "AsyncClient") -> None:
+    user = await user_db_f.create()
+    requests_body = [TokenDataFactory.build(device_type=PlatformName.IOS) for _ in range(2)]
+    for request_body in requests_body:
+        response = await client.post(
+            app.other_asgi_app.url_path_for("put_notifications_token"),
+            json=jsonable_encoder(request_body),
+            headers={config.application.user_header_name: str(user.uid)},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    async with registry.session() as session:
+        query = select(Device.token).where(Device.user_uid == user.uid)
+        tokens = (await session.execute(query)).scalars().all()
+    assert set(tokens) == {request_body.token for request_body in requests_body}
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_put_notifications_token_of_other_user(user_db_f, client: "AsyncClient") -> None:
+    users = [await user_db_f.create() for _ in range(2)]
+    request_body = TokenDataFactory.build(device_type=PlatformName.ANDROID)
+    for user in users:
+        response = await client.post(
+            app.other_asgi_app.url_path_for("put_notifications_token"),
+            json=jsonable_encoder(request_body),
+            headers={config.application.user_header_name: str(user.uid)},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    async with registry.session() as session:
+        query = select(Device).where(Device.token == request_body.token)
+        devices = (await session.execute(query)).scalars().all()
+    assert len(devices) == 1
+    assert devices[0].user_uid == users[1].uid
+    assert devices[0].time_updated is not None
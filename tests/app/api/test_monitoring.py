@@ -12,3 +12,20 @@ async def test_ping(client: "AsyncClient") -> None:
     response = await client.get(app.other_asgi_app.url_path_for("ping"))
     assert response.json() == {"status": "OK"}, response.json()
     assert response.status_code == status.HTTP_200_OK, response.json()
+
+
+async def test_metrics(client: "AsyncClient") -> None:
+    response = await client.get(app.other_asgi_app.url_path_for("metrics"))
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert set(response.json()["caches"]["presence"].keys()) == {"hits", "misses", "size"}
+    assert set(response.json()["db_pools"]["primary"].keys()) == {
+        "size",
+        "in_use",
+        "idle",
+        "overflow",
+        "checkouts",
+        "checkout_time",
+        "max_checkout_time",
+        "connects",
+        "closes",
+    }
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app import config
+from app.db.registry import _DBRegistry
+
+
+@pytest.fixture
+async def replicas_registry():
+    unavailable_dsn = str(config.database.dsn).replace(f":{config.database.dsn.hosts()[0]['port']}/", ":1/")
+    replicas_registry = _DBRegistry(
+        config.database.dsn, replica_dsns=[config.database.dsn, unavailable_dsn, config.database.dsn]
+    )
+    await replicas_registry.setup()
+    yield replicas_registry
+    await replicas_registry.close()
+
+
+async def test_read_session_balances_healthy_replicas(replicas_registry):
+    assert replicas_registry.healthy_replicas == [0, 2]
+
+    engines = []
+    for _ in range(4):
+        async with replicas_registry.read_session() as session:
+            engines.append(session.bind)
+
+    assert engines == [replicas_registry.replica_engines[index] for index in (0, 2, 0, 2)]
+    async with replicas_registry.read_session(primary=True) as session:
+        assert session.bind is replicas_registry.engine
+
+
+async def test_lagging_replicas_are_not_used(replicas_registry, mocker):
+    lags = {replicas_registry.replica_engines[0]: config.database.replica_max_lag + 1}
+    mocker.patch.object(replicas_registry, "_get_replica_lag", side_effect=lambda engine: lags.get(engine, 0))
+
+    await replicas_registry.check_replicas()
+    assert replicas_registry.healthy_replicas == [1, 2]
+
+    lags[replicas_registry.replica_engines[2]] = config.database.replica_max_lag + 1
+    await replicas_registry.check_replicas()
+    assert replicas_registry.healthy_replicas == [1]
+
+    lags[replicas_registry.replica_engines[1]] = config.database.replica_max_lag + 1
+    await replicas_registry.check_replicas()
+    async with replicas_registry.read_session() as session:
+        assert session.bind is replicas_registry.engine
+
+
+async def test_pools_stats():
+    pool_registry = _DBRegistry(config.database.dsn, pool_size=1, pool_max_overflow=1, pool_recycle=-1)
+    await pool_registry.setup()
+
+    async with pool_registry.session() as session:
+        await session.execute(text("SELECT 1"))
+        assert pool_registry.get_pools_stats()["primary"]["in_use"] == 1
+    async with pool_registry.session() as session1, pool_registry.session() as session2:
+        await asyncio.gather(session1.execute(text("SELECT 1")), session2.execute(text("SELECT 1")))
+
+    stats = pool_registry.get_pools_stats()
+    await pool_registry.close()
+    assert stats["primary"]["in_use"] == 0
+    assert stats["primary"]["idle"] == 1
+    assert stats["primary"]["checkouts"] == 3
+    assert stats["primary"]["connects"] == 2
+    assert stats["primary"]["closes"] == 1
+    assert stats["primary"]["max_checkout_time"] > 0
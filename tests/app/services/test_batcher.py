@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.services.batcher import Batcher
+
+
+async def test_batcher_collects_items_within_delay(mocker):
+    handler = mocker.AsyncMock(side_effect=lambda items: [item * 2 for item in items])
+    batcher: Batcher[int, int] = Batcher(handler=handler, max_size=10, max_delay=0.01)
+
+    results = await asyncio.gather(*[batcher.submit(item) for item in range(3)])
+
+    assert results == [0, 2, 4]
+    handler.assert_awaited_once_with([0, 1, 2])
+
+
+async def test_batcher_flushes_full_batch(mocker):
+    handler = mocker.AsyncMock(side_effect=lambda items: items)
+    batcher: Batcher[int, int] = Batcher(handler=handler, max_size=2, max_delay=10)
+
+    results = await asyncio.wait_for(asyncio.gather(*[batcher.submit(item) for item in range(4)]), 1)
+
+    assert results == [0, 1, 2, 3]
+    assert handler.await_args_list == [mocker.call([0, 1]), mocker.call([2, 3])]
+
+
+async def test_batcher_fails_all_items(mocker):
+    handler = mocker.AsyncMock(side_effect=ValueError("error"))
+    batcher: Batcher[int, int] = Batcher(handler=handler, max_size=10, max_delay=0.01)
+
+    results = await asyncio.gather(*[batcher.submit(item) for item in range(2)], return_exceptions=True)
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    handler.assert_awaited_once_with([0, 1])
+    with pytest.raises(ValueError):
+        await batcher.submit(1)
+
+
+async def test_batcher_fails_only_bad_item(mocker):
+    async def handle(items):
+        if -1 in items:
+            raise ValueError("error")
+        return [item * 2 for item in items]
+
+    handler = mocker.AsyncMock(side_effect=handle)
+    batcher: Batcher[int, int] = Batcher(handler=handler, max_size=10, max_delay=0.01, split_on=(ValueError,))
+
+    results = await asyncio.gather(*[batcher.submit(item) for item in [1, -1, 2]], return_exceptions=True)
+
+    assert results[0] == 2 and results[2] == 4
+    assert isinstance(results[1], ValueError)
+    assert handler.await_args_list == [mocker.call([1, -1, 2]), mocker.call([1]), mocker.call([-1]), mocker.call([2])]
@@ -2,6 +2,8 @@ import uuid
 
 import pytest
 
+from app import config
+from app.clients import cache
 from app.services import cache as cache_service
 
 
@@ -29,22 +31,91 @@ async def test_remove_sid_cache():
 
 
 @pytest.mark.usefixtures("clear_cache")
-async def test_get_online_session():
-    users_uid = [str(uuid.uuid4()) for _ in range(4)]
+async def test_presence_of_user_with_several_devices():
+    user_uid = str(uuid.uuid4())
+    sids = [str(uuid.uuid4()) for _ in range(2)]
+    for sid in sids:
+        await cache_service.create_sid_cache(user_uid, sid)
+
+    await cache_service.remove_sid_cache(sids[0])
+    assert {user_uid} == await cache_service.get_online_users()
+    assert [] == await cache_service.get_offline_users([user_uid])
+
+    await cache_service.remove_sid_cache(sids[1])
+    assert set() == await cache_service.get_online_users()
+
+    events = await cache_service.get_presence_events()
+    assert [(user_uid, cache_service.PresenceState.ONLINE), (user_uid, cache_service.PresenceState.OFFLINE)] == [
+        (event_user_uid, state) for _, event_user_uid, state in events
+    ]
+    assert [] == await cache_service.get_presence_events(last_id=events[-1][0])
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_online_users_are_sharded():
+    users_uid = {str(uuid.uuid4()) for _ in range(100)}
+    for user_uid in users_uid:
+        await cache_service.create_sid_cache(user_uid, str(uuid.uuid4()))
+
+    assert users_uid == await cache_service.get_online_users()
+    shards = await cache.keys(f"{cache_service.ONLINE_USERS_KEY_PREFIX}*")
+    assert 1 < len(shards) <= config.cache.online_users_shards
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_get_users_sid():
+    users_uid = [str(uuid.uuid4()) for _ in range(3)]
     users_sid = [str(uuid.uuid4()) for _ in range(3)]
     await cache_service.create_sid_cache(users_uid[0], users_sid[0])
     await cache_service.create_sid_cache(users_uid[1], users_sid[1])
     await cache_service.create_sid_cache(users_uid[1], users_sid[2])
 
-    recipients_data = await cache_service.get_online_session(recipients_uid=users_uid)
+    assert await cache_service.get_users_sid(users_uid) == set(users_sid)
+    assert await cache_service.get_users_sid(users_uid[2:]) == set()
+    assert await cache_service.get_users_sid([]) == set()
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_get_offline_users():
+    users_uid = [str(uuid.uuid4()) for _ in range(4)]
+    await cache_service.create_sid_cache(users_uid[0], str(uuid.uuid4()))
+    await cache_service.create_sid_cache(users_uid[2], str(uuid.uuid4()))
+
+    assert await cache_service.get_offline_users(users_uid) == [users_uid[1], users_uid[3]]
+    assert await cache_service.get_offline_users([]) == []
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_sid_node_cache():
+    user_uid = str(uuid.uuid4())
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(user_uid, sid)
+
+    assert config.socketio.node_id == await cache_service.get_node_by_sid(sid)
+    assert {sid} == await cache_service.get_all_sid_by_node(config.socketio.node_id)
+
+    await cache_service.remove_sid_cache(sid)
+
+    assert await cache_service.get_node_by_sid(sid) is None
+    assert set() == await cache_service.get_all_sid_by_node(config.socketio.node_id)
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_remove_node_sid_cache(mocker):
+    users_uid = [str(uuid.uuid4()) for _ in range(2)]
+    users_sid = [str(uuid.uuid4()) for _ in range(3)]
+    await cache_service.create_sid_cache(users_uid[0], users_sid[0])
+    await cache_service.create_sid_cache(users_uid[1], users_sid[1])
+    mocker.patch.object(config.socketio, "node_id", "other-node")
+    await cache_service.create_sid_cache(users_uid[1], users_sid[2])
+    mocker.stopall()
 
-    assert len(recipients_data.keys()) == 4
+    await cache_service.remove_node_sid_cache(config.socketio.node_id)
 
-    assert users_uid[0] in recipients_data.keys()
-    assert recipients_data[users_uid[0]] == {users_sid[0]}
-    assert users_uid[1] in recipients_data.keys()
-    assert recipients_data[users_uid[1]] == {users_sid[1], users_sid[2]}
-    assert users_uid[2] in recipients_data.keys()
-    assert recipients_data[users_uid[2]] == set()
-    assert users_uid[3] in recipients_data.keys()
-    assert recipients_data[users_uid[3]] == set()
+    assert set() == await cache_service.get_all_sid_by_node(config.socketio.node_id)
+    assert await cache_service.get_user_uid_by_sid(users_sid[0]) is None
+    assert await cache_service.get_user_uid_by_sid(users_sid[1]) is None
+    assert set() == await cache_service.get_all_sid_by_user_uid(users_uid[0])
+    assert {users_sid[2]} == await cache_service.get_all_sid_by_user_uid(users_uid[1])
+    assert {users_sid[2]} == await cache_service.get_all_sid_by_node("other-node")
+    assert users_uid[1] == await cache_service.get_user_uid_by_sid(users_sid[2])
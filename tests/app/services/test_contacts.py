@@ -0,0 +1,37 @@
+import uuid
+
+import pytest
+
+from app.schemas.contacts import PlatformName, TokenData
+from app.services import contacts as contacts_service
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_tokens(user_db_f):
+    users = [await user_db_f.create() for _ in range(3)]
+    await contacts_service.save_device_token(users[0].uid, TokenData(token="ios-0", device_type=PlatformName.IOS))
+    await contacts_service.save_device_token(users[0].uid, TokenData(token="ios-1", device_type=PlatformName.IOS))
+    await contacts_service.save_device_token(
+        users[1].uid, TokenData(token="android", device_type=PlatformName.ANDROID)
+    )
+    await contacts_service.save_device_token(users[2].uid, TokenData(token="huawei", device_type=PlatformName.HUAWEI))
+
+    tokens = await contacts_service.get_tokens([str(users[0].uid), str(users[1].uid), str(uuid.uuid4())])
+
+    assert sorted(tokens) == [
+        (PlatformName.ANDROID, str(users[1].uid), "android"),
+        (PlatformName.IOS, str(users[0].uid), "ios-0"),
+        (PlatformName.IOS, str(users[0].uid), "ios-1"),
+    ]
+    assert await contacts_service.get_tokens([]) == []
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_delete_tokens(user_db_f):
+    user = await user_db_f.create()
+    await contacts_service.save_device_token(user.uid, TokenData(token="ios-0", device_type=PlatformName.IOS))
+    await contacts_service.save_device_token(user.uid, TokenData(token="ios-1", device_type=PlatformName.IOS))
+
+    assert await contacts_service.delete_tokens(["ios-0", "unknown"]) == 1
+
+    assert await contacts_service.get_tokens([str(user.uid)]) == [(PlatformName.IOS, str(user.uid), "ios-1")]
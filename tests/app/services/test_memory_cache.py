@@ -0,0 +1,44 @@
+import time
+
+from app.services.memory_cache import TTLCache, get_caches_stats
+
+
+def test_ttl_cache_get():
+    cache: TTLCache[int, str] = TTLCache(name="test_get", maxsize=10, ttl=60)
+    cache.set(1, "value")
+
+    assert cache.get(1) == "value"
+    assert cache.get(2) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_ttl_cache_expiration(mocker):
+    cache: TTLCache[int, str] = TTLCache(name="test_expiration", maxsize=10, ttl=60)
+    cache.set(1, "value")
+
+    mocker.patch("app.services.memory_cache.time.monotonic", return_value=time.monotonic() + 61)
+
+    assert cache.get(1) is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "size": 0}
+
+
+def test_ttl_cache_eviction():
+    cache: TTLCache[int, str] = TTLCache(name="test_eviction", maxsize=2, ttl=60)
+    cache.set(1, "value_1")
+    cache.set(2, "value_2")
+    cache.get(1)
+    cache.set(3, "value_3")
+
+    assert cache.get(1) == "value_1"
+    assert cache.get(2) is None
+    assert cache.get(3) == "value_3"
+
+
+def test_ttl_cache_delete():
+    cache: TTLCache[int, str] = TTLCache(name="test_delete", maxsize=10, ttl=60)
+    cache.set(1, "value")
+    cache.delete(1)
+    cache.delete(2)
+
+    assert cache.get(1) is None
+    assert get_caches_stats()["test_delete"] == {"hits": 0, "misses": 1, "size": 0}
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app import config
+from app.db.registry import registry
+from app.services import messages_partitions as partitions_service
+
+
+@pytest.fixture
+async def restore_partitions():
+    yield
+    partitions = {partition.name for partition in await partitions_service.get_partitions()}
+    async with registry.autocommit_engine.connect() as connection:
+        if "messages_p0" not in partitions:
+            await connection.execute(
+                text("ALTER TABLE messages ATTACH PARTITION messages_p0 FOR VALUES FROM (MINVALUE) TO (10000000)")
+            )
+        for name in partitions - {"messages_p0", "messages_p10000000", "messages_p20000000"}:
+            await connection.execute(text(f"DROP TABLE {name}"))
+
+
+@pytest.mark.usefixtures("restore_partitions")
+async def test_create_partitions(mocker):
+    mocker.patch.object(config.database, "messages_partition_size", 1000)
+
+    assert await partitions_service.create_partitions(ahead=2) == []
+
+    mocker.patch.object(partitions_service, "_get_current_id", return_value=29_999_500)
+    assert await partitions_service.create_partitions(ahead=2) == ["messages_p30000000", "messages_p30001000"]
+    assert await partitions_service.create_partitions(ahead=2) == []
+
+    partitions = await partitions_service.get_partitions()
+    assert [(partition.lower, partition.upper) for partition in partitions] == [
+        (None, 10_000_000),
+        (10_000_000, 20_000_000),
+        (20_000_000, 30_000_000),
+        (30_000_000, 30_001_000),
+        (30_001_000, 30_002_000),
+    ]
+
+
+@pytest.mark.usefixtures("restore_partitions")
+async def test_detach_partitions(mocker):
+    mocker.patch.object(partitions_service, "_get_current_id", return_value=10_000_500)
+
+    assert await partitions_service.detach_partitions(keep=1) == []
+    assert await partitions_service.detach_partitions(keep=0) == ["messages_p0"]
+
+    partitions = await partitions_service.get_partitions()
+    assert [partition.name for partition in partitions] == ["messages_p10000000", "messages_p20000000"]
+
+
+@pytest.mark.usefixtures("restore_partitions")
+async def test_create_partitions_by_one_node(mocker):
+    mocker.patch.object(partitions_service, "_get_current_id", return_value=29_999_500)
+    async with registry.session() as session:
+        await session.execute(text(f"SELECT pg_advisory_xact_lock({partitions_service._LOCK_KEY})"))
+        assert await partitions_service.create_partitions(ahead=1) == []
+
+    assert await partitions_service.create_partitions(ahead=1) == ["messages_p30000000"]
+
+
+@pytest.mark.usefixtures("restore_partitions")
+async def test_partitions_maintainer(mocker):
+    mocker.patch.object(partitions_service, "_get_current_id", return_value=29_999_500)
+
+    await partitions_service.start_partitions_maintainer()
+    for _ in range(100):
+        if len(await partitions_service.get_partitions()) > 3:
+            break
+        await asyncio.sleep(0.01)
+    await partitions_service.stop_partitions_maintainer()
+
+    assert [partition.name for partition in await partitions_service.get_partitions()][3:] == [
+        "messages_p30000000",
+        "messages_p40000000",
+    ]
@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+
+from app import config
+from app.clients import cache
+from app.services import cache as cache_service
+from app.services import nodes as nodes_service
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_beat():
+    user_uid = str(uuid.uuid4())
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(user_uid, sid)
+    keys = (
+        f"{cache_service.SID_BY_USER_ID_KEY_PREFIX}{user_uid}",
+        f"{cache_service.USER_ID_BY_SID_KEY_PREFIX}{sid}",
+        f"{cache_service.NODE_BY_SID_KEY_PREFIX}{sid}",
+    )
+    for key in keys:
+        await cache.expire(key, 1)
+
+    await nodes_service.beat()
+
+    for key in keys:
+        assert await cache.ttl(key) > 1
+    assert await cache.ttl(f"{cache_service.NODE_KEY_PREFIX}{config.socketio.node_id}") > 0
+    assert await cache_service.get_dead_nodes() == []
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_beat_restores_reaped_sessions():
+    user_uid = str(uuid.uuid4())
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(user_uid, sid)
+    await nodes_service.beat()
+    events = await cache_service.get_presence_events()
+
+    # Node is reaped by others after a stall, but the socket is still connected to it
+    await cache_service.remove_node_sid_cache(config.socketio.node_id)
+    cache_service.local_user_uid_by_sid[sid] = user_uid
+    assert await cache_service.get_online_users() == set()
+
+    await nodes_service.beat()
+
+    assert await cache_service.get_all_sid_by_user_uid(user_uid) == {sid}
+    assert await cache.get(f"{cache_service.USER_ID_BY_SID_KEY_PREFIX}{sid}") == user_uid
+    assert await cache_service.get_node_by_sid(sid) == config.socketio.node_id
+    assert await cache_service.get_all_sid_by_node(config.socketio.node_id) == {sid}
+    assert await cache_service.get_online_users() == {user_uid}
+    assert [(user, state) for _, user, state in await cache_service.get_presence_events(events[-1][0])] == [
+        (user_uid, cache_service.PresenceState.OFFLINE),
+        (user_uid, cache_service.PresenceState.ONLINE),
+    ]
+    assert await cache_service.get_dead_nodes() == []
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_reap_dead_nodes(mocker):
+    users_uid = [str(uuid.uuid4()) for _ in range(2)]
+    users_sid = [str(uuid.uuid4()) for _ in range(3)]
+    await cache_service.create_sid_cache(users_uid[0], users_sid[0])
+    await cache_service.create_sid_cache(users_uid[1], users_sid[1])
+    mocker.patch.object(config.socketio, "node_id", "dead-node")
+    await cache_service.create_sid_cache(users_uid[1], users_sid[2])
+    await cache_service.create_sid_cache(users_uid[0], "dead-sid")
+    mocker.stopall()
+    await nodes_service.beat()
+
+    assert await cache_service.get_dead_nodes() == ["dead-node"]
+    assert await nodes_service.reap_dead_nodes() == ["dead-node"]
+
+    assert await cache_service.get_dead_nodes() == []
+    assert await cache_service.get_all_sid_by_node("dead-node") == set()
+    assert await cache_service.get_all_sid_by_user_uid(users_uid[0]) == {users_sid[0]}
+    assert await cache_service.get_all_sid_by_user_uid(users_uid[1]) == {users_sid[1]}
+    assert await cache_service.get_user_uid_by_sid(users_sid[2]) is None
+    assert await cache_service.get_online_users() == set(users_uid)
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_reap_dead_node_once(mocker):
+    mocker.patch.object(config.socketio, "node_id", "dead-node")
+    await cache_service.create_sid_cache(str(uuid.uuid4()), str(uuid.uuid4()))
+    mocker.stopall()
+    assert await cache_service.acquire_node_reaping_lock("dead-node", config.cache.node_lifetime)
+
+    assert await nodes_service.reap_dead_nodes() == []
+    assert await cache_service.get_all_sid_by_node("dead-node") != set()
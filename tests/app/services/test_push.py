@@ -0,0 +1,188 @@
+import pytest
+
+from app import config
+from app.clients import cache
+from app.schemas.contacts import PlatformName, TokenData
+from app.services import cache as cache_service
+from app.services import contacts as contacts_service
+from app.services import push as push_service
+
+
+@pytest.fixture
+async def push_queue(mocker):
+    mocker.patch.object(config.push, "fake_senders", True)
+    await cache_service.create_push_queue_group()
+    push_service.senders.clear()
+    yield
+    push_service.senders.clear()
+
+
+@pytest.mark.usefixtures("clear_db", "clear_cache", "push_queue")
+async def test_process_queue(user_db_f):
+    users = [await user_db_f.create() for _ in range(3)]
+    await contacts_service.save_device_token(users[0].uid, TokenData(token="ios-0", device_type=PlatformName.IOS))
+    await contacts_service.save_device_token(
+        users[0].uid, TokenData(token="android-0", device_type=PlatformName.ANDROID)
+    )
+    await contacts_service.save_device_token(
+        users[1].uid, TokenData(token="android-1", device_type=PlatformName.ANDROID)
+    )
+    users_uid = [str(user.uid) for user in users]
+
+    await push_service.enqueue_notification(users_uid[:1], {"chat_id": 1, "id": 10, "text": "first"})
+    await push_service.enqueue_notification(users_uid, {"chat_id": 1, "id": 11, "text": "second"})
+
+    assert await push_service.process_queue("worker") == 2
+    assert await push_service.process_queue("worker") == 0
+
+    assert list(push_service.get_sender(PlatformName.IOS).sent) == [  # type: ignore[attr-defined]
+        ("ios-0", push_service.Notification(users_uid[0], 1, 11, "second", 2)),
+    ]
+    assert sorted(push_service.get_sender(PlatformName.ANDROID).sent) == [  # type: ignore[attr-defined]
+        ("android-0", push_service.Notification(users_uid[0], 1, 11, "second", 2)),
+        ("android-1", push_service.Notification(users_uid[1], 1, 11, "second", 1)),
+    ]
+
+
+@pytest.mark.usefixtures("clear_db", "clear_cache", "push_queue")
+async def test_failed_delivery_is_retried(user_db_f, mocker):
+    now_mock = mocker.patch.object(push_service, "_now", return_value=1_000_000)
+    user = await user_db_f.create()
+    await contacts_service.save_device_token(user.uid, TokenData(token="ios", device_type=PlatformName.IOS))
+    await push_service.enqueue_notification([str(user.uid)], {"chat_id": 1, "id": 10, "text": "text"})
+    sender = push_service.get_sender(PlatformName.IOS)
+    send_mock = mocker.patch.object(sender, "send", side_effect=RuntimeError)
+
+    with pytest.raises(RuntimeError):
+        await push_service.process_queue("crashed-worker")
+    send_mock.assert_awaited_once()
+    mocker.stop(send_mock)
+
+    assert await push_service.process_queue("worker") == 0
+    mocker.patch.object(config.push, "claim_idle", 0)
+    # Retried entry is sent as it was decided before, it is not counted in the window opened by itself
+    assert await push_service.process_queue("worker") == 1
+    assert list(sender.sent) == [  # type: ignore[attr-defined]
+        ("ios", push_service.Notification(str(user.uid), 1, 10, "text", 1))
+    ]
+
+    now_mock.return_value += 20_000
+    assert await push_service.process_queue("worker") == 0
+    assert len(sender.sent) == 1  # type: ignore[attr-defined]
+
+
+@pytest.mark.usefixtures("clear_db", "clear_cache", "push_queue")
+async def test_failed_delivery_of_due_notification_is_retried(user_db_f, mocker):
+    now_mock = mocker.patch.object(push_service, "_now", return_value=1_000_000)
+    user = await user_db_f.create()
+    await contacts_service.save_device_token(user.uid, TokenData(token="ios", device_type=PlatformName.IOS))
+    sender = push_service.get_sender(PlatformName.IOS)
+    for message_id in range(3):
+        await push_service.enqueue_notification([str(user.uid)], {"chat_id": 1, "id": message_id, "text": "text"})
+        await push_service.process_queue("worker")
+
+    now_mock.return_value += 10_000
+    send_mock = mocker.patch.object(sender, "send", side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        await push_service.process_queue("worker")
+    mocker.stop(send_mock)
+
+    await push_service.process_queue("worker")
+    assert len(sender.sent) == 1  # type: ignore[attr-defined]
+
+    now_mock.return_value += config.push.claim_idle
+    await push_service.process_queue("worker")
+    now_mock.return_value += config.push.claim_idle
+    await push_service.process_queue("worker")
+
+    assert [notification for _, notification in sender.sent] == [  # type: ignore[attr-defined]
+        push_service.Notification(str(user.uid), 1, 0, "text", 1),
+        push_service.Notification(str(user.uid), 1, 2, "text", 2),
+    ]
+    assert await cache.zcard(cache_service.PUSH_COALESCING_SENDING_KEY) == 0
+
+
+@pytest.mark.usefixtures("clear_db", "clear_cache", "push_queue")
+async def test_coalescing_window(user_db_f, mocker):
+    mocker.patch.object(config.push, "coalescing_window", 10)
+    now_mock = mocker.patch.object(push_service, "_now", return_value=1_000_000)
+    user = await user_db_f.create()
+    await contacts_service.save_device_token(user.uid, TokenData(token="ios", device_type=PlatformName.IOS))
+    sender = push_service.get_sender(PlatformName.IOS)
+
+    for message_id in range(3):
+        await push_service.enqueue_notification([str(user.uid)], {"chat_id": 1, "id": message_id, "text": "text"})
+        await push_service.process_queue("worker")
+        now_mock.return_value += 1000
+    await push_service.enqueue_notification([str(user.uid)], {"chat_id": 2, "id": 3, "text": "other chat"})
+    await push_service.process_queue("worker")
+
+    assert [notification for _, notification in sender.sent] == [  # type: ignore[attr-defined]
+        push_service.Notification(str(user.uid), 1, 0, "text", 1),
+        push_service.Notification(str(user.uid), 2, 3, "other chat", 1),
+    ]
+
+    now_mock.return_value += 10_000
+    await push_service.process_queue("worker")
+    await push_service.process_queue("worker")
+
+    notification = sender.sent[-1][1]  # type: ignore[attr-defined]
+    assert len(sender.sent) == 3  # type: ignore[attr-defined]
+    assert notification == push_service.Notification(str(user.uid), 1, 2, "text", 2)
+    assert notification.body == "2 new messages"
+
+
+@pytest.mark.usefixtures("clear_db", "clear_cache", "push_queue")
+async def test_rate_limit(user_db_f, mocker):
+    mocker.patch.object(config.push, "coalescing_window", 10)
+    mocker.patch.object(config.push, "rate_limit", 0.05)
+    mocker.patch.object(config.push, "rate_limit_burst", 2)
+    now_mock = mocker.patch.object(push_service, "_now", return_value=1_000_000)
+    user = await user_db_f.create()
+    await contacts_service.save_device_token(user.uid, TokenData(token="ios", device_type=PlatformName.IOS))
+    sender = push_service.get_sender(PlatformName.IOS)
+
+    for chat_id in range(3):
+        await push_service.enqueue_notification([str(user.uid)], {"chat_id": chat_id, "id": chat_id, "text": "text"})
+    await push_service.process_queue("worker")
+
+    assert [notification.chat_id for _, notification in sender.sent] == [0, 1]  # type: ignore[attr-defined]
+
+    # Window of the limited notification is over, but a token is refilled only after 20 seconds
+    now_mock.return_value += 10_000
+    await push_service.process_queue("worker")
+    assert len(sender.sent) == 2  # type: ignore[attr-defined]
+
+    now_mock.return_value += 10_000
+    await push_service.process_queue("worker")
+    assert [notification.chat_id for _, notification in sender.sent] == [0, 1, 2]  # type: ignore[attr-defined]
+
+
+@pytest.mark.usefixtures("clear_db", "clear_cache", "push_queue")
+async def test_rejected_tokens_are_removed(user_db_f, mocker):
+    user = await user_db_f.create()
+    for token in ("ios-0", "ios-1"):
+        await contacts_service.save_device_token(user.uid, TokenData(token=token, device_type=PlatformName.IOS))
+    mocker.patch.object(push_service.get_sender(PlatformName.IOS), "send", return_value=["ios-0"])
+    await push_service.enqueue_notification([str(user.uid)], {"chat_id": 1, "id": 10, "text": "text"})
+
+    await push_service.process_queue("worker")
+
+    assert await contacts_service.get_tokens([str(user.uid)]) == [(PlatformName.IOS, str(user.uid), "ios-1")]
+
+
+def test_sender_must_implement_send():
+    with pytest.raises(TypeError):
+        push_service.PushSender()  # type: ignore[abstract]
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_worker_does_not_start_without_senders(mocker):
+    mocker.patch.object(config.push, "senders", {PlatformName.IOS: "app.services.push.FakeSender"})
+    push_service.senders.clear()
+
+    with pytest.raises(RuntimeError, match="android"):
+        await push_service.run_worker("worker")
+
+    assert await cache.exists(cache_service.PUSH_QUEUE_KEY) == 0
+    push_service.senders.clear()
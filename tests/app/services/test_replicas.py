@@ -0,0 +1,32 @@
+import uuid
+
+import pytest
+
+from app import config
+from app.db.registry import registry
+from app.services import cache as cache_service
+from app.services import replicas as replicas_service
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_mark_user_write_without_replicas():
+    user_uid = str(uuid.uuid4())
+
+    await replicas_service.mark_user_write(user_uid)
+
+    assert not await cache_service.has_recent_write_cache(user_uid)
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_read_session_sticks_to_primary_after_write(mocker):
+    mocker.patch.object(config.database, "replica_dsns", [config.database.dsn])
+    mocker.patch.object(registry, "healthy_replicas", [0])
+    read_session_spy = mocker.patch.object(registry, "read_session", side_effect=lambda primary: registry.session())
+    user_uid, other_user_uid = str(uuid.uuid4()), str(uuid.uuid4())
+
+    await replicas_service.mark_user_write(user_uid)
+    for read_user_uid in (user_uid, other_user_uid):
+        async with replicas_service.read_session(read_user_uid):
+            pass
+
+    assert read_session_spy.call_args_list == [mocker.call(primary=True), mocker.call(primary=False)]
@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from app.db.registry import registry
+from app.services import search_indexer as search_indexer_service
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_index_messages(chat_relationship_db_f, message_db_f):
+    chat_rel = await chat_relationship_db_f.create()
+    message_data = {"user_uid": chat_rel.user_uid, "chat_id": chat_rel.chat_id}
+    message1 = await message_db_f.create(text="Hello World", search_text=None, **message_data)
+    message2 = await message_db_f.create(text="second", search_text=None, **message_data)
+    message3 = await message_db_f.create(search_text="indexed", **message_data)
+
+    assert await search_indexer_service.index_messages(batch_size=1) == 1
+    assert await search_indexer_service.index_messages(batch_size=10) == 1
+    assert await search_indexer_service.index_messages(batch_size=10) == 0
+
+    query = select(db.Message.id, db.Message.search_text, db.Message.time_updated).order_by(db.Message.id)
+    async with registry.session() as session:
+        search_vectors = {row.id: (row.search_text, row.time_updated) for row in await session.execute(query)}
+        expected_search_text = (await session.execute(select(func.to_tsvector("hello world")))).scalar_one()
+
+    assert search_vectors == {
+        message1.id: (expected_search_text, None),
+        message2.id: ("'second':1", None),
+        message3.id: ("'indexed'", None),
+    }
@@ -0,0 +1,179 @@
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from app import config
+from app.clients import cache
+from app.db import ChatRelationship
+from app.db.registry import registry
+from app.main import app
+from app.services import cache as cache_service
+from app.services import sio as sio_service
+from app.services import unread_counters as unread_counters_service
+from tests.factories.schemas import SioNewMessagePayloadFactory
+
+
+async def _get_unread_counters(chat_id: int) -> dict[str, int]:
+    async with registry.session() as session:
+        query = select(ChatRelationship).where(ChatRelationship.chat_id == chat_id)
+        return {str(rel.user_uid): rel.unread_counter for rel in (await session.execute(query)).scalars()}
+
+
+@pytest.mark.parametrize("redis", [False, True])
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_flush_unread_counters(chat_relationship_db_f, mocker, redis):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    mocker.patch.object(config.cache, "unread_counters_redis", redis)
+    chat_rel1 = await chat_relationship_db_f.create(unread_counter=2)
+    chat_rel2 = await chat_relationship_db_f.create(chat=chat_rel1.chat)
+    user_uid1, user_uid2 = str(chat_rel1.user_uid), str(chat_rel2.user_uid)
+
+    await unread_counters_service.increment(chat_rel1.chat_id, [user_uid1, user_uid2])
+    await unread_counters_service.increment(chat_rel1.chat_id, [user_uid2])
+
+    pending = await unread_counters_service.get_pending(user_uid2, [chat_rel1.chat_id])
+    assert [batch.unread_counters for batch in pending] == [{chat_rel1.chat_id: 2}]
+    assert await _get_unread_counters(chat_rel1.chat_id) == {user_uid1: 2, user_uid2: 0}
+
+    await unread_counters_service.flush()
+
+    assert await unread_counters_service.get_pending(user_uid1, [chat_rel1.chat_id]) == []
+    assert await unread_counters_service.get_pending(user_uid2, [chat_rel1.chat_id]) == []
+    assert await _get_unread_counters(chat_rel1.chat_id) == {user_uid1: 3, user_uid2: 2}
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_flush_keeps_new_increments(chat_relationship_db_f, mocker):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    mocker.patch.object(config.cache, "unread_counters_redis", True)
+    chat_rel = await chat_relationship_db_f.create()
+    user_uid = str(chat_rel.user_uid)
+    await unread_counters_service.increment(chat_rel.chat_id, [user_uid])
+
+    update_unread_counters = unread_counters_service._update_unread_counters
+
+    async def update_with_new_increment(flush_id, unread_counters):
+        await unread_counters_service.increment(chat_rel.chat_id, [user_uid])
+        await update_unread_counters(flush_id, unread_counters)
+
+    mocker.patch.object(unread_counters_service, "_update_unread_counters", side_effect=update_with_new_increment)
+    await unread_counters_service.flush()
+
+    pending = await unread_counters_service.get_pending(user_uid, [chat_rel.chat_id])
+    assert [batch.unread_counters for batch in pending] == [{chat_rel.chat_id: 1}]
+    assert await _get_unread_counters(chat_rel.chat_id) == {user_uid: 1}
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_flush_skipped_without_lock(chat_relationship_db_f, mocker):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    mocker.patch.object(config.cache, "unread_counters_redis", True)
+    chat_rel = await chat_relationship_db_f.create()
+    await unread_counters_service.increment(chat_rel.chat_id, [str(chat_rel.user_uid)])
+
+    assert await cache_service.acquire_unread_counters_lock("other-node", unread_counters_service.FLUSH_LOCK_LIFETIME)
+    await unread_counters_service.flush()
+
+    assert await _get_unread_counters(chat_rel.chat_id) == {str(chat_rel.user_uid): 0}
+    assert await cache.get(cache_service.UNREAD_COUNTERS_LOCK_KEY) == "other-node"
+
+
+@pytest.mark.parametrize("redis", [False, True])
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_unread_counters_are_exact_during_flush(chat_relationship_db_f, mocker, redis):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    mocker.patch.object(config.cache, "unread_counters_redis", redis)
+    chat_rel = await chat_relationship_db_f.create(unread_counter=1)
+    user_uid = str(chat_rel.user_uid)
+    await unread_counters_service.increment(chat_rel.chat_id, [user_uid])
+    unread_counters = []
+
+    update_unread_counters = unread_counters_service._update_unread_counters
+
+    async def update_and_read(flush_id, unread_counters_batch):
+        await unread_counters_service.increment(chat_rel.chat_id, [user_uid])
+        unread_counters.append(await unread_counters_service.get_unread_counters(user_uid, {chat_rel.chat_id: 1}))
+        await update_unread_counters(flush_id, unread_counters_batch)
+        unread_counters.append(await unread_counters_service.get_unread_counters(user_uid, {chat_rel.chat_id: 2}))
+
+    mocker.patch.object(unread_counters_service, "_update_unread_counters", side_effect=update_and_read)
+    await unread_counters_service.flush()
+
+    assert unread_counters == [{chat_rel.chat_id: 3}, {chat_rel.chat_id: 3}]
+    assert await unread_counters_service.get_unread_counters(user_uid, {chat_rel.chat_id: 2}) == {chat_rel.chat_id: 3}
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_failed_flush_is_applied_once(chat_relationship_db_f, mocker):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    mocker.patch.object(config.cache, "unread_counters_redis", True)
+    chat_rel = await chat_relationship_db_f.create()
+    user_uid = str(chat_rel.user_uid)
+    await unread_counters_service.increment(chat_rel.chat_id, [user_uid])
+    finish_mock = mocker.patch.object(cache_service, "finish_unread_counters_flush", side_effect=ConnectionError)
+
+    with pytest.raises(ConnectionError):
+        await unread_counters_service.flush()
+    mocker.stop(finish_mock)
+
+    assert await _get_unread_counters(chat_rel.chat_id) == {user_uid: 1}
+    assert await unread_counters_service.get_unread_counters(user_uid, {chat_rel.chat_id: 1}) == {chat_rel.chat_id: 1}
+    await unread_counters_service.flush()
+
+    assert await _get_unread_counters(chat_rel.chat_id) == {user_uid: 1}
+    assert await unread_counters_service.get_pending(user_uid, [chat_rel.chat_id]) == []
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_flush_of_deltas_without_flush_id(chat_relationship_db_f, mocker):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    mocker.patch.object(config.cache, "unread_counters_redis", True)
+    chat_rel = await chat_relationship_db_f.create()
+    user_uid = str(chat_rel.user_uid)
+    await cache.hincrby(
+        cache_service.UNREAD_COUNTERS_KEY, cache_service._get_unread_counter_field(chat_rel.chat_id, user_uid), 1
+    )
+    finish_mock = mocker.patch.object(cache_service, "finish_unread_counters_flush", side_effect=ConnectionError)
+
+    with pytest.raises(ConnectionError):
+        await unread_counters_service.flush()
+    mocker.stop(finish_mock)
+    await unread_counters_service.flush()
+
+    assert await _get_unread_counters(chat_rel.chat_id) == {user_uid: 1}
+    assert await cache.exists(cache_service.UNREAD_COUNTERS_IN_FLIGHT_KEY) == 0
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_create_message_with_batching(client, chat_relationship_db_f, mocker):
+    mocker.patch.object(config.cache, "unread_counters_batching", True)
+    chat_rel1 = await chat_relationship_db_f.create()
+    chat_rel2 = await chat_relationship_db_f.create(chat=chat_rel1.chat, unread_counter=5)
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel1.user_uid), sid)
+    mocker.patch("app.services.sio._send_message")
+
+    for _ in range(2):
+        sio_payload = SioNewMessagePayloadFactory.build(
+            sender_id=chat_rel1.user_uid, chat_id=chat_rel1.chat_id
+        ).model_dump(by_alias=True, mode="json")
+        await sio_service.process_create_message(sio_payload=sio_payload, sid=sid)
+
+    assert await _get_unread_counters(chat_rel1.chat_id) == {str(chat_rel1.user_uid): 0, str(chat_rel2.user_uid): 5}
+
+    response = await client.get(
+        app.other_asgi_app.url_path_for("get_chat_list"),
+        headers={config.application.user_header_name: str(chat_rel2.user_uid)},
+    )
+    assert [chat["unread_counter"] for chat in response.json()["chats"]] == [7]
+
+    await unread_counters_service.flush()
+    assert await _get_unread_counters(chat_rel1.chat_id) == {str(chat_rel1.user_uid): 0, str(chat_rel2.user_uid): 7}
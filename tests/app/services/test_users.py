@@ -0,0 +1,62 @@
+import uuid
+
+import pytest
+
+from app import config
+from app.services import cache as cache_service
+from app.services import users as users_service
+from app.services.users import UserState
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_user_state(user_db_f):
+    user = await user_db_f.create()
+    blocked_user = await user_db_f.create(is_blocked=True)
+
+    assert await users_service.get_user_state(str(user.uid)) == UserState.ACTIVE
+    assert await users_service.get_user_state(str(blocked_user.uid)) == UserState.BLOCKED
+    assert await users_service.get_user_state(str(uuid.uuid4())) == UserState.MISSING
+    assert await users_service.get_user_state("not-uuid") == UserState.MISSING
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_user_state_from_cache(user_db_f, mocker):
+    user = await user_db_f.create()
+    select_user_state_spy = mocker.spy(users_service, "_select_user_state")
+
+    assert await users_service.get_user_state(str(user.uid)) == UserState.ACTIVE
+    assert await users_service.get_user_state(str(user.uid).upper()) == UserState.ACTIVE
+
+    select_user_state_spy.assert_awaited_once_with(str(user.uid))
+
+
+@pytest.mark.usefixtures("clear_db")
+async def test_get_missing_user_state_from_cache(user_db_f, mocker):
+    user_uid = uuid.uuid4()
+    set_cache_spy = mocker.spy(users_service.users_cache, "set")
+
+    assert await users_service.get_user_state(str(user_uid)) == UserState.MISSING
+    set_cache_spy.assert_called_once_with(str(user_uid), UserState.MISSING, ttl=config.cache.users_cache_missing_ttl)
+
+    await user_db_f.create(uid=user_uid)
+    assert await users_service.get_user_state(str(user_uid)) == UserState.MISSING
+
+    await users_service.invalidate_user_cache(str(user_uid))
+    assert await users_service.get_user_state(str(user_uid)) == UserState.ACTIVE
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_get_user_state_from_redis_cache(user_db_f, mocker):
+    user = await user_db_f.create()
+    mocker.patch.object(config.cache, "users_cache_redis", True)
+    select_user_state_spy = mocker.spy(users_service, "_select_user_state")
+
+    await users_service.get_user_state(str(user.uid))
+    users_service.users_cache.clear()
+
+    assert await users_service.get_user_state(str(user.uid)) == UserState.ACTIVE
+    select_user_state_spy.assert_awaited_once_with(str(user.uid))
+
+    await users_service.invalidate_user_cache(str(user.uid))
+    assert await cache_service.get_user_state_cache(str(user.uid)) is None
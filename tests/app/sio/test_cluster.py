@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+from typing import AsyncGenerator
+
+import httpx
+import pytest
+import socketio
+
+from app import config
+from app.db.enums import ChatUserRole
+from app.schemas import sio as s_sio
+from app.sio.constants import NAMESPACE
+from tests.factories.schemas import SioNewMessagePayloadFactory
+
+WORKERS_COUNT = 2
+WORKER_START_TIMEOUT = 15
+EVENT_TIMEOUT = 5
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_worker(url: str, process: subprocess.Popen) -> None:
+    async with httpx.AsyncClient(base_url=url) as client:
+        for _ in range(WORKER_START_TIMEOUT * 10):
+            if process.poll() is not None:
+                raise RuntimeError(f"Worker {url} exited with code {process.returncode}")
+            try:
+                if (await client.get("/api/chat/ping")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Worker {url} is not started")
+
+
+@pytest.fixture
+async def workers_url() -> AsyncGenerator[list[str], None]:
+    env = {
+        **os.environ,
+        "SOCKETIO_REDIS_MANAGER": "true",
+        "SOCKETIO_TRANSPORTS": json.dumps(["websocket"]),
+    }
+    processes, urls = [], []
+    try:
+        for i in range(WORKERS_COUNT):
+            port = _get_free_port()
+            processes.append(
+                subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+                    env={**env, "SOCKETIO_NODE_ID": f"test-node-{i}"},
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+            urls.append(f"http://127.0.0.1:{port}")
+        await asyncio.gather(*[_wait_worker(url, process) for url, process in zip(urls, processes)])
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+async def _connect(url: str, user_uid: str, event_name: str) -> tuple[socketio.AsyncClient, asyncio.Queue]:
+    events: asyncio.Queue = asyncio.Queue()
+    client = socketio.AsyncClient()
+    client.on(event_name, events.put_nowait, namespace=NAMESPACE)
+    await client.connect(
+        url,
+        headers={config.application.user_header_name: user_uid},
+        transports=["websocket"],
+        namespaces=[NAMESPACE],
+    )
+    return client, events
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_send_message_to_other_worker(workers_url, chat_relationship_db_f):
+    chat_rel_1 = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    chat_rel_2 = await chat_relationship_db_f.create(chat=chat_rel_1.chat)
+    message = SioNewMessagePayloadFactory.build(sender_id=chat_rel_1.user_uid, chat_id=chat_rel_1.chat_id).model_dump(
+        by_alias=True, mode="json"
+    )
+
+    sender, _ = await _connect(workers_url[0], str(chat_rel_1.user_uid), s_sio.SioEvents.MESSAGE_NEW)
+    recipient, recipient_events = await _connect(workers_url[1], str(chat_rel_2.user_uid), s_sio.SioEvents.MESSAGE_NEW)
+    try:
+        response = await sender.call("usr:msg:create", message, namespace=NAMESPACE, timeout=EVENT_TIMEOUT)
+        received_message = await asyncio.wait_for(recipient_events.get(), EVENT_TIMEOUT)
+    finally:
+        await sender.disconnect()
+        await recipient.disconnect()
+
+    assert response == {"result": {"success": True}}
+    assert received_message["client_id"] == message["client_id"]
+    assert received_message["text"] == message["text"]
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_add_recipient_connected_to_other_worker(workers_url, user_db_f, chat_relationship_db_f):
+    chat_rel_1 = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    await chat_relationship_db_f.create(chat=chat_rel_1.chat)
+    user = await user_db_f.create()
+    message = SioNewMessagePayloadFactory.build(sender_id=chat_rel_1.user_uid, chat_id=chat_rel_1.chat_id).model_dump(
+        by_alias=True, mode="json"
+    )
+
+    sender, _ = await _connect(workers_url[0], str(chat_rel_1.user_uid), s_sio.SioEvents.MESSAGE_NEW)
+    recipient, recipient_events = await _connect(workers_url[1], str(user.uid), s_sio.SioEvents.MESSAGE_NEW)
+    try:
+        async with httpx.AsyncClient(base_url=workers_url[0]) as client:
+            response = await client.post(
+                "/api/chat/management/add_recipients",
+                headers={config.application.user_header_name: str(chat_rel_1.user_uid)},
+                json={"chat_id": chat_rel_1.chat_id, "contacts": [str(user.uid)]},
+            )
+        assert response.status_code == 200
+
+        await sender.call("usr:msg:create", message, namespace=NAMESPACE, timeout=EVENT_TIMEOUT)
+        received_message = await asyncio.wait_for(recipient_events.get(), EVENT_TIMEOUT)
+    finally:
+        await sender.disconnect()
+        await recipient.disconnect()
+
+    assert received_message["client_id"] == message["client_id"]
@@ -3,8 +3,10 @@ import uuid
 import pytest
 
 from app import config
+from app.db.enums import ChatState
 from app.schemas.sio import SioEvents
 from app.services import sio as sio_service
+from app.sio.constants import NAMESPACE
 
 
 async def test_connect_with_unregistred_user():
@@ -20,6 +22,16 @@ async def test_connect_without_user_header():
     assert event == SioEvents.USER_MISSING
 
 
+@pytest.mark.usefixtures("clear_db")
+async def test_connect_with_blocked_user(user_db_f):
+    user = await user_db_f.create(is_blocked=True)
+    event = await sio_service.connect(
+        "sid",
+        {"asgi.scope": {"headers": [(config.application.user_header_name.encode(), str(user.uid).encode())]}},
+    )
+    assert event == SioEvents.USER_BLOCKED
+
+
 @pytest.mark.usefixtures("clear_db")
 @pytest.mark.usefixtures("clear_cache")
 async def test_connect(user_db_f):
@@ -29,3 +41,26 @@ async def test_connect(user_db_f):
         {"asgi.scope": {"headers": [(config.application.user_header_name.encode(), str(user.uid).encode())]}},
     )
     assert event is None
+    assert sio_service.presence_cache.get(str(user.uid)) is True
+
+    await sio_service.disconnect("sid")
+    assert sio_service.presence_cache.get(str(user.uid)) is None
+
+
+@pytest.mark.usefixtures("clear_db")
+@pytest.mark.usefixtures("clear_cache")
+async def test_connect_enter_chat_rooms(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    await chat_relationship_db_f.create(user=chat_rel.user, state=ChatState.ARCHIVE)
+    await chat_relationship_db_f.create(user=chat_rel.user, state=ChatState.DELETED)
+    sio_mock = mocker.patch("app.services.sio.sio.sio")
+
+    event = await sio_service.connect(
+        "sid",
+        {"asgi.scope": {"headers": [(config.application.user_header_name.encode(), str(chat_rel.user_uid).encode())]}},
+    )
+
+    assert event is None
+    sio_mock.enter_room.assert_called_once_with(
+        "sid", sio_service.get_chat_room(chat_rel.chat_id), namespace=NAMESPACE
+    )
@@ -1,12 +1,17 @@
+import asyncio
 import uuid
 from datetime import datetime
 
 import pytest
 from fastapi import status
-from sqlalchemy import func, select
+from redis.asyncio.client import Pipeline
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
 
+from app import config
+from app.clients import cache
 from app.db.enums import MessageType
-from app.db.models import ChatRelationship, Message
+from app.db.models import Chat, ChatRelationship, Message
 from app.db.registry import registry
 from app.schemas import sio as s_sio
 from app.services import cache as cache_service
@@ -31,7 +36,7 @@ async def test_create_message(chat_relationship_db_f, mocker):
 
     send_online_message_mock.assert_awaited_once_with(
         message=sio_new_message_payload,
-        recipients_sid=[sid],
+        chat_id=сhat_rel.chat_id,
         event_name=s_sio.SioEvents.MESSAGE_NEW,
     )
     saved_message_data = send_online_message_mock.await_args.kwargs["message"]
@@ -52,6 +57,7 @@ async def test_create_message(chat_relationship_db_f, mocker):
     assert str(message.user_uid) == saved_message_data["sender_id"]
     assert message.chat_id == saved_message_data["chat_id"]
     assert message.text == sio_new_message_payload["text"]
+    assert message.search_text is None
     assert saved_message_data["text"] == sio_new_message_payload["text"]
     assert message.type_ == MessageType.FROM_USER
 
@@ -189,3 +195,145 @@ async def test_create_message_from_other_user(chat_relationship_db_f, mocker):
         query = select(func.count()).select_from(Message).where(Message.chat_id == chat_rel.chat_id)
         messages_quantity = (await session.execute(query)).scalar()
     assert messages_quantity == 0
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_create_message_round_trips(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    await chat_relationship_db_f.create(chat__id=chat_rel.chat_id)
+    sio_new_message_payload = SioNewMessagePayloadFactory.build(
+        sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id
+    ).model_dump(by_alias=True, mode="json")
+
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+
+    mocker.patch("app.services.sio._send_online_message")
+    send_ofline_message_mock = mocker.patch("app.services.sio._send_ofline_message")
+    redis_command_spy = mocker.spy(cache, "execute_command")
+    redis_pipeline_spy = mocker.spy(Pipeline, "execute")
+    statements, commits = [], []
+    listeners = (
+        ("before_cursor_execute", lambda *args: statements.append(args[2])),
+        ("commit", lambda *args: commits.append(args)),
+    )
+    for event_name, listener in listeners:
+        event.listen(registry.engine.sync_engine, event_name, listener)
+    try:
+        await sio_service.process_create_message(sio_payload=sio_new_message_payload, sid=sid)
+    finally:
+        for event_name, listener in listeners:
+            event.remove(registry.engine.sync_engine, event_name, listener)
+
+    assert len(statements) == 1, statements
+    assert commits == []
+    assert redis_command_spy.call_count == 1
+    assert redis_pipeline_spy.call_count == 0
+    send_ofline_message_mock.assert_awaited_once()
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_create_messages_batching(chat_relationship_db_f, mocker):
+    mocker.patch.object(config.database, "messages_batching", True)
+    chat_rel1 = await chat_relationship_db_f.create()
+    chat_rel2 = await chat_relationship_db_f.create(chat__id=chat_rel1.chat_id)
+    sids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    await cache_service.create_sid_cache(str(chat_rel1.user_uid), sids[0])
+    await cache_service.create_sid_cache(str(chat_rel2.user_uid), sids[1])
+    payloads = [
+        SioNewMessagePayloadFactory.build(sender_id=chat_rel.user_uid, chat_id=chat_rel1.chat_id).model_dump(
+            by_alias=True, mode="json"
+        )
+        for chat_rel in (chat_rel1, chat_rel1, chat_rel2)
+    ]
+    duplicate_payload = {**payloads[0]}
+
+    send_message_mock = mocker.patch("app.services.sio._send_message")
+    statements = []
+
+    def listener(*args):
+        statements.append(args[2])
+
+    event.listen(registry.engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        await asyncio.gather(
+            sio_service.process_create_message(sio_payload=payloads[0], sid=sids[0]),
+            sio_service.process_create_message(sio_payload=payloads[1], sid=sids[0]),
+            sio_service.process_create_message(sio_payload=payloads[2], sid=sids[1]),
+            sio_service.process_create_message(sio_payload=duplicate_payload, sid=sids[0]),
+        )
+    finally:
+        event.remove(registry.engine.sync_engine, "before_cursor_execute", listener)
+
+    assert len(statements) == 1, statements
+    assert send_message_mock.await_count == 3
+    sent_messages = {call.kwargs["message"]["client_id"]: call.kwargs for call in send_message_mock.await_args_list}
+    assert sent_messages.keys() == {payload["client_id"] for payload in payloads}
+    assert sent_messages[payloads[2]["client_id"]]["recipients_uid"] == [str(chat_rel1.user_uid)]
+
+    async with registry.session() as session:
+        query = select(ChatRelationship).where(ChatRelationship.chat_id == chat_rel1.chat_id)
+        unread_counters = {rel.user_uid: rel.unread_counter for rel in (await session.execute(query)).scalars()}
+        messages_quantity = (
+            await session.execute(
+                select(func.count()).select_from(Message).where(Message.chat_id == chat_rel1.chat_id)
+            )
+        ).scalar()
+    assert unread_counters == {chat_rel1.user_uid: 1, chat_rel2.user_uid: 2}
+    assert messages_quantity == 3
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_create_messages_batching_fails_only_bad_message(chat_relationship_db_f, mocker):
+    mocker.patch.object(config.database, "messages_batching", True)
+    chat_rel = await chat_relationship_db_f.create()
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    payloads = [
+        SioNewMessagePayloadFactory.build(sender_id=chat_rel.user_uid, chat_id=chat_id).model_dump(
+            by_alias=True, mode="json"
+        )
+        for chat_id in (chat_rel.chat_id, chat_rel.chat_id + 1000, chat_rel.chat_id)
+    ]
+    send_message_mock = mocker.patch("app.services.sio._send_message")
+
+    results = await asyncio.gather(
+        *[sio_service.process_create_message(sio_payload=payload, sid=sid) for payload in payloads],
+        return_exceptions=True,
+    )
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], IntegrityError)
+    assert send_message_mock.await_count == 2
+    async with registry.session() as session:
+        messages_quantity = (await session.execute(select(func.count()).select_from(Message))).scalar()
+    assert messages_quantity == 2
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_create_message_updates_last_message(chat_relationship_db_f, mocker):
+    chat_rel1 = await chat_relationship_db_f.create(last_message_at=datetime(2024, 1, 1))
+    await chat_relationship_db_f.create(chat__id=chat_rel1.chat_id, last_message_at=datetime(2024, 1, 1))
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel1.user_uid), sid)
+    send_message_mock = mocker.patch("app.services.sio._send_message")
+
+    for _ in range(2):
+        sio_payload = SioNewMessagePayloadFactory.build(
+            sender_id=chat_rel1.user_uid, chat_id=chat_rel1.chat_id
+        ).model_dump(by_alias=True, mode="json")
+        await sio_service.process_create_message(sio_payload=sio_payload, sid=sid)
+    last_message = send_message_mock.await_args.kwargs["message"]
+
+    async with registry.session() as session:
+        chat = (await session.execute(select(Chat).where(Chat.id == chat_rel1.chat_id))).scalar_one()
+        query = select(ChatRelationship.last_message_at).where(ChatRelationship.chat_id == chat_rel1.chat_id)
+        relationships_last_message_at = (await session.execute(query)).scalars().all()
+
+    assert chat.last_message_id == last_message["id"]
+    assert chat.last_message_at.timestamp() == last_message["time_created"]
+    assert relationships_last_message_at == [chat.last_message_at, chat.last_message_at]
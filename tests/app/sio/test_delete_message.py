@@ -32,7 +32,7 @@ async def test_delete_one_message(chat_relationship_db_f, message_db_f, mocker):
 
     send_online_message_mock.assert_awaited_once_with(
         message=sio_delete_message_payload,
-        recipients_sid=[sid],
+        chat_id=chat_rel.chat_id,
         event_name=s_sio.SioEvents.MESSAGE_CHANGE,
     )
     deleted_message_data = send_online_message_mock.await_args.kwargs["message"]
@@ -56,6 +56,7 @@ async def test_delete_one_message(chat_relationship_db_f, message_db_f, mocker):
     assert deleted_message.id == deleted_message_data["id"]
     assert deleted_message.time_updated == deleted_message_data_time_updated
     assert deleted_message.text == sio_service.DELETED_MESSAGE_TEXT
+    assert deleted_message.search_text is None
     assert deleted_message_data["text"] == sio_service.DELETED_MESSAGE_TEXT
     assert deleted_message.type_ == MessageType.DELETED
 
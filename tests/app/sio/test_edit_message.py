@@ -31,7 +31,7 @@ async def test_edit_message(chat_relationship_db_f, message_db_f, mocker):
 
     send_online_message_mock.assert_awaited_once_with(
         message=sio_edit_message_payload,
-        recipients_sid=[sid],
+        chat_id=chat_rel.chat_id,
         event_name=s_sio.SioEvents.MESSAGE_CHANGE,
     )
     edited_message_data = send_online_message_mock.await_args.kwargs["message"]
@@ -52,6 +52,7 @@ async def test_edit_message(chat_relationship_db_f, message_db_f, mocker):
     assert str(db_message.user_uid) == sio_edit_message_payload["sender_id"]
     assert db_message.chat_id == sio_edit_message_payload["chat_id"]
     assert db_message.text == sio_edit_message_payload["text"]
+    assert db_message.search_text is None
     assert db_message.type_ == message.type_
 
 
@@ -75,7 +76,7 @@ async def test_retry_edit_message(chat_relationship_db_f, message_db_f, mocker):
     assert send_online_message_mock.await_count == 2
     send_online_message_mock.assert_awaited_with(
         message=sio_edit_message_payload,
-        recipients_sid=[sid],
+        chat_id=chat_rel.chat_id,
         event_name=s_sio.SioEvents.MESSAGE_CHANGE,
     )
     edited_message_data = send_online_message_mock.await_args.kwargs["message"]
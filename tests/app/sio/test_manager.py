@@ -0,0 +1,78 @@
+import pickle
+from unittest.mock import AsyncMock, MagicMock
+
+import socketio
+
+from app import config
+from app.sio.constants import NAMESPACE
+from app.sio.manager import (
+    ENTER_ROOM_METHOD,
+    LEAVE_ROOM_METHOD,
+    AsyncChatManager,
+    AsyncRedisChatManager,
+)
+
+ROOM = "chat:1"
+
+
+def _connect(manager: socketio.AsyncManager) -> str:
+    manager.set_server(MagicMock())
+    manager.server.eio.generate_id.return_value = "sid"
+    return manager.connect("eio_sid", NAMESPACE)
+
+
+async def test_chat_manager_propagate_room() -> None:
+    manager = AsyncChatManager()
+    sid = _connect(manager)
+
+    await manager.propagate_enter_room(sid, NAMESPACE, ROOM)
+    assert manager.get_rooms(sid, NAMESPACE) == [sid, ROOM]
+
+    await manager.propagate_leave_room(sid, NAMESPACE, ROOM)
+    assert manager.get_rooms(sid, NAMESPACE) == [sid]
+
+
+async def test_chat_manager_propagate_room_for_unknown_sid() -> None:
+    manager = AsyncChatManager()
+    _connect(manager)
+
+    await manager.propagate_enter_room("unknown_sid", NAMESPACE, ROOM)
+    await manager.propagate_leave_room("unknown_sid", NAMESPACE, ROOM)
+
+    assert list(manager.get_participants(NAMESPACE, ROOM)) == []
+
+
+async def test_redis_chat_manager_publish_room_for_remote_sid() -> None:
+    manager = AsyncRedisChatManager(url=str(config.cache.dsn))
+    _connect(manager)
+    manager._publish = AsyncMock()
+
+    await manager.propagate_enter_room("remote_sid", NAMESPACE, ROOM)
+    await manager.propagate_leave_room("remote_sid", NAMESPACE, ROOM)
+
+    manager._publish.assert_any_await(
+        {"method": ENTER_ROOM_METHOD, "sid": "remote_sid", "namespace": NAMESPACE, "room": ROOM}
+    )
+    manager._publish.assert_any_await(
+        {"method": LEAVE_ROOM_METHOD, "sid": "remote_sid", "namespace": NAMESPACE, "room": ROOM}
+    )
+
+
+async def test_redis_chat_manager_apply_published_room(mocker) -> None:
+    manager = AsyncRedisChatManager(url=str(config.cache.dsn))
+    sid = _connect(manager)
+    emit_message = {"method": "emit", "event": "event", "data": {}, "namespace": NAMESPACE, "room": ROOM}
+    messages = [
+        pickle.dumps({"method": ENTER_ROOM_METHOD, "sid": sid, "namespace": NAMESPACE, "room": ROOM}),
+        pickle.dumps({"method": ENTER_ROOM_METHOD, "sid": "remote_sid", "namespace": NAMESPACE, "room": ROOM}),
+        pickle.dumps(emit_message),
+    ]
+
+    async def listen():
+        for message in messages:
+            yield message
+
+    mocker.patch.object(socketio.AsyncRedisManager, "_listen", side_effect=listen)
+
+    assert [message async for message in manager._listen()] == [emit_message]
+    assert list(manager.get_participants(NAMESPACE, ROOM)) == [(sid, "eio_sid")]
@@ -0,0 +1,228 @@
+import asyncio
+import time
+import uuid
+from datetime import timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app import config
+from app.db import Message, MessageOutbox
+from app.db.registry import registry
+from app.schemas import sio as s_sio
+from app.services import cache as cache_service
+from app.services import sio as sio_service
+from tests.factories.schemas import (
+    SioDeleteMessagesPayloadFactory,
+    SioEditMessagePayloadFactory,
+    SioNewMessagePayloadFactory,
+)
+
+
+@pytest.fixture
+def messages_outbox(mocker):
+    mocker.patch.object(config.database, "messages_outbox", True)
+
+
+async def _get_outbox_size() -> int:
+    async with registry.session() as session:
+        return (await session.execute(select(func.count()).select_from(MessageOutbox))).scalar_one()
+
+
+async def _expire_leases() -> None:
+    # now() of a transaction is its start time, leases given by the previous transactions are moved back
+    async with registry.session() as session:
+        await session.execute(update(MessageOutbox).values(time_next_attempt=func.now() - timedelta(seconds=1)))
+        await session.commit()
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db", "messages_outbox")
+async def test_create_message(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    recipient_rel = await chat_relationship_db_f.create(chat__id=chat_rel.chat_id)
+    sio_new_message_payload = SioNewMessagePayloadFactory.build(
+        sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id
+    ).model_dump(by_alias=True, mode="json")
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    send_online_message_mock = mocker.patch("app.services.sio._send_online_message")
+    send_ofline_message_mock = mocker.patch("app.services.sio._send_ofline_message")
+
+    await sio_service.process_create_message(sio_payload=dict(sio_new_message_payload), sid=sid)
+
+    send_online_message_mock.assert_not_awaited()
+    assert await _get_outbox_size() == 1
+
+    assert await sio_service.dispatch_outbox(batch_size=10) == 1
+
+    send_online_message_mock.assert_awaited_once()
+    kwargs = send_online_message_mock.await_args.kwargs
+    assert kwargs["event_name"] == s_sio.SioEvents.MESSAGE_NEW
+    assert kwargs["chat_id"] == chat_rel.chat_id
+    assert kwargs["message"].keys() == {
+        "sender_id",
+        "chat_id",
+        "client_id",
+        "text",
+        "id",
+        "time_created",
+        "sync_cursor",
+    }
+    assert {key: kwargs["message"][key] for key in sio_new_message_payload} == sio_new_message_payload
+    send_ofline_message_mock.assert_awaited_once_with(
+        recipients_uid=[str(recipient_rel.user_uid)], message=kwargs["message"], sender_uid=str(chat_rel.user_uid)
+    )
+    assert await _get_outbox_size() == 0
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db", "messages_outbox")
+async def test_edit_and_delete_message(chat_relationship_db_f, message_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    message = await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id)
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    sio_edit_message_payload = SioEditMessagePayloadFactory.build(
+        sender_id=chat_rel.user_uid, message_id=message.id, chat_id=chat_rel.chat_id
+    ).model_dump(by_alias=True, mode="json")
+    sio_delete_messages_payload = SioDeleteMessagesPayloadFactory.build(
+        sender_id=chat_rel.user_uid, message_ids=[message.id], chat_id=chat_rel.chat_id
+    ).model_dump(by_alias=True, mode="json")
+    send_online_message_mock = mocker.patch("app.services.sio._send_online_message")
+
+    await sio_service.process_edit_message(sio_payload=dict(sio_edit_message_payload), sid=sid)
+    await sio_service.process_delete_messages(sio_payload=dict(sio_delete_messages_payload), sid=sid)
+    send_online_message_mock.assert_not_awaited()
+
+    assert await sio_service.dispatch_outbox(batch_size=10) == 2
+
+    edit_kwargs, delete_kwargs = [call.kwargs for call in send_online_message_mock.await_args_list]
+    assert edit_kwargs["event_name"] == delete_kwargs["event_name"] == s_sio.SioEvents.MESSAGE_CHANGE
+    assert edit_kwargs["message"].keys() == sio_edit_message_payload.keys() | {"time_updated", "sync_cursor"}
+    assert edit_kwargs["message"]["text"] == sio_edit_message_payload["text"]
+    assert delete_kwargs["message"].keys() == {
+        "sender_id",
+        "chat_id",
+        "client_id",
+        "text",
+        "id",
+        "time_updated",
+        "sync_cursor",
+    }
+    assert delete_kwargs["message"]["text"] == sio_service.DELETED_MESSAGE_TEXT
+    assert delete_kwargs["message"]["id"] == message.id
+
+
+async def _create_messages(user_uid, chat_id, count: int) -> None:
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(user_uid), sid)
+    for _ in range(count):
+        sio_new_message_payload = SioNewMessagePayloadFactory.build(sender_id=user_uid, chat_id=chat_id).model_dump(
+            by_alias=True, mode="json"
+        )
+        await sio_service.process_create_message(sio_payload=sio_new_message_payload, sid=sid)
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db", "messages_outbox")
+async def test_failed_events_are_retried_after_lease(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    await _create_messages(chat_rel.user_uid, chat_rel.chat_id, 1)
+    send_online_message_mock = mocker.patch("app.services.sio._send_online_message", side_effect=RuntimeError)
+
+    assert await sio_service.dispatch_outbox(batch_size=10) == 1
+    assert await _get_outbox_size() == 1
+    # The event is leased, it is not resent before the lease expires
+    assert await sio_service.dispatch_outbox(batch_size=10) == 0
+
+    send_online_message_mock.side_effect = None
+    await _expire_leases()
+
+    assert await sio_service.dispatch_outbox(batch_size=10) == 1
+    assert send_online_message_mock.await_count == 2
+    assert await _get_outbox_size() == 0
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db", "messages_outbox")
+async def test_failed_event_does_not_block_next_events(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    await _create_messages(chat_rel.user_uid, chat_rel.chat_id, 3)
+    async with registry.session() as session:
+        events = (await session.execute(select(MessageOutbox).order_by(MessageOutbox.id))).scalars().all()
+
+    async def send_online_message(chat_id, message, event_name):
+        if message["id"] == events[0].payload["id"]:
+            raise RuntimeError
+
+    send_online_message_mock = mocker.patch("app.services.sio._send_online_message", side_effect=send_online_message)
+
+    assert await sio_service.dispatch_outbox(batch_size=10) == 3
+
+    assert send_online_message_mock.await_count == 3
+    async with registry.session() as session:
+        assert (await session.execute(select(MessageOutbox.id))).scalars().all() == [events[0].id]
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db", "messages_outbox")
+async def test_failed_event_is_dropped_after_max_attempts(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    await _create_messages(chat_rel.user_uid, chat_rel.chat_id, 1)
+    send_online_message_mock = mocker.patch("app.services.sio._send_online_message", side_effect=RuntimeError)
+    mocker.patch.object(config.database, "outbox_lease_time", 0)
+    mocker.patch.object(config.database, "outbox_max_attempts", 3)
+
+    for _ in range(3):
+        assert await _get_outbox_size() == 1
+        assert await sio_service.dispatch_outbox(batch_size=10) == 1
+
+    assert send_online_message_mock.await_count == 3
+    assert await _get_outbox_size() == 0
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db", "messages_outbox")
+async def test_concurrent_dispatchers(chat_relationship_db_f, mocker):
+    chat_rel = await chat_relationship_db_f.create()
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    for _ in range(2):
+        sio_new_message_payload = SioNewMessagePayloadFactory.build(
+            sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id
+        ).model_dump(by_alias=True, mode="json")
+        await sio_service.process_create_message(sio_payload=sio_new_message_payload, sid=sid)
+    send_online_message_mock = mocker.patch(
+        "app.services.sio._send_online_message", side_effect=lambda **kwargs: asyncio.sleep(0.05)
+    )
+
+    assert await asyncio.gather(sio_service.dispatch_outbox(1), sio_service.dispatch_outbox(1)) == [1, 1]
+
+    sent_ids = {call.kwargs["message"]["id"] for call in send_online_message_mock.await_args_list}
+    assert len(sent_ids) == 2
+    assert await _get_outbox_size() == 0
+
+
+@pytest.mark.usefixtures("clear_cache", "clear_db")
+async def test_timestamps_of_direct_and_outbox_events_are_equal(chat_relationship_db_f, mocker, monkeypatch):
+    # Process time zone is not UTC, timestamps of DB are still read as UTC by both paths
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    chat_rel = await chat_relationship_db_f.create()
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    send_message_mock = mocker.patch("app.services.sio._send_message")
+    try:
+        for messages_outbox in (False, True):
+            mocker.patch.object(config.database, "messages_outbox", messages_outbox)
+            sio_new_message_payload = SioNewMessagePayloadFactory.build(
+                sender_id=chat_rel.user_uid, chat_id=chat_rel.chat_id
+            ).model_dump(by_alias=True, mode="json")
+            await sio_service.process_create_message(sio_payload=sio_new_message_payload, sid=sid)
+        await sio_service.dispatch_outbox(batch_size=10)
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+
+    async with registry.session() as session:
+        messages = (await session.execute(select(Message).order_by(Message.id))).scalars().all()
+    direct_message, outbox_message = [call.kwargs["message"] for call in send_message_mock.await_args_list]
+    for event_message, message in zip((direct_message, outbox_message), messages):
+        assert event_message["time_created"] == pytest.approx(
+            message.time_created.replace(tzinfo=timezone.utc).timestamp()
+        )
@@ -4,7 +4,11 @@ from unittest.mock import AsyncMock
 
 import pytest
 
-from app.db.enums import ChatUserRole
+from app import config
+from app.db.enums import ChatState, ChatUserRole
+from app.schemas import chats as s_chat
+from app.services import cache as cache_service
+from app.services import chats as chats_service
 from app.services import sio as sio_service
 from app.sio.constants import NAMESPACE
 
@@ -21,48 +25,117 @@ async def test_get_recipients_data(chat_relationship_db_f) -> None:
     assert str(chat_rel_2.user_uid) in recipients_uid
 
 
-def test_get_online_recipiets_sid() -> None:
-    recipints_uid = [str(uuid.uuid4()) for _ in range(4)]
-    recipints_sid = [str(uuid.uuid4()) for _ in range(3)]
-    recipients_data = {
-        recipints_uid[0]: set(),
-        recipints_uid[1]: {recipints_sid[0], recipints_sid[1]},
-        recipints_uid[2]: set(),
-        recipints_uid[3]: {recipints_sid[2]},
-    }
+@pytest.mark.usefixtures("clear_db")
+async def test_get_recipients_data_without_deleted(chat_relationship_db_f) -> None:
+    chat_rel_1 = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    await chat_relationship_db_f.create(chat__id=chat_rel_1.chat_id, state=ChatState.DELETED)
+
+    recipients_uid = await sio_service._get_recipients_uid(chat_id=chat_rel_1.chat_id)
+
+    assert recipients_uid == [str(chat_rel_1.user_uid)]
 
-    online_recipients_sid = sio_service._get_online_recipients_sid(recipients_data)
 
-    assert set(recipints_sid) == set(online_recipients_sid)
+@pytest.mark.usefixtures("clear_db")
+async def test_get_recipients_data_after_add_recipients(user_db_f, chat_relationship_db_f) -> None:
+    chat_rel = await chat_relationship_db_f.create(user_role=ChatUserRole.CREATOR)
+    await chat_relationship_db_f.create(chat__id=chat_rel.chat_id)
+    user = await user_db_f.create()
+    await sio_service._get_recipients_uid(chat_id=chat_rel.chat_id)
+
+    await chats_service.add_recipients(
+        s_chat.ManageRecipientsData(chat_id=chat_rel.chat_id, contacts=[user.uid]), chat_rel.user_uid
+    )
+    recipients_uid = await sio_service._get_recipients_uid(chat_id=chat_rel.chat_id)
 
+    assert len(recipients_uid) == 3
+    assert str(user.uid) in recipients_uid
 
-def test_get_offline_recipiets_uid() -> None:
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_get_offline_recipiets_uid(mocker) -> None:
     recipints_uid = [str(uuid.uuid4()) for _ in range(4)]
-    recipints_sid = [str(uuid.uuid4()) for _ in range(3)]
-    recipients_data = {
-        recipints_uid[0]: set(),
-        recipints_uid[1]: {recipints_sid[0], recipints_sid[1]},
-        recipints_uid[2]: set(),
-        recipints_uid[3]: {recipints_sid[2]},
-    }
+    await cache_service.create_sid_cache(recipints_uid[1], str(uuid.uuid4()))
+    await cache_service.create_sid_cache(recipints_uid[3], str(uuid.uuid4()))
+
+    offline_recipiets_uid = await sio_service._get_offline_recipients_uid(recipints_uid)
+
+    assert [recipints_uid[0], recipints_uid[2]] == offline_recipiets_uid
+
+    # Presence is taken from local cache until it expires
+    get_offline_users_spy = mocker.spy(cache_service, "get_offline_users")
+    await cache_service.create_sid_cache(recipints_uid[0], str(uuid.uuid4()))
 
-    offline_recipiets_uid = sio_service._get_offline_recipients_uid(recipients_data)
+    offline_recipiets_uid = await sio_service._get_offline_recipients_uid(recipints_uid)
 
     assert set([recipints_uid[0], recipints_uid[2]]) == set(offline_recipiets_uid)
+    get_offline_users_spy.assert_not_called()
+
+    sio_service.presence_cache.clear()
+
+    offline_recipiets_uid = await sio_service._get_offline_recipients_uid(recipints_uid)
+
+    assert [recipints_uid[2]] == offline_recipiets_uid
 
 
 async def test_send_online_mesage(mocker) -> None:
-    count_of_recipients = random.randint(5, 10)
-    recipients_sid = [str(uuid.uuid4()) for _ in range(count_of_recipients)]
+    chat_id = random.randint(1, 1000)
     message = {"test": "mesasge"}
     event_name = "event:name"
 
     sio_mock = mocker.patch("app.services.sio.sio.sio")
     sio_mock.emit = AsyncMock()
 
-    await sio_service._send_online_message(recipients_sid=recipients_sid, message=message, event_name=event_name)
+    await sio_service._send_online_message(chat_id=chat_id, message=message, event_name=event_name)
+
+    sio_mock.emit.assert_awaited_once_with(
+        event=event_name, data=message, room=sio_service.get_chat_room(chat_id), namespace=NAMESPACE
+    )
+
+
+async def test_send_ofline_message_without_sender(mocker) -> None:
+    recipients_uid = [str(uuid.uuid4()) for _ in range(3)]
+    message = {"chat_id": 1, "id": 10, "text": "text"}
+    enqueue_notification_mock = mocker.patch("app.services.push.enqueue_notification")
+
+    await sio_service._send_ofline_message(
+        recipients_uid=recipients_uid, message=message, sender_uid=recipients_uid[0]
+    )
+    await sio_service._send_ofline_message(
+        recipients_uid=recipients_uid[:1], message=message, sender_uid=recipients_uid[0]
+    )
+
+    enqueue_notification_mock.assert_awaited_once_with(recipients_uid[1:], message)
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_join_chat_room(mocker) -> None:
+    users_uid = [uuid.uuid4() for _ in range(3)]
+    users_sid = [str(uuid.uuid4()) for _ in range(3)]
+    await cache_service.create_sid_cache(str(users_uid[0]), users_sid[0])
+    await cache_service.create_sid_cache(str(users_uid[1]), users_sid[1])
+    await cache_service.create_sid_cache(str(users_uid[1]), users_sid[2])
+    chat_id = random.randint(1, 1000)
+
+    sio_mock = mocker.patch("app.services.sio.sio.sio")
+    sio_mock.manager.propagate_enter_room = AsyncMock()
+
+    await sio_service.join_chat_room(users_uid, chat_id)
+
+    assert sio_mock.manager.propagate_enter_room.await_count == len(users_sid)
+    for sid in users_sid:
+        sio_mock.manager.propagate_enter_room.assert_any_await(sid, NAMESPACE, sio_service.get_chat_room(chat_id))
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_leave_chat_room(mocker) -> None:
+    user_uid = uuid.uuid4()
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(user_uid), sid)
+    chat_id = random.randint(1, 1000)
+
+    sio_mock = mocker.patch("app.services.sio.sio.sio")
+    sio_mock.manager.propagate_leave_room = AsyncMock()
 
-    assert sio_mock.emit.await_count == count_of_recipients
+    await sio_service.leave_chat_room([user_uid], chat_id)
 
-    for sid in recipients_sid:
-        sio_mock.emit.assert_any_await(event=event_name, data=message, to=sid, namespace=NAMESPACE)
+    sio_mock.manager.propagate_leave_room.assert_awaited_once_with(sid, NAMESPACE, sio_service.get_chat_room(chat_id))
@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.services import cache as cache_service
+from app.services import sio as sio_service
+
+
+@pytest.mark.usefixtures("clear_cache")
+@pytest.mark.usefixtures("clear_db")
+async def test_sync(chat_relationship_db_f, message_db_f):
+    chat_rel = await chat_relationship_db_f.create()
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(chat_rel.user_uid), sid)
+    cursor = (await sio_service.process_sync({"sender_id": str(chat_rel.user_uid)}, sid))["cursor"]
+    message = await message_db_f.create(user_uid=chat_rel.user_uid, chat_id=chat_rel.chat_id)
+
+    result = await sio_service.process_sync({"sender_id": str(chat_rel.user_uid), "cursor": cursor}, sid)
+
+    assert [synced_message["id"] for synced_message in result["messages"]] == [message.id]
+    assert result["cursor"]
+    assert result["has_more"] is False
+
+
+@pytest.mark.usefixtures("clear_cache")
+async def test_sync_with_wrong_sender_id():
+    sid = str(uuid.uuid4())
+    await cache_service.create_sid_cache(str(uuid.uuid4()), sid)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await sio_service.process_sync({"sender_id": str(uuid.uuid4())}, sid)
+
+    assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
@@ -27,6 +27,6 @@ async def test_typing(chat_relationship_db_f, mocker):
 
     send_online_message_mock.assert_awaited_once_with(
         message=sio_typing_payload,
-        recipients_sid=[sid],
+        chat_id=chat_rel.chat_id,
         event_name=s_sio.SioEvents.TYPING,
     )
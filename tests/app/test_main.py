@@ -0,0 +1,22 @@
+import pytest
+
+from app import config, main
+from app.config.socketio import SocketioSettings
+
+
+@pytest.mark.parametrize("node_id", [None, "node"])
+def test_main_with_workers(mocker, node_id):
+    mocker.patch.object(config.web, "workers", 2)
+    socketio_settings = SocketioSettings(redis_manager=True, transports=["websocket"])
+    if node_id:
+        socketio_settings = SocketioSettings(redis_manager=True, transports=["websocket"], node_id=node_id)
+    mocker.patch.object(config, "socketio", socketio_settings)
+    run_mock = mocker.patch.object(main.uvicorn, "run")
+
+    if node_id:
+        with pytest.raises(RuntimeError):
+            main.main()
+        run_mock.assert_not_called()
+    else:
+        main.main()
+        run_mock.assert_called_once()
@@ -1,7 +1,9 @@
 import uuid
+from typing import Any, Callable
 
 import factory
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import db
 from app.db.enums import ChatState, ChatUserRole, MessageType
@@ -24,6 +26,8 @@ class ChatFactory(AsyncSQLAlchemyFactory):
     state = ChatState.ACTIVE
     time_created = factory.Faker("past_datetime")
     time_updated = factory.Faker("past_datetime")
+    last_message_id = None
+    last_message_at = None
 
     class Meta:
         model = db.Chat
@@ -69,6 +73,14 @@ class MessageFactory(AsyncSQLAlchemyFactory):
         model = db.Message
         sqlalchemy_session = lambda: registry.session
 
+    @classmethod
+    async def _save(cls, model_class: Any, session: Callable[..., AsyncSession], args: Any, kwargs: Any) -> Any:
+        async with session() as db_session:
+            obj = model_class(*args, **kwargs)
+            db_session.add_all([obj, db.MessageClientId(client_id=obj.client_id, message_id=obj.id)])
+            await db_session.commit()
+        return obj
+
 
 @pytest.fixture
 def user_db_f() -> type[UserFactory]:
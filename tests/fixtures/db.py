@@ -4,8 +4,20 @@ import pytest
 from sqlalchemy.sql import text
 
 from app.clients import cache
-from app.db import Chat, ChatRelationship, Device, Message, User
+from app.db import (
+    Chat,
+    ChatRelationship,
+    Device,
+    Message,
+    MessageClientId,
+    MessageOutbox,
+    UnreadCountersFlush,
+    User,
+)
 from app.db.registry import registry as db_registry
+from app.services import cache as cache_service
+from app.services import unread_counters as unread_counters_service
+from app.services.memory_cache import clear_caches
 
 TRUNCATE_QUERY = "TRUNCATE TABLE {tbl_name} CASCADE;"
 
@@ -18,10 +30,17 @@ async def clear_db() -> AsyncGenerator[None, None]:
         await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=Chat.__tablename__)))
         await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=User.__tablename__)))
         await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=Message.__tablename__)))
+        await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=MessageClientId.__tablename__)))
         await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=Device.__tablename__)))
+        await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=MessageOutbox.__tablename__)))
+        await conn.execute(text(TRUNCATE_QUERY.format(tbl_name=UnreadCountersFlush.__tablename__)))
+    clear_caches()
+    unread_counters_service.pending_unread_counters.clear()
+    unread_counters_service._in_flight_unread_counters = None
 
 
 @pytest.fixture
 async def clear_cache() -> AsyncGenerator[None, None]:
     yield
     await cache.flushdb()
+    cache_service.local_user_uid_by_sid.clear()